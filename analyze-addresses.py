@@ -1,44 +1,26 @@
 #!/usr/bin/env python3
 """Analyze memory addresses from working captures to find the pattern."""
 
-import json
-import glob
+from pydynatab.index import open_index
+from pydynatab.protocol import OPCODE_DATA
 
-def extract_address_from_capture(filename):
-    """Extract the first data packet address from a capture file."""
-    try:
-        with open(filename, 'r') as f:
-            data = json.load(f)
-        
-        for packet in data:
-            layers = packet.get('_source', {}).get('layers', {})
-            
-            # Look for HID data
-            if 'usbhid.data' in layers:
-                hex_data = layers['usbhid.data'].replace(':', '')
-                
-                # Check if it's a data packet (starts with 29)
-                if hex_data.startswith('29'):
-                    # Bytes 6-7 are the address (big-endian)
-                    addr_high = int(hex_data[12:14], 16)
-                    addr_low = int(hex_data[14:16], 16)
-                    address = (addr_high << 8) | addr_low
-                    return address
-    except Exception as e:
-        pass
-    
-    return None
+# Bytes 6-7 (big-endian) of the first data packet in every capture
+FIRST_DATA_ADDRESS = """
+    SELECT c.name, p.field_6_7 AS address
+    FROM captures c
+    JOIN packets p ON p.capture_id = c.id
+    WHERE p.ordinal = (SELECT MIN(ordinal) FROM packets
+                       WHERE capture_id = c.id AND opcode = :opcode)
+    ORDER BY c.name
+"""
 
-# Analyze all captures
-captures = glob.glob('usbPcap/*.json')
+# Analyze all captures (ingesting any that are new or changed)
+index = open_index('usbPcap')
 
 results = []
-for capture in sorted(captures):
-    addr = extract_address_from_capture(capture)
-    if addr is not None:
-        name = capture.split('/')[-1]
-        results.append((name, addr))
-        print(f"{name}: 0x{addr:04X} ({addr} decimal)")
+for name, addr in index.execute(FIRST_DATA_ADDRESS, {'opcode': OPCODE_DATA}):
+    results.append((name, addr))
+    print(f"{name}: 0x{addr:04X} ({addr} decimal)")
 
 if results:
     print("\n=== Address Analysis ===")
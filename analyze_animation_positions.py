@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 """Analyze animation capture focusing on position encoding."""
 
-import json
 import sys
 
+from pydynatab.capture import iter_entries
+from pydynatab.protocol import OPCODE_DATA, OPCODE_INIT, color_name, packet_pixels
+
 def parse_packet(data_str):
     """Parse hex string to byte array."""
     # Remove any whitespace and split by spaces if present
@@ -16,7 +18,7 @@ def analyze_init_packet(packet_data):
         return None
 
     opcode = packet_data[0]
-    if opcode != 0xa9:
+    if opcode != OPCODE_INIT:
         return None
 
     # Bytes 8-11 should contain position info
@@ -39,20 +41,11 @@ def analyze_data_packet(packet_data, frame_num=None):
         return None
 
     opcode = packet_data[0]
-    if opcode != 0x29:
+    if opcode != OPCODE_DATA:
         return None
 
-    # Pixel data starts at byte 8
-    pixel_data = packet_data[8:]
-
-    # Parse RGB pixels (3 bytes each)
-    pixels = []
-    for i in range(0, len(pixel_data), 3):
-        if i + 2 < len(pixel_data):
-            r = pixel_data[i]
-            g = pixel_data[i+1]
-            b = pixel_data[i+2]
-            pixels.append((r, g, b))
+    # Pixel data starts at byte 8, RGB pixels (3 bytes each)
+    pixels = packet_pixels(packet_data)
 
     return {
         'frame': frame_num,
@@ -65,9 +58,6 @@ def main():
     filename = sys.argv[1] if len(sys.argv) > 1 else \
         '/home/user/PSDynaTab/usbPcap/2026-01-17-animation-4frame-ff-00-00-00-ff-00-00-00-ff-7f-00-00-connected-corners-1pixel-each.json'
 
-    with open(filename, 'r') as f:
-        data = json.load(f)
-
     print("=" * 80)
     print("ANIMATION CAPTURE ANALYSIS - POSITION ENCODING")
     print("=" * 80)
@@ -77,18 +67,18 @@ def main():
     init_packets = []
     data_packets = []
 
-    for entry in data:
+    for entry in iter_entries(filename):
         if 'data' in entry:
             packet_bytes = parse_packet(entry['data'])
             if len(packet_bytes) > 0:
                 opcode = packet_bytes[0]
 
-                if opcode == 0xa9:
+                if opcode == OPCODE_INIT:
                     init_info = analyze_init_packet(packet_bytes)
                     if init_info:
                         init_packets.append(init_info)
 
-                elif opcode == 0x29:
+                elif opcode == OPCODE_DATA:
                     data_packets.append(packet_bytes)
 
     # Display init packet information
@@ -118,19 +108,9 @@ def main():
             print(f"  Pixel count: {info['pixel_count']}")
             print(f"  Colors:")
             for j, (r, g, b) in enumerate(info['pixels']):
-                color_name = ""
-                if (r, g, b) == (0xff, 0x00, 0x00):
-                    color_name = "Bright Red"
-                elif (r, g, b) == (0x7f, 0x00, 0x00):
-                    color_name = "Dark Red"
-                elif (r, g, b) == (0x00, 0xff, 0x00):
-                    color_name = "Green"
-                elif (r, g, b) == (0x00, 0x00, 0xff):
-                    color_name = "Blue"
-                else:
-                    color_name = f"Custom"
-
-                print(f"    Pixel {j}: RGB({r:02x}, {g:02x}, {b:02x}) - {color_name}")
+                cname = color_name(r, g, b, default="Custom")
+
+                print(f"    Pixel {j}: RGB({r:02x}, {g:02x}, {b:02x}) - {cname}")
 
     print("\n" + "=" * 80)
     print("CORNER POSITION MAPPING:")
@@ -4,20 +4,18 @@ Analyze USB capture files from picture position tests.
 Extract pixel position mapping data to understand keyboard layout.
 """
 
-import json
+import argparse
 import glob
 import os
 from collections import defaultdict
 
-def parse_hex_data(hex_string):
-    """Convert colon-separated hex string to list of integers."""
-    return [int(x, 16) for x in hex_string.split(':')]
+from pydynatab.batch import analyze_corpus
+from pydynatab.capture import iter_layers
+from pydynatab.hexdata import parse_hex_fragment
+from pydynatab.protocol import OPCODE_DATA, non_black_pixels, packet_pixels
 
 def analyze_capture(filepath):
     """Analyze a single USB capture file."""
-    with open(filepath, 'r') as f:
-        data = json.load(f)
-
     filename = os.path.basename(filepath)
     result = {
         'filename': filename,
@@ -27,10 +25,8 @@ def analyze_capture(filepath):
         'protocol_correct': True
     }
 
-    for packet in data:
+    for layers in iter_layers(filepath):
         try:
-            layers = packet['_source']['layers']
-
             # Check for Setup Data (control transfers)
             if 'Setup Data' in layers:
                 setup = layers['Setup Data']
@@ -39,7 +35,7 @@ def analyze_capture(filepath):
                 if 'usbhid.setup.bRequest' in setup and setup['usbhid.setup.bRequest'] == '0x09':
                     if 'usb.data_fragment' in setup:
                         hex_data = setup['usb.data_fragment']
-                        data_bytes = parse_hex_data(hex_data)
+                        data_bytes = parse_hex_fragment(hex_data)
 
                         # Extract key information
                         # Byte 0: Command (0xa9 = start, 0x29 = data packet)
@@ -53,13 +49,8 @@ def analyze_capture(filepath):
                             addr = (addr_bytes[3] << 24) | (addr_bytes[2] << 16) | (addr_bytes[1] << 8) | addr_bytes[0]
 
                             # Look for RGB data (starts after address info)
-                            rgb_start = 8
-                            pixel_data = []
-                            for i in range(rgb_start, min(len(data_bytes), 64), 3):
-                                if i+2 < len(data_bytes):
-                                    r, g, b = data_bytes[i], data_bytes[i+1], data_bytes[i+2]
-                                    if r != 0 or g != 0 or b != 0:  # Non-black pixel
-                                        pixel_data.append((r, g, b, i-rgb_start))
+                            pixel_data = [(r, g, b, idx * 3)
+                                          for idx, (r, g, b) in non_black_pixels(packet_pixels(data_bytes))]
 
                             result['set_reports'].append({
                                 'cmd': f'0x{cmd:02x}',
@@ -69,7 +60,7 @@ def analyze_capture(filepath):
                                 'raw': hex_data
                             })
 
-                            if cmd == 0x29:  # Data packet
+                            if cmd == OPCODE_DATA:  # Data packet
                                 result['data_packets'] += 1
 
                 # Get_Report (0x01) - verify fixed protocol
@@ -88,15 +79,23 @@ def analyze_capture(filepath):
     return result
 
 def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='worker processes (default: one per CPU core)')
+    args = parser.parse_args()
+
     # Find all picture test files from 2026-01-17
     pattern = '/home/user/PSDynaTab/usbPcap/2026-01-17-picture-*.json'
     files = sorted(glob.glob(pattern))
 
+    # Parse each new or changed capture once, in parallel; both passes below reuse the results
+    results = dict(zip(files, analyze_corpus(analyze_capture, files, args.jobs)))
+
     print(f"Found {len(files)} picture test captures\n")
     print("=" * 100)
 
     for filepath in files:
-        result = analyze_capture(filepath)
+        result = results[filepath]
 
         print(f"\n{result['filename']}")
         print(f"  Data packets: {result['data_packets']}")
@@ -144,7 +143,7 @@ def main():
             continue
         print(f"\n{test_type} Tests:")
         for filepath in files_group:
-            result = analyze_capture(filepath)
+            result = results[filepath]
             name = os.path.basename(filepath).replace('2026-01-17-picture-', '').replace('.json', '')
 
             # Find unique pixel positions and colors
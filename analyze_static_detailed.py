@@ -3,20 +3,15 @@
 Detailed analysis of static picture protocol - investigating position encoding
 """
 
-import json
 from pathlib import Path
 
-def parse_hex_string(hex_str: str) -> bytes:
-    """Parse colon-separated hex string into bytes"""
-    return bytes(int(x, 16) for x in hex_str.split(':'))
+from pydynatab.capture import iter_packets
+from pydynatab.protocol import OPCODE_DATA, OPCODE_INIT, packet_pixels
 
 def analyze_packet_spacing(filename: str):
     """Analyze a specific file in detail"""
     filepath = Path(f'/home/user/PSDynaTab/usbPcap/{filename}')
 
-    with open(filepath, 'r') as f:
-        data = json.load(f)
-
     print(f"\n{'=' * 80}")
     print(f"Detailed analysis: {filename}")
     print('=' * 80)
@@ -24,19 +19,11 @@ def analyze_packet_spacing(filename: str):
     init_packet = None
     data_packets = []
 
-    for entry in data:
-        try:
-            layers = entry['_source']['layers']
-            if 'Setup Data' in layers and 'usb.data_fragment' in layers['Setup Data']:
-                hex_data = layers['Setup Data']['usb.data_fragment']
-                packet_data = parse_hex_string(hex_data)
-
-                if len(packet_data) > 0 and packet_data[0] == 0xa9:
-                    init_packet = packet_data
-                elif len(packet_data) > 0 and packet_data[0] == 0x29:
-                    data_packets.append(packet_data)
-        except:
-            continue
+    for packet in iter_packets(filepath):
+        if packet.data[0] == OPCODE_INIT:
+            init_packet = packet.data
+        elif packet.data[0] == OPCODE_DATA:
+            data_packets.append(packet.data)
 
     if init_packet:
         print("\nINIT PACKET (0xa9):")
@@ -86,9 +73,7 @@ def analyze_packet_spacing(filename: str):
             print(f"    Byte[6:7]: 0x{pkt[6]:02x}{pkt[7]:02x}")
             print(f"    RGB triplets: {rgb_count}")
             print(f"    First 3 pixels:")
-            for j in range(min(3, rgb_count)):
-                offset = 8 + j * 3
-                r, g, b = pkt[offset], pkt[offset+1], pkt[offset+2]
+            for j, (r, g, b) in enumerate(packet_pixels(pkt)[:3]):
                 print(f"      [{j}] RGB({r:3d}, {g:3d}, {b:3d}) = #{r:02x}{g:02x}{b:02x}")
 
     print(f"\n  TOTAL RGB triplets across all data packets: {total_rgb_triplets}")
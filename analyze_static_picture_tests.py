@@ -4,124 +4,22 @@ Analyze static picture test USB captures from the usbPcap directory.
 Extracts and validates protocol compliance for TEST-STATIC-001 and TEST-STATIC-005 test cases.
 """
 
-import json
-import os
+import argparse
 from pathlib import Path
-from typing import Dict, List, Tuple
-from dataclasses import dataclass
-
-@dataclass
-class Packet:
-    """Represents a parsed packet"""
-    packet_type: str  # '0xa9' for init, '0x29' for data
-    frame_number: int
-    timestamp: str
-    data: bytes
-
-@dataclass
-class InitPacket:
-    """Parsed init packet (0xa9)"""
-    byte_00: int  # 0xa9
-    byte_01: int  # Always 0x00
-    byte_02: int  # Always 0x01
-    byte_03: int  # Always 0x00
-    byte_04_05: int  # Unknown field (little endian)
-    byte_06_07: int  # Unknown field (little endian)
-    byte_08: int  # X position
-    byte_09: int  # Y position
-    byte_10: int  # Width
-    byte_11: int  # Height
-    raw_data: bytes
-
-@dataclass
-class DataPacket:
-    """Parsed data packet (0x29)"""
-    byte_00: int  # 0x29
-    byte_01: int  # Always 0x00
-    byte_02: int  # Always 0x01
-    byte_03: int  # Always 0x00
-    packet_index: int  # Packet index
-    byte_05: int  # Always 0x00
-    byte_06_07: int  # Unknown field (little endian)
-    rgb_data: List[Tuple[int, int, int]]  # RGB pixel values
-    raw_data: bytes
-
-def parse_hex_string(hex_str: str) -> bytes:
-    """Parse colon-separated hex string into bytes"""
-    return bytes(int(x, 16) for x in hex_str.split(':'))
-
-def parse_init_packet(data: bytes) -> InitPacket:
-    """Parse initialization packet (0xa9)"""
-    if len(data) < 12:
-        raise ValueError(f"Init packet too short: {len(data)} bytes")
-
-    return InitPacket(
-        byte_00=data[0],
-        byte_01=data[1],
-        byte_02=data[2],
-        byte_03=data[3],
-        byte_04_05=data[4] | (data[5] << 8),
-        byte_06_07=data[6] | (data[7] << 8),
-        byte_08=data[8],
-        byte_09=data[9],
-        byte_10=data[10],
-        byte_11=data[11],
-        raw_data=data
-    )
-
-def parse_data_packet(data: bytes) -> DataPacket:
-    """Parse data packet (0x29)"""
-    if len(data) < 8:
-        raise ValueError(f"Data packet too short: {len(data)} bytes")
-
-    # Extract RGB data starting from byte 8
-    rgb_data = []
-    for i in range(8, len(data), 3):
-        if i + 2 < len(data):
-            rgb_data.append((data[i], data[i+1], data[i+2]))
-
-    return DataPacket(
-        byte_00=data[0],
-        byte_01=data[1],
-        byte_02=data[2],
-        byte_03=data[3],
-        packet_index=data[4],
-        byte_05=data[5],
-        byte_06_07=data[6] | (data[7] << 8),
-        rgb_data=rgb_data,
-        raw_data=data
-    )
+from typing import Dict, Iterator, List
 
-def extract_packets_from_capture(capture_file: Path) -> List[Packet]:
-    """Extract relevant packets from a USB capture file"""
-    packets = []
+from pydynatab.batch import analyze_corpus
+from pydynatab.cache import iter_cached_packets
+from pydynatab.protocol import Packet, parse_data_packet, parse_init_packet
+from pydynatab.validate import static_data_errors, static_init_errors
 
-    with open(capture_file, 'r') as f:
-        data = json.load(f)
+def iter_packets_from_capture(capture_file: Path) -> Iterator[Packet]:
+    """Stream init (0xa9) and data (0x29) packets from a USB capture file (via its .dtcap cache)"""
+    return iter_cached_packets(capture_file)
 
-    for entry in data:
-        try:
-            layers = entry['_source']['layers']
-
-            # Look for Setup Data with data_fragment
-            if 'Setup Data' in layers and 'usb.data_fragment' in layers['Setup Data']:
-                hex_data = layers['Setup Data']['usb.data_fragment']
-                packet_data = parse_hex_string(hex_data)
-
-                if len(packet_data) > 0:
-                    packet_type = packet_data[0]
-                    if packet_type in [0xa9, 0x29]:
-                        packets.append(Packet(
-                            packet_type=f"0x{packet_type:02x}",
-                            frame_number=int(layers['frame']['frame.number']),
-                            timestamp=layers['frame']['frame.time'],
-                            data=packet_data
-                        ))
-        except (KeyError, ValueError) as e:
-            # Skip packets that don't have the expected structure
-            continue
-
-    return packets
+def extract_packets_from_capture(capture_file: Path) -> List[Packet]:
+    """Extract relevant packets from a USB capture file"""
+    return list(iter_packets_from_capture(capture_file))
 
 def analyze_capture(capture_file: Path) -> Dict:
     """Analyze a single capture file"""
@@ -133,11 +31,14 @@ def analyze_capture(capture_file: Path) -> Dict:
         'protocol_compliant': True
     }
 
-    packets = extract_packets_from_capture(capture_file)
-
-    # Separate init and data packets
-    init_packets = [p for p in packets if p.packet_type == '0xa9']
-    data_packets = [p for p in packets if p.packet_type == '0x29']
+    # Separate init and data packets as they stream in
+    init_packets = []
+    data_packets = []
+    for p in iter_packets_from_capture(capture_file):
+        if p.packet_type == '0xa9':
+            init_packets.append(p)
+        else:
+            data_packets.append(p)
 
     # Validate init packet
     if len(init_packets) == 0:
@@ -161,14 +62,9 @@ def analyze_capture(capture_file: Path) -> Dict:
             }
 
             # Validate standard fields
-            if init.byte_01 != 0x00:
-                result['errors'].append(f"Init byte[1] should be 0x00, got 0x{init.byte_01:02x}")
-                result['protocol_compliant'] = False
-            if init.byte_02 != 0x01:
-                result['errors'].append(f"Init byte[2] should be 0x01, got 0x{init.byte_02:02x}")
-                result['protocol_compliant'] = False
-            if init.byte_03 != 0x00:
-                result['errors'].append(f"Init byte[3] should be 0x00, got 0x{init.byte_03:02x}")
+            errors = static_init_errors(init)
+            if errors:
+                result['errors'].extend(errors)
                 result['protocol_compliant'] = False
 
             # Calculate expected pixel count
@@ -186,17 +82,9 @@ def analyze_capture(capture_file: Path) -> Dict:
             data = parse_data_packet(pkt.data)
 
             # Validate standard fields
-            if data.byte_01 != 0x00:
-                result['errors'].append(f"Data packet {i} byte[1] should be 0x00")
-                result['protocol_compliant'] = False
-            if data.byte_02 != 0x01:
-                result['errors'].append(f"Data packet {i} byte[2] should be 0x01")
-                result['protocol_compliant'] = False
-            if data.byte_03 != 0x00:
-                result['errors'].append(f"Data packet {i} byte[3] should be 0x00")
-                result['protocol_compliant'] = False
-            if data.packet_index != i:
-                result['errors'].append(f"Data packet {i} has wrong index: {data.packet_index}")
+            errors = static_data_errors(i, data)
+            if errors:
+                result['errors'].extend(errors)
                 result['protocol_compliant'] = False
 
             total_pixels += len(data.rgb_data)
@@ -205,7 +93,7 @@ def analyze_capture(capture_file: Path) -> Dict:
                 'index': data.packet_index,
                 'frame': pkt.frame_number,
                 'pixel_count': len(data.rgb_data),
-                'pixels': data.rgb_data[:5],  # First 5 pixels for inspection
+                'pixels': [tuple(p) for p in data.rgb_data[:5].tolist()],  # First 5 pixels for inspection
                 'byte_06_07': f"0x{data.byte_06_07:04x}"
             })
 
@@ -261,6 +149,11 @@ def identify_test_case(filename: str) -> str:
 
 def main():
     """Main analysis function"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='worker processes (default: one per CPU core)')
+    args = parser.parse_args()
+
     usbpcap_dir = Path('/home/user/PSDynaTab/usbPcap')
 
     # Find all static picture test files from 2026-01-17
@@ -275,7 +168,9 @@ def main():
     print("=" * 80)
     print()
 
-    results = {}
+    # Analyze new or changed captures across a process pool; reuse stored results for the rest
+    results = dict(zip((f.name for f in picture_files),
+                       analyze_corpus(analyze_capture, picture_files, args.jobs)))
 
     for capture_file in picture_files:
         test_case = identify_test_case(capture_file.name)
@@ -284,8 +179,7 @@ def main():
         print(f"Test Case: {test_case}")
         print('=' * 80)
 
-        result = analyze_capture(capture_file)
-        results[capture_file.name] = result
+        result = results[capture_file.name]
 
         # Print init packet info
         if result['init_packet']:
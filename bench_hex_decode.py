@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: decoding usb.data_fragment hex strings."""
+
+import sys
+import timeit
+
+from pydynatab.capture import iter_fragments
+from pydynatab.hexdata import decode_fragments, parse_hex_fragment
+from pydynatab.protocol import PACKET_SIZE
+
+def per_token_bytes(fragments):
+    """Previous analyze_static_picture_tests.parse_hex_string"""
+    return [bytes(int(x, 16) for x in s.split(':')) for s in fragments]
+
+def per_token_list(fragments):
+    """Previous analyze_picture_tests.parse_hex_data"""
+    return [[int(x, 16) for x in s.split(':')] for s in fragments]
+
+def per_fragment_fromhex(fragments):
+    return [parse_hex_fragment(s) for s in fragments]
+
+def bulk_decode(fragments):
+    return decode_fragments(fragments)
+
+def main():
+    filename = sys.argv[1] if len(sys.argv) > 1 else \
+        '/home/user/PSDynaTab/usbPcap/validation-anim-basic-21frame-maximumUnknown.json'
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    fragments = list(iter_fragments(filename))
+    total_bytes = len(fragments) * PACKET_SIZE
+
+    print("=" * 80)
+    print("HEX FRAGMENT DECODE BENCHMARK")
+    print("=" * 80)
+    print(f"Capture:   {filename}")
+    print(f"Fragments: {len(fragments)} (~{total_bytes} bytes), best of 5 x {repeat} runs")
+    print()
+
+    # Every strategy must agree before we time anything
+    expected = per_token_bytes(fragments)
+    assert per_fragment_fromhex(fragments) == expected
+    buffer, offsets = bulk_decode(fragments)
+    assert buffer == b''.join(expected)
+
+    candidates = [
+        ("int() per token -> bytes", per_token_bytes),
+        ("int() per token -> list", per_token_list),
+        ("bytes.fromhex per fragment", per_fragment_fromhex),
+        ("lookup table bulk buffer", bulk_decode),
+    ]
+
+    baseline = None
+    print(f"{'Strategy':30s} {'ms/run':>10s} {'MB/s':>10s} {'speedup':>10s}")
+    print("-" * 80)
+    for name, func in candidates:
+        seconds = min(timeit.repeat(lambda: func(fragments), number=repeat, repeat=5)) / repeat
+        if baseline is None:
+            baseline = seconds
+        print(f"{name:30s} {seconds * 1e3:10.3f} {total_bytes / seconds / 1e6:10.1f} {baseline / seconds:9.1f}x")
+
+if __name__ == '__main__':
+    main()
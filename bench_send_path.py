@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Benchmark: full-frame send path against the virtual device, no hardware needed.
+
+The emulated device takes [latency] ms per report and stalls a report sent
+less than [gap] ms after the previous one.
+
+    ./bench_send_path.py [frames] [latency ms] [gap ms]
+"""
+
+import asyncio
+import sys
+import time
+
+import numpy as np
+
+from pydynatab.emulator import VirtualDynaTab
+from pydynatab.encode import PIXEL_BYTES, FrameEncoder
+from pydynatab.transport import AdaptivePacer, AsyncTransport, sweep_min_gap
+
+SWEEP_GAPS = [i / 2000 for i in range(11)]  # 0 to 5 ms in 0.5 ms steps
+
+def send_psdynatab(device, images):
+    """Send-DynaTabImage pacing: 5 ms after every report, 10 ms after the init"""
+    encoder = FrameEncoder(feature_reports=True)
+    for image in images:
+        device.set_feature(b'\x00' + encoder.init)
+        time.sleep(0.005)
+        time.sleep(0.010)
+        for report in encoder.encode(image):
+            device.set_feature(report)
+            time.sleep(0.005)
+
+async def send_adaptive(device, images):
+    """AsyncTransport at the swept minimum gap, encoding overlapped with sending"""
+    encoder = FrameEncoder(feature_reports=True)
+    reports = [b'\x00' + encoder.init] + [bytes(r) for r in encoder.encode(images[0])]
+
+    def check():
+        ok = device.stats().dropped == 0
+        device.reset_stats()
+        return ok
+
+    gap = await sweep_min_gap(device, SWEEP_GAPS, reports, check)
+    print(f"Swept minimum gap: {gap * 1000:.1f} ms")
+    transport = AsyncTransport(device, AdaptivePacer(min_gap=gap))
+    try:
+        start = time.perf_counter()
+        await transport.stream_frames(images)
+        return time.perf_counter() - start
+    finally:
+        transport.close()
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.001
+    min_interval = float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.002
+
+    rng = np.random.default_rng(0)
+    images = [rng.integers(0, 256, size=PIXEL_BYTES, dtype=np.uint8) for _ in range(frames)]
+
+    print("=" * 80)
+    print("SEND PATH BENCHMARK (virtual device)")
+    print("=" * 80)
+    print(f"Frames: {frames}, device latency {latency * 1000:.2f} ms per report, "
+          f"needs {min_interval * 1000:.2f} ms between reports")
+    print()
+
+    results = []
+    device = VirtualDynaTab(latency=latency, min_interval=min_interval, stall=True)
+    start = time.perf_counter()
+    send_psdynatab(device, images)
+    results.append(('psdynatab', time.perf_counter() - start, device.stats()))
+
+    device = VirtualDynaTab(latency=latency, min_interval=min_interval, stall=True)
+    elapsed = asyncio.run(send_adaptive(device, images))
+    results.append(('adaptive', elapsed, device.stats()))
+
+    print()
+    print(f"{'pacing':15s} {'seconds':>8s} {'frames/s':>9s} {'reports/s':>10s} {'device busy':>12s}")
+    for name, elapsed, stats in results:
+        assert stats.frames == frames and stats.dropped == 0
+        print(f"{name:15s} {elapsed:8.3f} {frames / elapsed:9.1f} {stats.reports / elapsed:10.0f} "
+              f"{stats.busy / elapsed:11.0%}")
+    print(f"\nSpeed-up: {results[0][1] / results[1][1]:.1f}x")
+
+if __name__ == '__main__':
+    main()
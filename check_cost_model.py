@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Fit and check the upload cost model used by the update planner.
+
+Measures every upload (init packet + data packets) in the official-software
+captures, fits init_time and packet_time, and lists how far the fitted and
+the built-in models are from each recorded upload. Ends with the strategy
+each model picks for a few typical updates.
+
+    ./check_cost_model.py                  # every capture in usbPcap/
+    ./check_cost_model.py usbPcap/2026-01-17-picture-*.json
+"""
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+from pydynatab.planner import (CAPTURED_COSTS, PSDYNATAB_COSTS, fit_cost_model,
+                               iter_uploads, plan_update, prediction_errors)
+
+def example_updates():
+    """(name, previous, current) screen pairs"""
+    blank = np.zeros((9, 60, 3), dtype=np.uint8)
+    examples = []
+    image = blank.copy()
+    image[4, 30] = 255
+    examples.append(('one pixel', blank, image))
+    image = blank.copy()
+    image[1:8, 10:15] = 255
+    examples.append(('one 5x7 character', blank, image))
+    image = blank.copy()
+    image[0, 0] = image[8, 59] = 255
+    examples.append(('two opposite corners', blank, image))
+    image = blank.copy()
+    image[1:8, 2:7] = image[1:8, 53:58] = 255
+    examples.append(('first and last character', blank, image))
+    examples.append(('whole screen', blank, np.full_like(blank, 255)))
+    return examples
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('captures', nargs='*', help='captures to measure (default: usbPcap/*.json)')
+    args = parser.parse_args()
+    captures = args.captures or [p for p in sorted(Path(__file__).resolve().parent.glob('usbPcap/*.json'))
+                                 if 'test-1' not in p.name]
+
+    uploads = {capture: list(iter_uploads(capture)) for capture in captures}
+    every = [u for found in uploads.values() for u in found]
+    fitted = fit_cost_model(every)
+    models = (('fitted', fitted), ('captured', CAPTURED_COSTS), ('psdynatab', PSDYNATAB_COSTS))
+
+    print(f"{len(every)} uploads in {len(captures)} captures")
+    for name, model in models:
+        print(f"  {name:10s} init {model.init_time * 1000:6.1f} ms + {model.packet_time * 1000:4.2f} ms/packet")
+
+    print("\n" + "=" * 80)
+    print(f"{'capture':50s} {'uploads':>7s} {'fitted':>9s} {'captured':>9s}  (mean |error| ms)")
+    print("=" * 80)
+    for capture, found in uploads.items():
+        if not found:
+            continue
+        errors = [np.abs(prediction_errors(model, found)).mean() * 1000 for _, model in models[:2]]
+        print(f"{Path(capture).name[:50]:50s} {len(found):7d} {errors[0]:9.1f} {errors[1]:9.1f}")
+    errors = np.abs(prediction_errors(fitted, every)) * 1000
+    print(f"\nFitted model: median error {np.median(errors):.1f} ms, max {errors.max():.1f} ms")
+
+    print("\n" + "=" * 80)
+    print("Planned strategies (predicted ms: full / region / regions)")
+    print("=" * 80)
+    for name, previous, current in example_updates():
+        for model_name, model in models[1:]:
+            plan = plan_update(previous, current, model)
+            times = " / ".join(f"{plan.alternatives[s] * 1000:5.0f}" for s in ('full', 'region', 'regions'))
+            print(f"{name:25s} {model_name:10s} {plan.strategy:8s} {len(plan.rects)} upload(s)  {times}")
+
+if __name__ == '__main__':
+    main()
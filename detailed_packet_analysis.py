@@ -3,18 +3,15 @@
 Detailed analysis of packet structure to understand pixel position encoding.
 """
 
-import json
 import os
 
-def parse_hex_data(hex_string):
-    """Convert colon-separated hex string to list of integers."""
-    return [int(x, 16) for x in hex_string.split(':')]
+from pydynatab.capture import iter_layers
+from pydynatab.hexdata import parse_hex_fragment
+from pydynatab.protocol import (OPCODE_DATA, OPCODE_INIT, non_black_pixels,
+                                packet_pixels)
 
 def analyze_packet_structure(filepath):
     """Analyze packet structure in detail."""
-    with open(filepath, 'r') as f:
-        data = json.load(f)
-
     filename = os.path.basename(filepath)
     print(f"\n{'='*100}")
     print(f"File: {filename}")
@@ -22,15 +19,14 @@ def analyze_packet_structure(filepath):
 
     set_report_packets = []
 
-    for packet in data:
+    for layers in iter_layers(filepath):
         try:
-            layers = packet['_source']['layers']
             if 'Setup Data' in layers:
                 setup = layers['Setup Data']
                 if 'usbhid.setup.bRequest' in setup and setup['usbhid.setup.bRequest'] == '0x09':
                     if 'usb.data_fragment' in setup:
                         hex_data = setup['usb.data_fragment']
-                        data_bytes = parse_hex_data(hex_data)
+                        data_bytes = parse_hex_fragment(hex_data)
                         set_report_packets.append(data_bytes)
         except (KeyError, ValueError):
             continue
@@ -55,7 +51,7 @@ def analyze_packet_structure(filepath):
         print(f"  First 20 bytes: {hex_view}")
 
         # Decode based on command type
-        if cmd == 0xa9:  # Start/header packet
+        if cmd == OPCODE_INIT:  # Start/header packet
             print("  Type: START/HEADER packet")
             print(f"    Bytes [0-1]: {data_bytes[0]:02x} {data_bytes[1]:02x} (cmd + reserved)")
             print(f"    Bytes [2-3]: {data_bytes[2]:02x} {data_bytes[3]:02x} (packet counter = {pkt_num})")
@@ -69,7 +65,7 @@ def analyze_packet_structure(filepath):
                 dim4 = data_bytes[11]
                 print(f"    Bytes [8-11]: {dim1:02x} {dim2:02x} {dim3:02x} {dim4:02x} (possibly dimensions: {dim1}x{dim2}, {dim3}x{dim4})")
 
-        elif cmd == 0x29:  # Data packet
+        elif cmd == OPCODE_DATA:  # Data packet
             print("  Type: DATA packet")
             print(f"    Bytes [0-1]: {data_bytes[0]:02x} {data_bytes[1]:02x} (cmd + reserved)")
             print(f"    Bytes [2-3]: {data_bytes[2]:02x} {data_bytes[3]:02x} (packet counter = {pkt_num})")
@@ -77,14 +73,10 @@ def analyze_packet_structure(filepath):
 
             # Look for RGB pixel data starting at byte 8
             print("    Pixel data (RGB triplets):")
-            non_zero_pixels = []
-            for j in range(8, len(data_bytes) - 2, 3):
-                r, g, b = data_bytes[j], data_bytes[j+1], data_bytes[j+2]
-                if r != 0 or g != 0 or b != 0:
-                    pixel_pos = (j - 8) // 3
-                    non_zero_pixels.append((pixel_pos, r, g, b))
-                    if len(non_zero_pixels) <= 10:  # Show first 10 non-zero pixels
-                        print(f"      Pixel {pixel_pos}: RGB({r:3d}, {g:3d}, {b:3d}) at bytes [{j}:{j+3}]")
+            non_zero_pixels = non_black_pixels(packet_pixels(data_bytes))
+            for pixel_pos, (r, g, b) in non_zero_pixels[:10]:  # Show first 10 non-zero pixels
+                j = 8 + pixel_pos * 3
+                print(f"      Pixel {pixel_pos}: RGB({r:3d}, {g:3d}, {b:3d}) at bytes [{j}:{j+3}]")
 
             if len(non_zero_pixels) > 10:
                 print(f"      ... and {len(non_zero_pixels) - 10} more non-zero pixels")
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Run the display daemon: own the DynaTab screen and serve frame updates.
+
+Clients send regions of pixels over a Unix socket (see pydynatab.daemon);
+bursts collapse so only the newest pixels of every region are sent.
+
+    ./dynatab_daemon.py                          # first DynaTab hidraw node
+    ./dynatab_daemon.py --device /dev/hidraw3 --socket /run/user/1000/dynatab.sock
+    ./dynatab_daemon.py --all                    # every connected board shows the same screen
+    ./dynatab_daemon.py --emulate                # virtual device, for testing clients
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import sys
+from pathlib import Path
+
+from pydynatab.daemon import DisplayDaemon
+from pydynatab.emulator import VirtualDynaTab
+from pydynatab.planner import CAPTURED_COSTS
+from pydynatab.pool import DevicePool, open_pool
+from pydynatab.transport import AdaptivePacer, AsyncTransport, HidrawDevice, find_hidraw
+
+def default_socket():
+    runtime = os.environ.get('XDG_RUNTIME_DIR', '/tmp')
+    return Path(runtime) / 'dynatab.sock'
+
+async def serve(transport, args):
+    daemon = DisplayDaemon(transport, cost=CAPTURED_COSTS.rect_time)
+    await daemon.start(args.socket)
+    print(f"Listening on {args.socket}")
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+    await daemon.stop()
+    transport.close()
+    stats = daemon.stats
+    print(f"{stats.updates} updates, {stats.sends} sends ({stats.coalesced} coalesced), "
+          f"latency mean {stats.mean_latency * 1000:.1f} ms, max {stats.max_latency * 1000:.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--socket', type=Path, default=default_socket(), help='Unix socket to listen on')
+    parser.add_argument('--device', type=Path, help='hidraw node (default: first DynaTab screen interface)')
+    parser.add_argument('--gap', type=float, default=5.0, help='minimum gap between reports in ms (default: 5)')
+    parser.add_argument('--all', action='store_true', help='drive every connected board as one pool')
+    parser.add_argument('--emulate', type=int, nargs='?', const=1, default=0, metavar='BOARDS',
+                        help='drive virtual devices instead of hardware (default: 1)')
+    args = parser.parse_args()
+
+    def pacer():
+        return AdaptivePacer(min_gap=args.gap / 1000)
+
+    if args.emulate:
+        transport = DevicePool({f'virtual{i}': VirtualDynaTab() for i in range(args.emulate)}, pacer)
+    elif args.all:
+        try:
+            transport = open_pool(pacer=pacer)
+        except OSError as e:
+            sys.exit(str(e))
+        print(f"Driving {len(transport)} board(s): {', '.join(transport.devices)}")
+    else:
+        path = args.device or next(iter(find_hidraw()), None)
+        if path is None:
+            sys.exit("No DynaTab 75X screen interface found (is it connected via USB?)")
+        transport = AsyncTransport(HidrawDevice(path), pacer())
+    asyncio.run(serve(transport, args))
+
+if __name__ == '__main__':
+    main()
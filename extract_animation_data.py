@@ -1,13 +1,11 @@
 #!/usr/bin/env python3
 """Extract and analyze animation data from Wireshark JSON."""
 
-import json
-import re
 import sys
 
-def parse_hex_fragment(fragment_str):
-    """Parse colon-separated hex string to bytes."""
-    return bytes.fromhex(fragment_str.replace(':', ''))
+from pydynatab.capture import iter_fragment_packets
+from pydynatab.protocol import (OPCODE_DATA, OPCODE_INIT, color_name,
+                                non_black_pixels, packet_pixels)
 
 def analyze_init_packet(packet_data):
     """Analyze the init packet (0xa9) for position encoding."""
@@ -15,7 +13,7 @@ def analyze_init_packet(packet_data):
         return None
 
     opcode = packet_data[0]
-    if opcode != 0xa9:
+    if opcode != OPCODE_INIT:
         return None
 
     return {
@@ -40,7 +38,7 @@ def analyze_data_packet(packet_data):
         return None
 
     opcode = packet_data[0]
-    if opcode != 0x29:
+    if opcode != OPCODE_DATA:
         return None
 
     # Header bytes
@@ -55,38 +53,14 @@ def analyze_data_packet(packet_data):
         'byte7': f'0x{packet_data[7]:02x}',
     }
 
-    # Pixel data starts at byte 8
-    pixel_data = packet_data[8:]
-
-    # Parse RGB pixels (3 bytes each)
-    pixels = []
-    for i in range(0, len(pixel_data), 3):
-        if i + 2 < len(pixel_data):
-            r = pixel_data[i]
-            g = pixel_data[i+1]
-            b = pixel_data[i+2]
-
-            # Skip all-black pixels
-            if r != 0 or g != 0 or b != 0:
-                color_name = ""
-                if (r, g, b) == (0xff, 0x00, 0x00):
-                    color_name = "Bright Red"
-                elif (r, g, b) == (0x7f, 0x00, 0x00):
-                    color_name = "Dark Red"
-                elif (r, g, b) == (0x00, 0xff, 0x00):
-                    color_name = "Green"
-                elif (r, g, b) == (0x00, 0x00, 0xff):
-                    color_name = "Blue"
-                else:
-                    color_name = "Other"
-
-                pixels.append({
-                    'position': i // 3,
-                    'r': r,
-                    'g': g,
-                    'b': b,
-                    'name': color_name
-                })
+    # Pixel data starts at byte 8; skip all-black pixels
+    pixels = [{
+        'position': idx,
+        'r': r,
+        'g': g,
+        'b': b,
+        'name': color_name(r, g, b, default="Other")
+    } for idx, (r, g, b) in non_black_pixels(packet_pixels(packet_data))]
 
     return {
         'header': header,
@@ -98,13 +72,7 @@ def main():
         '/home/user/PSDynaTab/usbPcap/2026-01-17-animation-4frame-ff-00-00-00-ff-00-00-00-ff-7f-00-00-connected-corners-1pixel-each.json'
 
     # Extract data fragments from JSON
-    data_fragments = []
-
-    with open(filename, 'r') as f:
-        content = f.read()
-        # Find all usb.data_fragment entries
-        fragments = re.findall(r'"usb\.data_fragment":\s*"([^"]+)"', content)
-        data_fragments = fragments
+    data_fragments = list(iter_fragment_packets(filename))
 
     print("=" * 80)
     print("ANIMATION CAPTURE ANALYSIS - POSITION ENCODING")
@@ -116,17 +84,16 @@ def main():
     init_packets = []
     data_packets = []
 
-    for frag in data_fragments:
-        packet_bytes = parse_hex_fragment(frag)
+    for packet_bytes in data_fragments:
         if len(packet_bytes) > 0:
             opcode = packet_bytes[0]
 
-            if opcode == 0xa9:
+            if opcode == OPCODE_INIT:
                 init_info = analyze_init_packet(packet_bytes)
                 if init_info:
                     init_packets.append(init_info)
 
-            elif opcode == 0x29:
+            elif opcode == OPCODE_DATA:
                 data_info = analyze_data_packet(packet_bytes)
                 if data_info:
                     data_packets.append(data_info)
@@ -1,48 +1,24 @@
 #!/usr/bin/env python3
 """Final comprehensive position and color rotation analysis."""
 
-import json
-import re
 import sys
 
-def parse_hex_fragment(fragment_str):
-    """Parse colon-separated hex string to bytes."""
-    return bytes.fromhex(fragment_str.replace(':', ''))
-
-def color_name(r, g, b):
-    """Get color name from RGB values."""
-    if (r, g, b) == (0xff, 0x00, 0x00):
-        return "Bright Red"
-    elif (r, g, b) == (0x7f, 0x00, 0x00):
-        return "Dark Red"
-    elif (r, g, b) == (0x00, 0xff, 0x00):
-        return "Green"
-    elif (r, g, b) == (0x00, 0x00, 0xff):
-        return "Blue"
-    elif (r, g, b) == (0x00, 0x7f, 0x00):
-        return "Green (127)" # Half-brightness green
-    else:
-        return f"RGB({r:02x},{g:02x},{b:02x})"
+from pydynatab.cache import iter_cached_payloads
+from pydynatab.protocol import (color_name, find_init_packet, frame_pixels,
+                                group_frames, non_black_pixels, pixel_xy)
 
 def main():
     filename = sys.argv[1] if len(sys.argv) > 1 else \
         '/home/user/PSDynaTab/usbPcap/2026-01-17-animation-4frame-ff-00-00-00-ff-00-00-00-ff-7f-00-00-connected-corners-1pixel-each.json'
 
-    with open(filename, 'r') as f:
-        content = f.read()
-        fragments = re.findall(r'"usb\.data_fragment":\s*"([^"]+)"', content)
+    packets = list(iter_cached_payloads(filename))
 
     print("=" * 80)
     print("ANIMATION CAPTURE ANALYSIS - POSITION ENCODING & COLOR ROTATION")
     print("=" * 80)
 
     # Find init packet
-    init_packet = None
-    for frag in fragments:
-        packet = parse_hex_fragment(frag)
-        if packet[0] == 0xa9:
-            init_packet = packet
-            break
+    init_packet = find_init_packet(packets)
 
     if init_packet:
         print("\n1. INIT PACKET (0xa9) - POSITION ENCODING")
@@ -71,22 +47,15 @@ def main():
         print(f"  Bottom-Left:  ({x}, {y+h-1})   = Linear index {(y+h-1)*60 + x}")
         print(f"  Bottom-Right: ({x+w-1}, {y+h-1}) = Linear index {(y+h-1)*60 + (x+w-1)}")
 
-    # Organize data packets by frame
-    frames = {}
-    for frag in fragments:
-        packet = parse_hex_fragment(frag)
-        if packet[0] == 0x29:
-            frame_num = packet[1]
-            if frame_num not in frames:
-                frames[frame_num] = []
-            frames[frame_num].append(packet)
+    # Organize data packets by frame, sorted by sequence
+    frames = group_frames(packets)
 
     print("\n2. DATA PACKETS (0x29) - PIXEL DATA")
     print("-" * 80)
 
     # Analyze first data packet header
     if frames:
-        first_frame_packets = sorted(frames[min(frames.keys())], key=lambda p: p[4])
+        first_frame_packets = frames[min(frames.keys())]
         if first_frame_packets:
             p = first_frame_packets[0]
             print("\nData packet header format (example from first packet):")
@@ -107,32 +76,23 @@ def main():
     frame_data = {}
 
     for frame_num in sorted(frames.keys()):
-        packets = sorted(frames[frame_num], key=lambda p: p[4])
-
         # Reconstruct frame
-        frame_pixels = []
-        for packet in packets:
-            pixel_data = packet[8:]
-            for i in range(0, len(pixel_data), 3):
-                if i + 2 < len(pixel_data):
-                    frame_pixels.append((pixel_data[i], pixel_data[i+1], pixel_data[i+2]))
+        pixels = frame_pixels(frames[frame_num])
 
         # Find non-black pixels
         frame_data[frame_num] = {}
-        for idx, (r, g, b) in enumerate(frame_pixels):
-            if r != 0 or g != 0 or b != 0:
-                x = idx % 60
-                y = idx // 60
-                all_active_positions.add((x, y, idx))
-                frame_data[frame_num][(x, y, idx)] = (r, g, b)
+        for idx, rgb in non_black_pixels(pixels):
+            x, y = pixel_xy(idx)
+            all_active_positions.add((x, y, idx))
+            frame_data[frame_num][(x, y, idx)] = rgb
 
     # Display active positions
     print(f"\nActive pixel positions (found across all frames):")
     for x, y, idx in sorted(all_active_positions):
         print(f"  Position ({x:2d}, {y}) = Linear index {idx:3d}")
 
-    print(f"\nNote: Frame data only contains {len(frame_pixels)} pixels (expected 540).")
-    print(f"      Missing pixels {len(frame_pixels)}-539 (last {540 - len(frame_pixels)} pixels)")
+    print(f"\nNote: Frame data only contains {len(pixels)} pixels (expected 540).")
+    print(f"      Missing pixels {len(pixels)}-539 (last {540 - len(pixels)} pixels)")
 
     print("\n4. FRAME-BY-FRAME COLOR ROTATION PATTERN")
     print("-" * 80)
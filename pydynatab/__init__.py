@@ -0,0 +1,147 @@
+"""
+pydynatab - shared helpers for the DynaTab 75X USB capture analysis scripts.
+
+animation compiler packing frames into animation uploads
+batch     process-pool runner for per-capture analyses, with stored results
+cache     memory-mapped .dtcap binary cache of parsed captures
+capture   streaming readers for Wireshark JSON exports (and pcap dispatch)
+daemon    Unix-socket display service collapsing updates from many clients
+emulator  in-process virtual DynaTab accepting feature reports
+encode    frame encoder producing init and data packets
+font      cached glyph-atlas text rasterizer (CP437 5x7 font)
+hexdata   fast decoding of colon-separated usb.data_fragment strings
+image     image to pixel data: box resize, reorder, raw buffers
+index     SQLite index of payload header fields across captures
+manifest  size/mtime/SHA-256 entries for incremental processing
+pcap      native USBPcap pcap/pcapng reader
+planner   upload cost model choosing full, single- or multi-region updates
+pool      device pool fanning one encoded stream out to several boards
+protocol  packet model, opcode registry and pixel extraction
+scan      memory-mapped bytes-regex scanner for data fragments
+schedule  deadline scheduler holding animation frame rates
+solver    brute-force search for header field formulas
+sparse    dirty-rectangle encoder sending only changed regions
+store     memory-mapped packet store indexed by (frame, sequence)
+transport asyncio hidraw feature-report transport with adaptive pacing
+validate  checksum, sequence and completeness checks (batch and live)
+
+Requires NumPy; pixel payloads are returned as (N, 3) uint8 arrays.
+"""
+
+from .animation import Animation, compile_animation
+from .batch import analyze_corpus, analyze_files
+from .cache import (iter_cached_packets, iter_cached_payloads, load_capture,
+                    load_payload_array, read_cache, write_cache)
+from .capture import (iter_entries, iter_fragment_packets, iter_fragments,
+                      iter_hid_requests, iter_layers, iter_packets,
+                      read_fragment_buffer)
+from .daemon import DisplayClient, DisplayDaemon
+from .emulator import VirtualDynaTab
+from .encode import FrameEncoder, init_packet
+from .font import TextRenderer, load_font, render_text
+from .hexdata import decode_fragment_array, decode_fragments, parse_hex_fragment
+from .image import image_stream, raw_image, to_screen
+from .index import index_captures, open_index
+from .pcap import is_pcap, iter_pcap_requests
+from .planner import CostModel, fit_cost_model, plan_update
+from .pool import DevicePool, open_pool
+from .protocol import (OPCODE_DATA, OPCODE_INIT, OPCODES, DataPacket,
+                       HidRequest, InitPacket, Packet, color_histogram,
+                       color_name, corner_pixels, decode_packet,
+                       find_init_packet, frame_pixels, group_frames,
+                       lit_indices, non_black_pixels, packet_pixels,
+                       parse_data_packet, parse_init_packet, payload_stream,
+                       pixel_index, pixel_xy, stream_image)
+from .scan import scan_fragments
+from .schedule import FrameScheduler, ScheduleStats
+from .solver import load_corpus, solve
+from .sparse import SparseEncoder, apply_packets, dirty_rects
+from .store import PacketStore
+from .transport import AdaptivePacer, AsyncTransport, HidrawDevice, find_hidraw
+from .validate import (Issue, StreamValidator, check_packet_array,
+                       checksum_ok, packet_checksum, validate_packets)
+
+__all__ = [
+    'OPCODE_DATA',
+    'OPCODE_INIT',
+    'OPCODES',
+    'AdaptivePacer',
+    'Animation',
+    'AsyncTransport',
+    'CostModel',
+    'DataPacket',
+    'DevicePool',
+    'DisplayClient',
+    'DisplayDaemon',
+    'FrameEncoder',
+    'FrameScheduler',
+    'HidRequest',
+    'HidrawDevice',
+    'InitPacket',
+    'Issue',
+    'Packet',
+    'PacketStore',
+    'ScheduleStats',
+    'SparseEncoder',
+    'StreamValidator',
+    'TextRenderer',
+    'VirtualDynaTab',
+    'analyze_corpus',
+    'analyze_files',
+    'apply_packets',
+    'check_packet_array',
+    'checksum_ok',
+    'color_histogram',
+    'color_name',
+    'compile_animation',
+    'corner_pixels',
+    'decode_fragment_array',
+    'decode_fragments',
+    'decode_packet',
+    'dirty_rects',
+    'find_hidraw',
+    'find_init_packet',
+    'fit_cost_model',
+    'frame_pixels',
+    'group_frames',
+    'image_stream',
+    'index_captures',
+    'init_packet',
+    'is_pcap',
+    'iter_cached_packets',
+    'iter_cached_payloads',
+    'iter_entries',
+    'iter_fragment_packets',
+    'iter_fragments',
+    'iter_hid_requests',
+    'iter_layers',
+    'iter_packets',
+    'iter_pcap_requests',
+    'lit_indices',
+    'load_capture',
+    'load_corpus',
+    'load_font',
+    'load_payload_array',
+    'non_black_pixels',
+    'open_index',
+    'open_pool',
+    'packet_checksum',
+    'packet_pixels',
+    'parse_data_packet',
+    'parse_hex_fragment',
+    'parse_init_packet',
+    'payload_stream',
+    'pixel_index',
+    'pixel_xy',
+    'plan_update',
+    'raw_image',
+    'read_cache',
+    'read_fragment_buffer',
+    'render_text',
+    'scan_fragments',
+    'solve',
+    'stream_image',
+    'to_screen',
+    'validate_packets',
+    'write_cache',
+]
@@ -0,0 +1,151 @@
+"""
+Animation compiler: frame sequences to the smallest animation upload.
+
+An animation is one init packet (byte 2 = frame count, byte 3 = delay in
+ms, bytes 8-11 = region) followed by every frame's data packets, each
+frame numbered in data byte 1 (see ANIMATION_PROTOCOL_EXPLAINED.md). The
+region applies to every frame, so the protocol allows one delta region
+per animation, not one per frame.
+
+compile_animation() shrinks an upload in three steps:
+
+- frames are hashed, and a sequence that repeats a shorter cycle keeps
+  one cycle; runs of identical frames are folded into longer delays
+  where every run allows it (A A B B at 100 ms plays as A B at 200 ms)
+- frames beyond max_frames are resampled evenly, keeping the total
+  duration
+- only the region covering every pixel that changes between frames, or
+  differs from the screen shown before, is sent
+
+Upload time is init overhead plus data packets, so it drops with the
+number of frames and the region size (Animation.upload_time).
+"""
+
+import hashlib
+import math
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .encode import FrameEncoder, init_packet
+from .planner import CAPTURED_COSTS, CostModel
+from .protocol import BYTES_PER_PIXEL, PAYLOAD_SIZE, SCREEN_HEIGHT, SCREEN_WIDTH
+from .sparse import FULL_SCREEN, Rect, rect_bytes, region_stream
+
+MAX_FRAME_COUNT = 21  # largest animation seen working (validation-anim-basic-21frame)
+MAX_DELAY = 0xFF      # byte 3, milliseconds
+
+
+def frame_hashes(frames: np.ndarray) -> List[bytes]:
+    """Digest of each (SCREEN_HEIGHT, SCREEN_WIDTH, 3) frame"""
+    return [hashlib.blake2b(np.ascontiguousarray(frame).tobytes(), digest_size=16).digest()
+            for frame in frames]
+
+
+def fold_frames(frames: np.ndarray, delay: int) -> Tuple[np.ndarray, int]:
+    """Drop repeated frames without changing what the device shows
+
+    A sequence made of a repeated shorter cycle keeps one cycle (the device
+    loops). Runs of identical frames shrink by their common divisor g, the
+    delay growing g times while it still fits byte 3.
+    """
+    hashes = frame_hashes(frames)
+    count = len(hashes)
+    for period in range(1, count):
+        if count % period == 0 and hashes[period:] == hashes[:count - period]:
+            frames, hashes = frames[:period], hashes[:period]
+            break
+
+    starts = [i for i in range(len(hashes)) if i == 0 or hashes[i] != hashes[i - 1]]
+    lengths = np.diff(starts + [len(hashes)])
+    common = math.gcd(*lengths.tolist())
+    factor = max((g for g in range(1, common + 1) if common % g == 0 and delay * g <= MAX_DELAY), default=1)
+    if factor > 1:
+        keep = np.concatenate([np.arange(start, start + length // factor)
+                               for start, length in zip(starts, lengths.tolist())])
+        frames, delay = frames[keep], delay * factor
+    return frames, delay
+
+
+def resample_frames(frames: np.ndarray, delay: int, max_frames: int) -> Tuple[np.ndarray, int]:
+    """At most max_frames evenly spaced frames with the same total duration
+
+    A delay of 0 stays 0; other delays are kept within 1..MAX_DELAY.
+    """
+    count = len(frames)
+    if count <= max_frames:
+        return frames, delay
+    keep = np.arange(max_frames) * count // max_frames
+    if delay:
+        delay = min(MAX_DELAY, max(1, round(count * delay / max_frames)))
+    return frames[keep], delay
+
+
+def animation_rect(frames: np.ndarray, screen: Optional[np.ndarray] = None) -> Optional[Rect]:
+    """Region covering every pixel that changes; None when nothing would
+
+    Without a screen the display contents are unknown and the whole screen
+    is sent.
+    """
+    if screen is None:
+        return FULL_SCREEN
+    changed = (frames != np.asarray(screen, dtype=np.uint8)).any(axis=(0, 3))
+    rows, columns = np.flatnonzero(changed.any(axis=1)), np.flatnonzero(changed.any(axis=0))
+    if not len(columns):
+        return None
+    return int(columns[0]), int(rows[0]), int(columns[-1]) + 1, int(rows[-1]) + 1
+
+
+@dataclass
+class Animation:
+    """Compiled frames, their delay and the region they are uploaded to"""
+    frames: np.ndarray
+    delay: int
+    rect: Optional[Rect]
+    source_frames: int
+
+    @property
+    def byte_count(self) -> int:
+        return 0 if self.rect is None else rect_bytes(self.rect)
+
+    @property
+    def data_packets(self) -> int:
+        return len(self.frames) * -(-self.byte_count // PAYLOAD_SIZE) if self.rect is not None else 0
+
+    def upload_time(self, model: CostModel = CAPTURED_COSTS) -> float:
+        """Predicted seconds to upload the animation"""
+        return model.upload_time(self.data_packets) if self.rect is not None else 0.0
+
+    def packets(self) -> List[bytes]:
+        """Init packet followed by every frame's data packets"""
+        if self.rect is None:
+            return []
+        frame_count = len(self.frames)
+        encoder = FrameEncoder(frame_count, self.delay, self.byte_count)
+        packets = [init_packet(frame_count, self.delay, self.byte_count, *self.rect)]
+        for index, frame in enumerate(self.frames):
+            packets.extend(bytes(p) for p in encoder.encode(region_stream(frame, self.rect), index))
+        return packets
+
+
+def compile_animation(frames: Sequence[np.ndarray], delay: int, screen: Optional[np.ndarray] = None,
+                      max_frames: int = MAX_FRAME_COUNT) -> Animation:
+    """Smallest animation upload playing frames every delay ms
+
+    screen is what the display shows before the upload; pass it to send
+    only the changing region.
+    """
+    if not 0 <= delay <= MAX_DELAY:
+        raise ValueError(f"Delay must be 0..{MAX_DELAY} ms, received {delay}")
+    if not 1 <= max_frames <= 0xFF:
+        raise ValueError(f"max_frames must be 1..255, received {max_frames}")
+    frames = np.asarray(frames, dtype=np.uint8).reshape(-1, SCREEN_HEIGHT, SCREEN_WIDTH, BYTES_PER_PIXEL)
+    if not len(frames):
+        raise ValueError("Animation needs at least one frame")
+    source_frames = len(frames)
+    frames, delay = fold_frames(frames, delay)
+    frames, delay = resample_frames(frames, delay, max_frames)
+    if len(frames) == 1:
+        delay = 0  # a single frame is a static picture
+    return Animation(frames, delay, animation_rect(frames, screen), source_frames)
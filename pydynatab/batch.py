@@ -0,0 +1,140 @@
+"""
+Run a per-capture analysis over many files on a process pool.
+
+The analysis function must be a module-level function (so it can be
+pickled by reference) taking one capture path and returning a picklable
+record - plain dicts, lists, tuples and numbers, not NumPy views into a
+memory map. Results come back in the order the files were given, so
+scripts can build their summary tables exactly as in a serial loop.
+
+analyze_corpus adds a results file next to the captures: each record is
+stored with the capture's manifest entry, and later runs only analyze
+captures that are new or whose content changed. Editing the script that
+defines the analysis function, or any pydynatab module (which the
+analyses mostly delegate to), discards the stored results.
+"""
+
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, TypeVar, Union
+
+from .manifest import FileState, content_changed, file_digest, file_state
+
+T = TypeVar('T')
+PathLike = Union[str, Path]
+
+RESULTS_SUFFIX = '.results'
+
+
+def default_workers(file_count: int) -> int:
+    """One worker per core, but never more workers than files"""
+    return max(1, min(file_count, os.cpu_count() or 1))
+
+
+def analyze_files(analyze: Callable[[PathLike], T], files: Iterable[PathLike],
+                  workers: Optional[int] = None) -> List[T]:
+    """analyze(f) for every file, spread across worker processes
+
+    workers=None uses default_workers(); workers=1 runs in this process.
+    Files are dispatched largest first so one big capture does not end up
+    as the last job, and the results are returned in input order.
+    """
+    files = list(files)
+    if workers is None:
+        workers = default_workers(len(files))
+    if workers <= 1 or len(files) <= 1:
+        return [analyze(f) for f in files]
+
+    by_size = sorted(range(len(files)), key=lambda i: os.path.getsize(files[i]), reverse=True)
+    results: List[Optional[T]] = [None] * len(files)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {i: pool.submit(analyze, files[i]) for i in by_size}
+        for i, future in futures.items():
+            results[i] = future.result()
+    return results
+
+
+@functools.lru_cache(maxsize=None)
+def package_digest() -> str:
+    """Hex SHA-256 over the pydynatab package sources (tests excluded)"""
+    package = Path(__file__).resolve().parent
+    digest = hashlib.sha256()
+    for source in sorted(package.rglob('*.py')):
+        relative = source.relative_to(package)
+        if relative.parts[0] == 'tests':
+            continue
+        digest.update(f'{relative.as_posix()}\0{file_digest(source)}\0'.encode())
+    return digest.hexdigest()
+
+
+def _analysis_key(analyze: Callable) -> Tuple[str, str, str]:
+    """Identifies an analysis function, the version of its source and of pydynatab"""
+    source = inspect.getsourcefile(analyze)
+    return analyze.__qualname__, file_digest(source) if source else '', package_digest()
+
+
+def results_path(analyze: Callable, files: List[Path]) -> Path:
+    """Default results file: <capture dir>/.<script>.<function>.results"""
+    source = inspect.getsourcefile(analyze) or analyze.__module__
+    directory = Path(os.path.commonpath([f.resolve().parent for f in files]))
+    return directory / f'.{Path(source).stem}.{analyze.__qualname__}{RESULTS_SUFFIX}'
+
+
+def _load_results(path: Path, key: Tuple[str, str, str]) -> Dict[str, Tuple[FileState, object]]:
+    try:
+        with open(path, 'rb') as f:
+            saved = pickle.load(f)
+    except Exception:
+        # Missing, truncated or written by an incompatible version: start over
+        return {}
+    if not isinstance(saved, dict) or saved.get('key') != key:
+        return {}
+    return saved['entries']
+
+
+def _save_results(path: Path, key: Tuple[str, str, str], entries: Dict[str, Tuple[FileState, object]]) -> None:
+    tmp = path.with_name(path.name + f'.{os.getpid()}.tmp')
+    try:
+        with open(tmp, 'wb') as f:
+            pickle.dump({'key': key, 'entries': entries}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def analyze_corpus(analyze: Callable[[PathLike], T], files: Iterable[PathLike],
+                   workers: Optional[int] = None,
+                   results_file: Optional[PathLike] = None) -> List[T]:
+    """analyze(f) for every file, reusing stored results for unchanged captures
+
+    Only new and modified files are analyzed (on a process pool, see
+    analyze_files). Entries for files no longer in the corpus are dropped,
+    and the results file is rewritten only when something changed.
+    """
+    files = [Path(f) for f in files]
+    if not files:
+        return []
+    path = Path(results_file) if results_file is not None else results_path(analyze, files)
+    key = _analysis_key(analyze)
+    saved = _load_results(path, key)
+
+    names = [str(f.resolve()) for f in files]
+    states = [file_state(f, saved[name][0] if name in saved else None) for f, name in zip(files, names)]
+    stale = [i for i, (name, state) in enumerate(zip(names, states))
+             if name not in saved or content_changed(saved[name][0], state)]
+
+    fresh = analyze_files(analyze, [files[i] for i in stale], workers)
+    entries = {name: (state, saved[name][1]) for name, state in zip(names, states) if name in saved}
+    entries.update({names[i]: (states[i], result) for i, result in zip(stale, fresh)})
+
+    if entries.keys() != saved.keys() or any(entries[n][0] != saved[n][0] for n in saved) or stale:
+        _save_results(path, key, entries)
+    return [entries[name][1] for name in names]
@@ -0,0 +1,189 @@
+"""
+Binary capture cache (.dtcap) next to each Wireshark JSON export.
+
+The first time a capture is read its HID class requests (Set_Report and
+Get_Report) are extracted from the JSON export or pcap/pcapng file and
+written beside it as
+<capture>.dtcap: a 64-byte header followed by one fixed-stride record per
+request. Later reads memory-map that file instead of parsing JSON. The
+header records the size and mtime of the source export; if either changes
+the cache is rebuilt.
+
+Record layout (little endian, 80 bytes):
+
+  timestamp  int64     frame.time as nanoseconds since the Unix epoch (UTC)
+  frame      uint32    frame.number
+  brequest   uint8     usbhid.setup.bRequest (0x09 Set_Report, 0x01 Get_Report)
+  length     uint8     payload byte count (0 for requests without data)
+  reserved   2 bytes
+  data       64 bytes  usb.data_fragment, zero-padded
+"""
+
+import os
+import struct
+from pathlib import Path
+from typing import Container, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .capture import iter_hid_requests
+from .protocol import OPCODES, PACKET_SIZE, Packet
+
+CACHE_SUFFIX = '.dtcap'
+CACHE_MAGIC = b'DTCAP\0'
+CACHE_VERSION = 1
+
+# magic, version, source size, source mtime (ns), record count
+_HEADER = struct.Struct('<6sHQqQ')
+HEADER_SIZE = 64
+
+RECORD_DTYPE = np.dtype([
+    ('timestamp', '<i8'),
+    ('frame', '<u4'),
+    ('brequest', 'u1'),
+    ('length', 'u1'),
+    ('reserved', 'u1', 2),
+    ('data', 'u1', PACKET_SIZE),
+])
+
+# HID class request codes
+SET_REPORT = 0x09
+GET_REPORT = 0x01
+
+
+def cache_path(capture_file: Union[str, Path]) -> Path:
+    """Location of the .dtcap cache for capture_file"""
+    capture_file = Path(capture_file)
+    return capture_file.with_name(capture_file.name + CACHE_SUFFIX)
+
+
+def _format_timestamps(timestamps: np.ndarray) -> List[str]:
+    """ISO 8601 UTC strings, in the form Wireshark writes frame.time"""
+    return [s + 'Z' for s in np.datetime_as_string(timestamps.view('M8[ns]'), unit='ns').tolist()]
+
+
+def build_records(capture_file: Union[str, Path]) -> np.ndarray:
+    """Extract every HID class request in capture_file as RECORD_DTYPE records"""
+    requests = [r for r in iter_hid_requests(capture_file) if len(r.data) <= PACKET_SIZE]
+    records = np.zeros(len(requests), dtype=RECORD_DTYPE)
+    for record, request in zip(records, requests):
+        record['timestamp'] = request.timestamp_ns
+        record['frame'] = request.frame_number
+        record['brequest'] = request.b_request
+        record['length'] = len(request.data)
+        record['data'][:len(request.data)] = np.frombuffer(request.data, dtype=np.uint8)
+    return records
+
+
+def write_cache(capture_file: Union[str, Path], records: np.ndarray,
+                path: Optional[Union[str, Path]] = None) -> Path:
+    """Write records as the cache of capture_file, atomically replacing any old one"""
+    stat = os.stat(capture_file)
+    path = Path(path) if path is not None else cache_path(capture_file)
+    header = _HEADER.pack(CACHE_MAGIC, CACHE_VERSION, stat.st_size, stat.st_mtime_ns, len(records))
+
+    tmp = path.with_name(path.name + f'.{os.getpid()}.tmp')
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(header.ljust(HEADER_SIZE, b'\0'))
+            f.write(np.ascontiguousarray(records, dtype=RECORD_DTYPE).tobytes())
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    return path
+
+
+def read_cache(capture_file: Union[str, Path],
+               path: Optional[Union[str, Path]] = None) -> Optional[np.ndarray]:
+    """Memory-map the cache of capture_file, or None if missing or stale"""
+    path = Path(path) if path is not None else cache_path(capture_file)
+    try:
+        stat = os.stat(capture_file)
+        with open(path, 'rb') as f:
+            header = f.read(HEADER_SIZE)
+        cache_size = os.path.getsize(path)
+    except OSError:
+        return None
+
+    if len(header) < HEADER_SIZE:
+        return None
+    magic, version, size, mtime_ns, count = _HEADER.unpack_from(header)
+    if (magic != CACHE_MAGIC or version != CACHE_VERSION
+            or size != stat.st_size or mtime_ns != stat.st_mtime_ns
+            or cache_size != HEADER_SIZE + count * RECORD_DTYPE.itemsize):
+        return None
+
+    if count == 0:
+        # mmap cannot map an empty region
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    return np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=HEADER_SIZE, shape=(count,))
+
+
+def load_capture(capture_file: Union[str, Path], use_cache: bool = True) -> np.ndarray:
+    """HID class requests of capture_file as a RECORD_DTYPE array
+
+    Reads the .dtcap cache when it is current, otherwise parses the JSON and
+    (re)writes the cache. A cache that cannot be written (read-only
+    directory) is not an error; the records are returned from memory.
+    """
+    if use_cache:
+        records = read_cache(capture_file)
+        if records is not None:
+            return records
+
+    records = build_records(capture_file)
+    if use_cache:
+        try:
+            write_cache(capture_file, records)
+        except OSError:
+            pass
+    return records
+
+
+def record_payloads(records: np.ndarray) -> List[bytes]:
+    """Payload bytes of each record, trimmed to its length"""
+    buffer = records['data'].tobytes()
+    return [buffer[i * PACKET_SIZE:i * PACKET_SIZE + n]
+            for i, n in enumerate(records['length'].tolist())]
+
+
+def load_payload_array(capture_file: Union[str, Path], brequest: Optional[int] = SET_REPORT,
+                       use_cache: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """(N, 64) zero-padded payloads and frame numbers of the requests that carried data"""
+    records = load_capture(capture_file, use_cache)
+    if brequest is not None:
+        records = records[records['brequest'] == brequest]
+    records = records[records['length'] > 0]
+    return records['data'], records['frame']
+
+
+def iter_cached_payloads(capture_file: Union[str, Path],
+                         brequest: Optional[int] = SET_REPORT) -> Iterator[bytes]:
+    """Cached equivalent of capture.iter_fragment_packets
+
+    Yields the Set_Report payloads by default; pass brequest=None for every
+    request that carried data.
+    """
+    records = load_capture(capture_file)
+    if brequest is not None:
+        records = records[records['brequest'] == brequest]
+    records = records[records['length'] > 0]
+    yield from record_payloads(records)
+
+
+def iter_cached_packets(capture_file: Union[str, Path], opcodes: Optional[Container[int]] = OPCODES,
+                        use_cache: bool = True) -> Iterator[Packet]:
+    """Cached equivalent of capture.iter_packets"""
+    records = load_capture(capture_file, use_cache)
+    records = records[records['length'] > 0]
+    timestamps = _format_timestamps(records['timestamp'])
+    for data, frame_number, timestamp in zip(record_payloads(records),
+                                             records['frame'].tolist(), timestamps):
+        if opcodes is None or data[0] in opcodes:
+            yield Packet(
+                packet_type=f"0x{data[0]:02x}",
+                frame_number=frame_number,
+                timestamp=timestamp,
+                data=data
+            )
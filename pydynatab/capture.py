@@ -0,0 +1,227 @@
+"""
+Incremental reader for Wireshark "Export Packet Dissections -> As JSON" captures.
+
+The export is one top-level JSON array of packet objects. Rather than
+json.load-ing the whole document, entries are decoded one at a time out of a
+bounded read buffer, so memory use depends on the size of a single packet and
+not on the size of the capture.
+
+With follow=True the reader tails an export that is still being written
+(e.g. `tshark -T json > capture.json` during a test run): at end of file
+it polls for more data instead of stopping, until the closing ']' arrives
+or stop() returns True.
+
+iter_fragments, read_fragment_buffer and iter_fragment_packets are the
+text-search fast paths for scripts that only need the usb.data_fragment
+payloads and none of the surrounding dissection; all three run the
+memory-mapped scanner in scan.py.
+
+iter_hid_requests, iter_packets and iter_fragment_packets also accept raw
+USBPcap pcap/pcapng files (see pcap.py), detected by their magic number.
+"""
+
+import json
+import time
+from pathlib import Path
+from typing import Callable, Container, Dict, Iterator, Optional, TextIO, Tuple, Union
+
+import numpy as np
+
+from .hexdata import parse_hex_fragment
+from .pcap import is_pcap, iter_pcap_requests
+from .scan import scan_fragments
+from .protocol import OPCODES, HidRequest, Packet
+
+# Initial read size. A single Wireshark entry is a few KB, so one chunk
+# normally holds a dozen or more packets.
+CHUNK_SIZE = 64 * 1024
+
+# Seconds between end-of-file checks in follow mode
+POLL_INTERVAL = 0.05
+
+_DECODER = json.JSONDecoder()
+_SEPARATORS = ' \t\r\n,'
+
+
+def _read(f: TextIO, size: int, follow: bool, stop: Optional[Callable[[], bool]]) -> str:
+    """f.read(size), waiting for the file to grow in follow mode"""
+    while True:
+        chunk = f.read(size)
+        if chunk or not follow or (stop is not None and stop()):
+            return chunk
+        time.sleep(POLL_INTERVAL)
+
+
+def iter_entries(capture_file: Union[str, Path], chunk_size: int = CHUNK_SIZE,
+                 follow: bool = False, stop: Optional[Callable[[], bool]] = None) -> Iterator[Dict]:
+    """Yield each element of the top-level JSON array in capture_file, in order
+
+    follow=True keeps reading as the file grows; see the module docstring.
+    """
+    with open(capture_file, 'r', encoding='utf-8') as f:
+        buf = ''
+        pos = 0
+        eof = False
+        in_array = False
+
+        while True:
+            while pos < len(buf) and buf[pos] in _SEPARATORS:
+                pos += 1
+
+            if pos >= len(buf):
+                if eof:
+                    break
+                chunk = _read(f, chunk_size, follow, stop)
+                eof = not chunk
+                buf, pos = chunk, 0
+                continue
+
+            if not in_array:
+                if buf[pos] != '[':
+                    raise ValueError(f"{capture_file}: expected a top-level JSON array")
+                in_array = True
+                pos += 1
+                continue
+
+            if buf[pos] == ']':
+                return
+
+            try:
+                entry, end = _DECODER.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    if follow:
+                        # Stopped while an entry was still being written
+                        return
+                    raise
+                # Entry straddles the end of the buffer. Grow the read
+                # geometrically so oversized entries stay linear overall.
+                chunk = _read(f, max(chunk_size, len(buf) - pos), follow, stop)
+                eof = not chunk
+                buf, pos = buf[pos:] + chunk, 0
+                continue
+
+            yield entry
+            pos = end
+
+        if in_array and not follow:
+            raise ValueError(f"{capture_file}: truncated capture, missing closing ']'")
+
+
+def iter_layers(capture_file: Union[str, Path], chunk_size: int = CHUNK_SIZE,
+                follow: bool = False, stop: Optional[Callable[[], bool]] = None) -> Iterator[Dict]:
+    """Yield the _source.layers dict of every packet in capture_file"""
+    for entry in iter_entries(capture_file, chunk_size, follow, stop):
+        try:
+            yield entry['_source']['layers']
+        except (KeyError, TypeError):
+            # Not a dissected packet (or a non-Wireshark export)
+            continue
+
+
+def parse_timestamp(value: str) -> int:
+    """Nanoseconds since the epoch from an ISO 8601 or seconds.fraction string"""
+    try:
+        return int(np.datetime64(value.rstrip('Z'), 'ns').astype(np.int64))
+    except ValueError:
+        # Older Wireshark exports give frame.time_epoch as seconds.fraction
+        seconds, _, fraction = value.partition('.')
+        return int(seconds) * 10**9 + int(fraction[:9].ljust(9, '0'))
+
+
+def format_timestamp(timestamp_ns: int) -> str:
+    """ISO 8601 UTC string, in the form Wireshark writes frame.time"""
+    return str(np.datetime64(timestamp_ns, 'ns')) + 'Z'
+
+
+def iter_hid_requests(capture_file: Union[str, Path]) -> Iterator[HidRequest]:
+    """Yield every HID class control request in a JSON export or pcap/pcapng file"""
+    if is_pcap(capture_file):
+        yield from iter_pcap_requests(capture_file)
+        return
+
+    for layers in iter_layers(capture_file):
+        try:
+            setup = layers['Setup Data']
+            frame = layers['frame']
+            yield HidRequest(
+                frame_number=int(frame['frame.number']),
+                timestamp_ns=parse_timestamp(frame.get('frame.time_epoch') or frame['frame.time']),
+                bm_request_type=int(setup.get('usb.bmRequestType', '0'), 16),
+                b_request=int(setup['usbhid.setup.bRequest'], 16),
+                w_value=int(setup.get('usbhid.setup.wValue', '0'), 16),
+                w_index=int(setup.get('usbhid.setup.wIndex', '0'), 0),
+                data=parse_hex_fragment(setup.get('usb.data_fragment', ''))
+            )
+        except (KeyError, ValueError):
+            # Standard (non-HID) requests and malformed entries
+            continue
+
+
+def _iter_pcap_packets(capture_file: Union[str, Path],
+                       opcodes: Optional[Container[int]]) -> Iterator[Packet]:
+    for request in iter_pcap_requests(capture_file):
+        data = request.data
+        if data and (opcodes is None or data[0] in opcodes):
+            yield Packet(
+                packet_type=f"0x{data[0]:02x}",
+                frame_number=request.frame_number,
+                timestamp=format_timestamp(request.timestamp_ns),
+                data=data
+            )
+
+
+def iter_packets(capture_file: Union[str, Path],
+                 opcodes: Optional[Container[int]] = OPCODES,
+                 follow: bool = False, stop: Optional[Callable[[], bool]] = None) -> Iterator[Packet]:
+    """Yield a Packet for every Set_Report payload whose opcode is in opcodes
+
+    Pass opcodes=None to keep payloads with any opcode. follow applies to
+    JSON exports only.
+    """
+    if not follow and is_pcap(capture_file):
+        yield from _iter_pcap_packets(capture_file, opcodes)
+        return
+
+    for layers in iter_layers(capture_file, follow=follow, stop=stop):
+        try:
+            # Look for Setup Data with data_fragment
+            setup = layers['Setup Data']
+            packet_data = parse_hex_fragment(setup['usb.data_fragment'])
+
+            if len(packet_data) > 0 and (opcodes is None or packet_data[0] in opcodes):
+                yield Packet(
+                    packet_type=f"0x{packet_data[0]:02x}",
+                    frame_number=int(layers['frame']['frame.number']),
+                    timestamp=layers['frame']['frame.time'],
+                    data=packet_data
+                )
+        except (KeyError, ValueError):
+            # Skip packets that don't have the expected structure
+            continue
+
+
+def iter_fragments(capture_file: Union[str, Path]) -> Iterator[str]:
+    """Yield usb.data_fragment strings ('aa:bb:...') by text search, skipping JSON parsing"""
+    for _, data in scan_fragments(capture_file):
+        yield data.hex(':')
+
+
+def read_fragment_buffer(capture_file: Union[str, Path]) -> Tuple[bytes, np.ndarray]:
+    """Decode every usb.data_fragment in capture_file into one contiguous buffer
+
+    Returns (buffer, offsets); see hexdata.decode_fragments.
+    """
+    fragments = [data for _, data in scan_fragments(capture_file)]
+    offsets = np.zeros(len(fragments) + 1, dtype=np.int64)
+    np.cumsum([len(data) for data in fragments], out=offsets[1:])
+    return b''.join(fragments), offsets
+
+
+def iter_fragment_packets(capture_file: Union[str, Path]) -> Iterator[bytes]:
+    """Yield every usb.data_fragment in capture_file decoded to bytes"""
+    if is_pcap(capture_file):
+        yield from (request.data for request in iter_pcap_requests(capture_file) if request.data)
+        return
+    for _, data in scan_fragments(capture_file):
+        yield data
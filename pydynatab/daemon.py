@@ -0,0 +1,243 @@
+"""
+Display daemon: one process owns the device, many clients send frames.
+
+Set-DynaTabText and Send-DynaTabImage each drive the HID stream from
+$script: state, so two jobs updating the panel at once either block each
+other or interleave packets and corrupt frames. DisplayDaemon is the only
+writer instead. Clients connect to a Unix socket and send regions of
+pixels; the daemon sends them through an AsyncTransport.
+
+Updates are not queued one by one. Each one is painted into the screen
+the daemon wants to show, and a single sender sends the difference
+between that and what the device shows (SparseEncoder) whenever it is
+free. A burst of updates therefore collapses into one send, and only the
+newest pixels of every region reach the device. The wait is bounded by
+about two send times, however many updates arrive.
+
+Wire format, per update:
+
+    MESSAGE header  b'DTF1', x0, y0, x1, y1 (end exclusive), pixel byte count
+    pixels          (y1 - y0, x1 - x0, 3) RGB, row-major
+
+answered by one status byte (STATUS_OK or STATUS_ERROR). A header whose
+byte count does not match its region (or exceeds a full screen) ends the
+connection, since the stream can no longer be followed.
+
+A failed send is retried with the whole screen after a growing delay
+(retry_delay, doubling up to max_retry_delay), so an unplugged board does
+not spin the event loop. Any other error stops the sender; it is logged
+and flush() raises it.
+"""
+
+import asyncio
+import logging
+import socket
+import struct
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+
+from .encode import PIXEL_BYTES
+from .protocol import BYTES_PER_PIXEL, SCREEN_HEIGHT, SCREEN_WIDTH
+from .sparse import FULL_SCREEN, CostFunction, Rect, SparseEncoder, rect_bytes, upload_cost
+from .transport import AsyncTransport
+
+MAGIC = b'DTF1'
+MESSAGE = struct.Struct('<4s4BI')
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+log = logging.getLogger(__name__)
+
+
+def encode_message(pixels: np.ndarray, rect: Rect = FULL_SCREEN) -> bytes:
+    """One update: header + the (height, width, 3) pixels of rect"""
+    data = np.ascontiguousarray(pixels, dtype=np.uint8).tobytes()
+    return MESSAGE.pack(MAGIC, *rect, len(data)) + data
+
+
+def check_rect(rect: Rect, byte_count: int):
+    """Raise ValueError unless rect lies on the screen and matches byte_count"""
+    x0, y0, x1, y1 = rect
+    if not (0 <= x0 < x1 <= SCREEN_WIDTH and 0 <= y0 < y1 <= SCREEN_HEIGHT):
+        raise ValueError(f"Region {rect} outside the {SCREEN_WIDTH}x{SCREEN_HEIGHT} screen")
+    if byte_count != rect_bytes(rect):
+        raise ValueError(f"Region {rect} needs {rect_bytes(rect)} bytes, received {byte_count}")
+
+
+@dataclass
+class DaemonStats:
+    updates: int = 0        # updates accepted from clients
+    rejected: int = 0       # malformed updates
+    errors: int = 0         # failed sends, retried with the whole screen
+    sends: int = 0          # sends that carried packets to the device
+    packets: int = 0
+    max_latency: float = 0.0     # oldest update's wait until its pixels were sent, seconds
+    total_latency: float = 0.0   # summed over sends
+
+    @property
+    def coalesced(self) -> int:
+        """Updates that were folded into another update's send"""
+        return max(self.updates - self.sends, 0)
+
+    @property
+    def mean_latency(self) -> float:
+        return self.total_latency / self.sends if self.sends else 0.0
+
+
+class DisplayDaemon:
+    """Owns a transport and serves frame updates from a Unix socket"""
+
+    def __init__(self, transport: AsyncTransport, screen: Optional[np.ndarray] = None,
+                 cost: CostFunction = upload_cost, retry_delay: float = 0.05, max_retry_delay: float = 2.0):
+        self.transport = transport
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.encoder = SparseEncoder(screen, cost)
+        self.desired = np.zeros((SCREEN_HEIGHT, SCREEN_WIDTH, BYTES_PER_PIXEL), dtype=np.uint8) \
+            if screen is None else np.array(screen, dtype=np.uint8)
+        self.stats = DaemonStats()
+        self._dirty = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._pending_since: Optional[float] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._path: Optional[Path] = None
+        self._sender: Optional[asyncio.Task] = None
+        self._failure: Optional[BaseException] = None
+
+    def submit(self, pixels: np.ndarray, rect: Rect = FULL_SCREEN):
+        """Paint pixels into rect of the screen to show; the sender picks it up"""
+        x0, y0, x1, y1 = rect
+        pixels = np.asarray(pixels, dtype=np.uint8)
+        check_rect(rect, pixels.size)
+        self.desired[y0:y1, x0:x1] = pixels.reshape(y1 - y0, x1 - x0, BYTES_PER_PIXEL)
+        self.stats.updates += 1
+        if self._pending_since is None:
+            self._pending_since = time.perf_counter()
+        if self._failure is None:
+            self._idle.clear()
+        self._dirty.set()
+
+    async def _send_loop(self):
+        try:
+            await self._send_updates()
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            log.exception("Display daemon sender stopped")
+            self._failure = exc
+            self._idle.set()
+
+    async def _send_updates(self):
+        delay = self.retry_delay
+        while True:
+            await self._dirty.wait()
+            self._dirty.clear()
+            since, self._pending_since = self._pending_since, None
+            packets = self.encoder.update(self.desired)
+            if packets:
+                try:
+                    await self.transport.send_reports([b'\x00' + packet for packet in packets])
+                except OSError as exc:
+                    # The device state is unknown now: resend the whole screen, after a pause
+                    log.warning("Send failed (%s); resending the screen in %.2f s", exc, delay)
+                    self.stats.errors += 1
+                    self.encoder.screen = None
+                    self._pending_since = since
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, self.max_retry_delay)
+                    self._dirty.set()
+                    continue
+                delay = self.retry_delay
+                latency = time.perf_counter() - since
+                self.stats.sends += 1
+                self.stats.packets += len(packets)
+                self.stats.total_latency += latency
+                self.stats.max_latency = max(self.stats.max_latency, latency)
+            if not self._dirty.is_set():
+                self._idle.set()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(MESSAGE.size)
+                except asyncio.IncompleteReadError:
+                    break
+                magic, x0, y0, x1, y1, size = MESSAGE.unpack(header)
+                if magic != MAGIC:
+                    self.stats.rejected += 1
+                    break  # not a client of ours; drop the connection
+                if size > PIXEL_BYTES or size != rect_bytes((x0, y0, x1, y1)):
+                    # Never buffer what a header claims; without a valid size the stream is lost
+                    self.stats.rejected += 1
+                    writer.write(bytes([STATUS_ERROR]))
+                    await writer.drain()
+                    break
+                data = await reader.readexactly(size)
+                try:
+                    self.submit(np.frombuffer(data, dtype=np.uint8), (x0, y0, x1, y1))
+                except ValueError:
+                    self.stats.rejected += 1
+                    writer.write(bytes([STATUS_ERROR]))
+                else:
+                    writer.write(bytes([STATUS_OK]))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, socket_path: Union[str, Path]):
+        """Listen on socket_path (replacing a stale socket) and start sending"""
+        self._path = Path(socket_path)
+        if self._path.is_socket():
+            self._path.unlink()
+        self._server = await asyncio.start_unix_server(self._handle, self._path)
+        self._sender = asyncio.ensure_future(self._send_loop())
+
+    async def flush(self):
+        """Wait until every accepted update has been sent; raises RuntimeError if the sender stopped"""
+        await self._idle.wait()
+        if self._failure is not None:
+            raise RuntimeError("Display daemon sender stopped") from self._failure
+
+    async def stop(self):
+        """Stop listening and sending; the socket file is removed"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            if self._path.is_socket():
+                self._path.unlink()
+        if self._sender is not None:
+            self._sender.cancel()
+            await asyncio.gather(self._sender, return_exceptions=True)
+
+
+class DisplayClient:
+    """Blocking client for scripts: send(pixels, rect) per update"""
+
+    def __init__(self, socket_path: Union[str, Path]):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(str(socket_path))
+
+    def send(self, pixels: np.ndarray, rect: Rect = FULL_SCREEN) -> bool:
+        """Send one update; True if the daemon accepted it"""
+        self.sock.sendall(encode_message(pixels, rect))
+        status = self.sock.recv(1)
+        if not status:
+            raise ConnectionError("Display daemon closed the connection")
+        return status[0] == STATUS_OK
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,175 @@
+"""
+In-process stand-in for the DynaTab screen interface (MI_02).
+
+VirtualDynaTab takes 65-byte feature reports the way HidSharp's
+SetFeature / GetFeature do (report ID 0x00 + 64-byte packet), decodes the
+init (0xa9) and data (0x29) packets and keeps the framebuffer the device
+would show, so the send path can be exercised and timed without hardware.
+
+Every report is checked by validate.StreamValidator, the same rules the
+capture analyzers apply, and the issues are kept in .issues. Packets with
+a bad checksum are ignored, as the device ignores them (Test-1*-Results).
+
+Timing is configurable: set_feature() blocks for latency seconds (plus
+init_latency for init packets), and a report arriving less than
+min_interval seconds after the previous one completed is dropped, like a
+device still busy with the last packet; with stall=True it also fails
+with EPIPE, as hidraw reports a stalled control transfer. stats()
+summarises what was received.
+"""
+
+import errno
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .encode import FEATURE_REPORT_SIZE
+from .protocol import (BYTES_PER_PIXEL, OPCODE_DATA, OPCODE_INIT, PACKET_SIZE,
+                       PAYLOAD_SIZE, SCREEN_HEIGHT, SCREEN_WIDTH, Packet)
+from .sparse import Rect, rect_bytes
+from .validate import Issue, StreamValidator, checksum_ok
+
+
+@dataclass
+class DeviceStats:
+    """What a VirtualDynaTab received since it was created or reset"""
+    reports: int
+    inits: int
+    data_packets: int
+    frames: int          # frames whose payload arrived complete
+    lost: int            # complete frames discarded because an earlier frame of their upload was lost
+    rejected: int        # bad checksum or unknown report
+    dropped: int         # arrived before min_interval had passed
+    elapsed: float       # seconds from the first report to the last completion
+    busy: float          # seconds spent inside set_feature
+    min_gap: float       # shortest completion-to-next-report gap, seconds
+
+    @property
+    def reports_per_second(self) -> float:
+        return self.reports / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def frames_per_second(self) -> float:
+        return self.frames / self.elapsed if self.elapsed else 0.0
+
+
+class VirtualDynaTab:
+    """Emulated screen interface accepting feature reports"""
+
+    def __init__(self, latency: float = 0.0, init_latency: float = 0.0, min_interval: float = 0.0,
+                 stall: bool = False):
+        self.latency = latency
+        self.init_latency = init_latency
+        self.min_interval = min_interval
+        self.stall = stall
+        self.screen = np.zeros((SCREEN_HEIGHT, SCREEN_WIDTH, BYTES_PER_PIXEL), dtype=np.uint8)
+        self.frames: List[np.ndarray] = []  # frames of the current upload, in order, up to the first lost one
+        self.delay = 0
+        self._lock = threading.Lock()
+        self._rect: Optional[Rect] = None
+        self._frame_count = 0
+        self._payloads: Dict[int, bytearray] = {}
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Clear counters, timings and issues"""
+        self.issues: List[Issue] = []
+        self._validator = StreamValidator()
+        self._counts = dict.fromkeys(('reports', 'inits', 'data_packets', 'frames', 'lost', 'rejected', 'dropped'), 0)
+        self._first: Optional[float] = None
+        self._last: Optional[float] = None
+        self._busy = 0.0
+        self._min_gap = float('inf')
+
+    def set_feature(self, report: bytes):
+        """Receive one feature report (report ID 0x00 + 64-byte packet)"""
+        if len(report) != FEATURE_REPORT_SIZE:
+            raise ValueError(f"Feature report must be exactly {FEATURE_REPORT_SIZE} bytes, "
+                             f"received {len(report)} bytes")
+        if report[0] != 0x00:
+            raise ValueError(f"Unknown report ID 0x{report[0]:02x}")
+        start = time.perf_counter()
+        with self._lock:
+            if self._last is not None:
+                gap = start - self._last
+                self._min_gap = min(self._min_gap, gap)
+                if gap < self.min_interval:
+                    self._counts['dropped'] += 1
+                    if self.stall:
+                        raise BrokenPipeError(errno.EPIPE, "Device busy")
+                    return
+            self._counts['reports'] += 1
+            if self._first is None:
+                self._first = start
+            packet = bytes(report[1:])
+            delay = self.latency + (self.init_latency if packet[0] == OPCODE_INIT else 0.0)
+            if delay:
+                time.sleep(delay)
+            self._receive(packet)
+            self._last = time.perf_counter()
+            self._busy += self._last - start
+
+    def get_feature(self, report: Optional[bytearray] = None) -> bytearray:
+        """Answer a Get_Report: report ID 0x00 and an empty packet"""
+        if report is None:
+            report = bytearray(FEATURE_REPORT_SIZE)
+        report[:] = bytes(len(report))
+        return report
+
+    def _receive(self, packet: bytes):
+        self.issues.extend(self._validator.feed(Packet(f"0x{packet[0]:02x}", self._counts['reports'], '', packet)))
+        if packet[0] not in (OPCODE_INIT, OPCODE_DATA) or not checksum_ok(packet):
+            self._counts['rejected'] += 1
+            return
+        if packet[0] == OPCODE_INIT:
+            self._counts['inits'] += 1
+            self._frame_count, self.delay = packet[2], packet[3]
+            self._rect = tuple(packet[8:12])
+            self._payloads = {}
+            self.frames = []
+            return
+
+        self._counts['data_packets'] += 1
+        if self._rect is None or packet[1] >= self._frame_count:
+            return
+        byte_count = rect_bytes(self._rect)
+        payload = self._payloads.setdefault(packet[1], bytearray())
+        offset = (packet[4] | packet[5] << 8) * PAYLOAD_SIZE
+        if offset != len(payload):
+            return  # out of order: the frame is lost
+        payload += packet[8:8 + min(packet[6], PAYLOAD_SIZE)]
+        if len(payload) >= byte_count:
+            self._counts['frames'] += 1
+            self._complete_frame(packet[1], bytes(payload[:byte_count]))
+
+    def _complete_frame(self, index: int, stream: bytes):
+        if index != len(self.frames):
+            # An earlier frame of this upload never completed (a lost or
+            # reordered packet, already in .issues): the animation is broken
+            self._counts['lost'] += 1
+            return
+        x0, y0, x1, y1 = self._rect
+        image = self.screen.copy() if index == 0 else self.frames[0].copy()
+        pixels = np.frombuffer(stream, dtype=np.uint8)
+        image[y0:y1, x0:x1] = pixels.reshape(x1 - x0, y1 - y0, BYTES_PER_PIXEL).transpose(1, 0, 2)
+        self.frames.append(image)
+        if index == 0:
+            self.screen = image
+
+    def stats(self) -> DeviceStats:
+        """Counters and timings so far"""
+        with self._lock:
+            elapsed = self._last - self._first if self._first is not None else 0.0
+            return DeviceStats(elapsed=elapsed, busy=self._busy,
+                               min_gap=self._min_gap if self._min_gap != float('inf') else 0.0,
+                               **self._counts)
+
+
+def feature_report(packet: bytes) -> bytes:
+    """65-byte feature report carrying a 64-byte packet, as Send-FeaturePacket builds it"""
+    if len(packet) != PACKET_SIZE:
+        raise ValueError(f"Packet must be exactly {PACKET_SIZE} bytes, received {len(packet)} bytes")
+    return b'\x00' + bytes(packet)
@@ -0,0 +1,118 @@
+"""
+Packet encoder: pixel streams to the init and data packets the device expects.
+
+Python counterpart of PSDynaTab's New-PacketChunk / Send-FeaturePacket. A
+full-screen frame is 1620 bytes of RGB in device (column-major) order, sent
+as 29 data packets: 28 carrying 56 bytes and a last one carrying 52.
+
+FrameEncoder owns one preallocated buffer holding every packet of a frame.
+The 8-byte headers (sequence, payload length and checksum) depend only on
+the frame index, so they are computed once per index as templates, and
+encoding a frame is two block copies into that buffer. The packets are
+returned as memoryview slices of it, so encoding allocates nothing per
+packet (or per frame).
+
+Byte 6 of a data packet is its payload length and byte 7 its checksum, as
+in the captures. New-PacketChunk writes a decrementing 0x389D "address"
+there instead; that is the same two bytes for every 56-byte packet of a
+static frame, but not for the shorter last packet.
+"""
+
+from typing import List, Union
+
+import numpy as np
+
+from .protocol import (BYTES_PER_PIXEL, HEADER_SIZE, OPCODE_DATA, OPCODE_INIT,
+                       PACKET_SIZE, PAYLOAD_SIZE, PIXEL_COUNT, SCREEN_HEIGHT,
+                       SCREEN_WIDTH)
+from .validate import packet_checksum
+
+PIXEL_BYTES = PIXEL_COUNT * BYTES_PER_PIXEL
+FEATURE_REPORT_SIZE = PACKET_SIZE + 1  # report ID 0x00 + packet
+
+Pixels = Union[bytes, bytearray, memoryview, np.ndarray]
+
+
+def init_packet(frame_count: int = 1, delay: int = 0, byte_count: int = PIXEL_BYTES,
+                x0: int = 0, y0: int = 0, x1: int = SCREEN_WIDTH,
+                y1: int = SCREEN_HEIGHT) -> bytes:
+    """Init (0xa9) packet announcing an upload; the defaults give PSDynaTab's FIRST_PACKET
+
+    Bytes 8-11 select the region [x0, x1) x [y0, y1) the pixel data fills.
+    """
+    packet = bytearray(PACKET_SIZE)
+    packet[:7] = bytes([OPCODE_INIT, 0x00, frame_count, delay,
+                        byte_count & 0xFF, byte_count >> 8, 0x00])
+    packet[7] = packet_checksum(packet)
+    packet[8:12] = bytes([x0, y0, x1, y1])
+    return bytes(packet)
+
+
+def data_headers(frame_index: int, frame_count: int = 1, delay: int = 0,
+                 byte_count: int = PIXEL_BYTES) -> np.ndarray:
+    """(packets, 8) uint8 headers of the data packets of one frame"""
+    packet_count = -(-byte_count // PAYLOAD_SIZE)
+    sequence = np.arange(packet_count)
+    headers = np.zeros((packet_count, HEADER_SIZE), dtype=np.int64)
+    headers[:, 0] = OPCODE_DATA
+    headers[:, 1] = frame_index
+    headers[:, 2] = frame_count
+    headers[:, 3] = delay
+    headers[:, 4] = sequence & 0xFF
+    headers[:, 5] = sequence >> 8
+    headers[:, 6] = np.minimum(byte_count - sequence * PAYLOAD_SIZE, PAYLOAD_SIZE)
+    headers[:, 7] = (0xFF - headers[:, :7].sum(axis=1)) & 0xFF
+    return headers.astype(np.uint8)
+
+
+class FrameEncoder:
+    """Encodes frames of one upload into data packets in a reused buffer
+
+    packets() / encode() return memoryviews into the encoder's buffer, valid
+    until the next encode() call. With feature_reports=True every packet is
+    preceded by the 0x00 report ID, so each view is a ready 65-byte feature
+    report.
+    """
+
+    def __init__(self, frame_count: int = 1, delay: int = 0,
+                 byte_count: int = PIXEL_BYTES, feature_reports: bool = False):
+        self.frame_count = frame_count
+        self.delay = delay
+        self.byte_count = byte_count
+        self.packet_count = -(-byte_count // PAYLOAD_SIZE)
+        self.init = init_packet(frame_count, delay, byte_count)
+
+        offset = 1 if feature_reports else 0
+        stride = FEATURE_REPORT_SIZE if feature_reports else PACKET_SIZE
+        self._buffer = bytearray(self.packet_count * stride)
+        rows = np.frombuffer(self._buffer, dtype=np.uint8).reshape(self.packet_count, stride)
+        self._headers = rows[:, offset:offset + HEADER_SIZE]
+        self._payloads = rows[:, offset + HEADER_SIZE:offset + PACKET_SIZE]
+        self._full = byte_count // PAYLOAD_SIZE
+        self._tail = byte_count - self._full * PAYLOAD_SIZE
+
+        view = memoryview(self._buffer)
+        self._packets = [view[i * stride:(i + 1) * stride] for i in range(self.packet_count)]
+        self._templates = [data_headers(i, frame_count, delay, byte_count) for i in range(frame_count)]
+
+    def packets(self) -> List[memoryview]:
+        """Packets of the last encoded frame"""
+        return self._packets
+
+    def encode(self, pixels: Pixels, frame_index: int = 0) -> List[memoryview]:
+        """Write the packets for one frame of byte_count bytes in device order"""
+        if isinstance(pixels, np.ndarray):
+            source = np.asarray(pixels, dtype=np.uint8).reshape(-1)
+        else:
+            source = np.frombuffer(pixels, dtype=np.uint8)
+        if source.size != self.byte_count:
+            raise ValueError(f"Frame must be exactly {self.byte_count} bytes, received {source.size} bytes")
+        if not 0 <= frame_index < self.frame_count:
+            raise ValueError(f"Frame index {frame_index} outside 0..{self.frame_count - 1}")
+
+        full = self._full * PAYLOAD_SIZE
+        self._headers[:] = self._templates[frame_index]
+        self._payloads[:self._full] = source[:full].reshape(self._full, PAYLOAD_SIZE)
+        if self._tail:
+            self._payloads[self._full, :self._tail] = source[full:]
+        return self._packets
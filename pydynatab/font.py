@@ -0,0 +1,143 @@
+"""
+Bitmap-font text rasterizer, equivalent to ConvertTo-BitmapText.
+
+ConvertTo-BitmapText tests every bit of every column of every character
+each time text is set. Here the font in PSDynaTab/Fonts/CP437-5x7.ps1 is
+parsed once into a glyph atlas: one (height, width + spacing) boolean mask
+per code point, with the spacing column blank. A string is then one fancy
+index into the atlas, a reshape that lays the glyphs side by side, and a
+colour multiply. Results are kept in an LRU cache keyed by (text, colour,
+alignment), since status displays show the same few labels over and over.
+
+The output matches ConvertTo-BitmapText pixel for pixel:
+- text wider than the screen is cut to the characters that fit
+- characters missing from the font render as spaces
+- Left / Center / Right alignment, with the 7-row font starting on row 1
+"""
+
+import functools
+import re
+import warnings
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+import numpy as np
+
+from .protocol import SCREEN_HEIGHT, SCREEN_WIDTH
+
+FONT_PATH = Path(__file__).resolve().parents[1] / 'PSDynaTab' / 'Fonts' / 'CP437-5x7.ps1'
+ALIGNMENTS = ('Left', 'Center', 'Right')
+DEFAULT_COLOR = (0, 255, 0)  # Set-DynaTabText's green
+SPACE = 0x20
+
+_GLYPH_RE = re.compile(r'^\s*(\d+)\s*=\s*@\(([^)]*)\)', re.MULTILINE)
+_SIZE_RE = re.compile(r'^\$CHAR_(WIDTH|HEIGHT|SPACING)\s*=\s*(\d+)', re.MULTILINE)
+
+Color = Tuple[int, int, int]
+
+
+@dataclass(frozen=True)
+class Font:
+    """A bitmap font as a glyph atlas"""
+    width: int
+    height: int
+    spacing: int
+    atlas: np.ndarray  # (code points, height, width + spacing) bool
+
+    @property
+    def advance(self) -> int:
+        return self.width + self.spacing
+
+    def text_width(self, count: int) -> int:
+        """Pixel width of count characters"""
+        return count * self.advance - self.spacing
+
+
+def load_font(path: Union[str, Path] = FONT_PATH) -> Font:
+    """Parse a PSDynaTab font file ($CHAR_* sizes and the $FONT_DATA column bytes)"""
+    text = Path(path).read_text(encoding='utf-8')
+    sizes = {name.lower(): int(value) for name, value in _SIZE_RE.findall(text)}
+    if set(sizes) != {'width', 'height', 'spacing'}:
+        raise ValueError(f"{path}: missing $CHAR_WIDTH, $CHAR_HEIGHT or $CHAR_SPACING")
+    glyphs = {int(code): [int(value, 0) for value in values.split(',')]
+              for code, values in _GLYPH_RE.findall(text)}
+    if not glyphs:
+        raise ValueError(f"{path}: no glyphs found")
+
+    columns = np.zeros((max(glyphs) + 1, sizes['width']), dtype=np.uint8)
+    for code, values in glyphs.items():
+        if len(values) != sizes['width']:
+            raise ValueError(f"{path}: glyph {code} has {len(values)} columns, expected {sizes['width']}")
+        columns[code] = values
+    # Bit r of column c is pixel (r, c): unpack to (code, row, column)
+    rows = np.arange(sizes['height'], dtype=np.uint8)
+    masks = (columns[:, None, :] >> rows[None, :, None]) & 1
+    atlas = np.zeros((len(columns), sizes['height'], sizes['width'] + sizes['spacing']), dtype=bool)
+    atlas[:, :, :sizes['width']] = masks.astype(bool)
+    atlas.flags.writeable = False
+    return Font(sizes['width'], sizes['height'], sizes['spacing'], atlas)
+
+
+class TextRenderer:
+    """Renders strings to (SCREEN_HEIGHT, SCREEN_WIDTH, 3) images with an LRU cache
+
+    Images come from the cache and are read-only; copy one before drawing
+    on it.
+    """
+
+    def __init__(self, font: Optional[Font] = None, cache_size: int = 1024):
+        self.font = font or load_font()
+        self._render = functools.lru_cache(maxsize=cache_size)(self._rasterize)
+
+    def mask(self, text: str) -> Tuple[np.ndarray, int]:
+        """(font height, pixel width) mask of text, truncated to the screen, and its width"""
+        font = self.font
+        if font.text_width(len(text)) > SCREEN_WIDTH:
+            fits = (SCREEN_WIDTH + font.spacing) // font.advance
+            warnings.warn(f"Text '{text}' ({font.text_width(len(text))} px) exceeds display width "
+                          f"({SCREEN_WIDTH} px). Truncating.")
+            text = text[:fits]
+        codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+        codes = np.where(codes < len(font.atlas), codes, SPACE)
+        strip = font.atlas[codes].transpose(1, 0, 2).reshape(font.height, -1)
+        return strip[:, :max(font.text_width(len(codes)), 0)], font.text_width(len(codes))
+
+    def _rasterize(self, text: str, color: Color, alignment: str) -> np.ndarray:
+        font = self.font
+        strip, width = self.mask(text)
+        start = {'Left': 0, 'Center': (SCREEN_WIDTH - width) // 2, 'Right': SCREEN_WIDTH - width}[alignment]
+        top = (SCREEN_HEIGHT - font.height) // 2
+        mask = np.zeros((SCREEN_HEIGHT, SCREEN_WIDTH), dtype=np.uint8)
+        mask[top:top + font.height, start:start + strip.shape[1]] = strip
+        image = mask[:, :, None] * np.array(color, dtype=np.uint8)
+        image.flags.writeable = False
+        return image
+
+    def render(self, text: str, color: Color = DEFAULT_COLOR, alignment: str = 'Center') -> np.ndarray:
+        """Image of text in color, aligned Left, Center or Right"""
+        alignment = alignment.capitalize()
+        if alignment not in ALIGNMENTS:
+            raise ValueError(f"Alignment must be one of {', '.join(ALIGNMENTS)}, received {alignment!r}")
+        return self._render(text, tuple(int(c) for c in color), alignment)
+
+    def stream(self, text: str, color: Color = DEFAULT_COLOR, alignment: str = 'Center') -> bytes:
+        """The 1620-byte column-major pixel data ConvertTo-BitmapText returns"""
+        return self.render(text, color, alignment).transpose(1, 0, 2).tobytes()
+
+    def cache_info(self):
+        return self._render.cache_info()
+
+    def cache_clear(self):
+        self._render.cache_clear()
+
+
+@functools.lru_cache(maxsize=None)
+def default_renderer() -> TextRenderer:
+    """Shared TextRenderer over the CP437-5x7 font"""
+    return TextRenderer()
+
+
+def render_text(text: str, color: Color = DEFAULT_COLOR, alignment: str = 'Center') -> np.ndarray:
+    """Image of text with the default font, as Set-DynaTabText shows it"""
+    return default_renderer().render(text, color, alignment)
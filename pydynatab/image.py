@@ -0,0 +1,137 @@
+"""
+Image to pixel data: decode once, box-resize, reorder with one transpose.
+
+ConvertTo-PixelData draws the image into a 24bpp bitmap, resizes it with
+HighQualityBicubic and then calls GetPixel once per pixel, 540 times, to
+build the column-major stream. Here the steps are array operations:
+
+- load_image decodes a file once with Pillow (imported only when a file
+  is given). JPEGs are decoded in draft mode at the smallest DCT scale
+  that still covers the screen, which for camera frames skips most of
+  the decode work.
+- raw_image views an existing RGB/RGBA buffer (camera frames, mmap'd
+  files, other libraries' bitmaps) as an array without copying, so
+  sources that already have pixels skip decoding entirely.
+- box_resize averages every source pixel into the screen pixels it
+  overlaps (an area filter), as two small matrix products with cached
+  weights. For a 60x9 target that is the right filter: bicubic on a large
+  downscale samples a few pixels and aliases, a box filter uses all of
+  them.
+- image_stream reorders to device (column-major) or row-major order as
+  one transpose.
+
+Alpha is composited over black, as drawing into ConvertTo-PixelData's
+Format24bppRgb bitmap does. Images already SCREEN_WIDTH x SCREEN_HEIGHT
+RGB pass through without resampling.
+"""
+
+import functools
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+
+from .protocol import BYTES_PER_PIXEL, SCREEN_HEIGHT, SCREEN_WIDTH
+
+ORDERS = ('column', 'row')
+
+ImageSource = Union[str, Path, np.ndarray]
+
+
+def load_image(path: Union[str, Path], width: int = SCREEN_WIDTH, height: int = SCREEN_HEIGHT) -> np.ndarray:
+    """Decode an image file to a (height, width, 3 or 4) uint8 array; needs Pillow"""
+    try:
+        from PIL import Image
+    except ImportError as exc:
+        raise ImportError("Decoding image files needs Pillow (pip install Pillow); "
+                          "arrays and raw buffers do not") from exc
+    with Image.open(path) as img:
+        img.draft('RGB', (width, height))  # JPEG: decode at a reduced DCT scale, still >= the target
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'A' in img.getbands() or 'transparency' in img.info else 'RGB')
+        return np.asarray(img)
+
+
+def raw_image(buffer, width: int, height: int, channels: int = BYTES_PER_PIXEL,
+              stride: Optional[int] = None) -> np.ndarray:
+    """View a raw row-major RGB (or RGBA) buffer as a (height, width, channels) array, without copying
+
+    stride is the byte length of one row, for buffers with row padding.
+    """
+    stride = width * channels if stride is None else stride
+    if stride < width * channels:
+        raise ValueError(f"Row stride must be at least {width * channels} bytes, received {stride}")
+    size = stride * (height - 1) + width * channels
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    if len(data) < size:
+        raise ValueError(f"Raw {width}x{height} image needs {size} bytes, received {len(data)} bytes")
+    return np.ndarray((height, width, channels), dtype=np.uint8, buffer=data,
+                      strides=(stride, channels, 1))
+
+
+@functools.lru_cache(maxsize=64)
+def box_weights(source: int, target: int) -> np.ndarray:
+    """(target, source) matrix: share of each source pixel in each target pixel, rows summing to 1"""
+    scale = source / target
+    edges = np.arange(target + 1) * scale
+    left = np.arange(source)
+    overlap = (np.minimum(left[None, :] + 1, edges[1:, None])
+               - np.maximum(left[None, :], edges[:-1, None]))
+    weights = (np.clip(overlap, 0, None) / scale).astype(np.float32)
+    weights.flags.writeable = False
+    return weights
+
+
+def flatten_alpha(image: np.ndarray) -> np.ndarray:
+    """(H, W, 3) RGB from grey, RGB or RGBA (alpha composited over black)"""
+    image = np.asarray(image)
+    if image.ndim == 2:
+        image = image[:, :, None]
+    if image.ndim != 3 or image.shape[2] not in (1, 3, 4):
+        raise ValueError(f"Image must be (height, width[, 1, 3 or 4]), received shape {image.shape}")
+    if image.shape[2] == 1:
+        return np.broadcast_to(image, image.shape[:2] + (BYTES_PER_PIXEL,))
+    if image.shape[2] == 4:
+        alpha = image[:, :, 3:].astype(np.uint16)
+        return ((image[:, :, :3] * alpha + 127) // 255).astype(np.uint8)
+    return image
+
+
+def box_resize(image: np.ndarray, width: int = SCREEN_WIDTH, height: int = SCREEN_HEIGHT) -> np.ndarray:
+    """Area-average a (H, W, C) image to (height, width, C) uint8"""
+    image = np.asarray(image)
+    rows, columns, channels = image.shape
+    if (rows, columns) == (height, width):
+        return image.astype(np.uint8, copy=False)
+    # Rows first: (height, rows) @ (rows, columns * C), then columns
+    reduced = box_weights(rows, height) @ image.reshape(rows, columns * channels).astype(np.float32)
+    resized = np.einsum('xw,ywc->yxc', box_weights(columns, width), reduced.reshape(height, columns, channels))
+    return np.clip(resized + 0.5, 0, 255).astype(np.uint8)
+
+
+def to_screen(source: ImageSource) -> np.ndarray:
+    """(SCREEN_HEIGHT, SCREEN_WIDTH, 3) image from a file path or an image array
+
+    A screen-sized uint8 RGB array is returned as is, not copied.
+    """
+    if isinstance(source, (str, Path)):
+        source = load_image(source)
+    image = np.asarray(source)
+    if image.dtype != np.uint8:
+        raise ValueError(f"Image must be uint8, received {image.dtype}")
+    return box_resize(flatten_alpha(image))
+
+
+def image_stream(source: ImageSource, order: str = 'column') -> np.ndarray:
+    """Pixel data for source: 1620 bytes in device (column-major) or row-major order
+
+    The result is a flat uint8 array FrameEncoder.encode accepts (use
+    to_screen for the image SparseEncoder takes). Row order of a
+    contiguous screen-sized image is a view of it.
+    """
+    if order not in ORDERS:
+        raise ValueError(f"Order must be one of {', '.join(ORDERS)}, received {order!r}")
+    image = to_screen(source)
+    if order == 'column':
+        image = image.transpose(1, 0, 2)
+    return np.ascontiguousarray(image).reshape(-1)
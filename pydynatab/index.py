@@ -0,0 +1,169 @@
+"""
+SQLite index of every HID payload across a set of captures.
+
+Each Set_Report payload becomes one row in the packets table with its
+header fields broken out into indexed columns, so questions about the
+whole corpus are SQL queries instead of a rescan of every JSON export:
+
+    SELECT c.name, p.frame_number FROM packets p JOIN captures c ON c.id = p.capture_id
+    WHERE p.opcode = 0xa9 AND p.width = 60 AND p.delay = 0x64
+
+Header columns (NULL where they do not apply to the opcode):
+
+  opcode       byte 0
+  frame_index  byte 1 (data packets)
+  frame_count  byte 2
+  delay        byte 3
+  sequence     bytes 4-5, little endian (data packets)
+  byte_count   bytes 4-5, little endian (init packets)
+  field_6_7    bytes 6-7, big endian (address/checksum field)
+  x, y, width, height  bytes 8-11 (init packets)
+
+Payloads are read through the .dtcap cache. The captures table doubles as
+the corpus manifest (size, mtime and SHA-256 of every export): a capture
+is re-ingested only when its content changes, captures that disappear
+from the directory are dropped, and every other row is left in place.
+"""
+
+import sqlite3
+from pathlib import Path
+from typing import Iterable, List, Set, Union
+
+import numpy as np
+
+from .cache import SET_REPORT, load_capture, record_payloads
+from .manifest import FileState, content_changed, file_state
+from .protocol import OPCODE_DATA, OPCODE_INIT
+
+INDEX_NAME = 'captures.sqlite'
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS captures (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS packets (
+    capture_id INTEGER NOT NULL REFERENCES captures(id) ON DELETE CASCADE,
+    ordinal INTEGER NOT NULL,
+    frame_number INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    opcode INTEGER NOT NULL,
+    frame_index INTEGER,
+    frame_count INTEGER,
+    delay INTEGER,
+    sequence INTEGER,
+    byte_count INTEGER,
+    field_6_7 INTEGER,
+    x INTEGER,
+    y INTEGER,
+    width INTEGER,
+    height INTEGER,
+    data BLOB NOT NULL,
+    PRIMARY KEY (capture_id, ordinal)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS packets_opcode ON packets (opcode, width, delay, height);
+CREATE INDEX IF NOT EXISTS packets_frame ON packets (opcode, frame_index, sequence);
+CREATE INDEX IF NOT EXISTS packets_field_6_7 ON packets (field_6_7);
+"""
+
+
+def connect(db_path: Union[str, Path]) -> sqlite3.Connection:
+    """Open (creating if needed) a capture index"""
+    conn = sqlite3.connect(str(db_path))
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA foreign_keys = ON')
+    (version,) = conn.execute('PRAGMA user_version').fetchone()
+    if version != SCHEMA_VERSION:
+        # The index is derived data; rebuild it rather than migrate
+        conn.executescript('DROP TABLE IF EXISTS packets; DROP TABLE IF EXISTS captures;')
+        conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _packet_rows(capture_id: int, capture_file: Union[str, Path]) -> List[tuple]:
+    """One packets-table row per Set_Report payload of capture_file"""
+    records = load_capture(capture_file)
+    records = records[(records['brequest'] == SET_REPORT) & (records['length'] > 0)]
+    header = np.zeros((len(records), 12), dtype=np.int64)
+    header[:] = records['data'][:, :12]
+    opcode = header[:, 0]
+    is_init = (opcode == OPCODE_INIT).tolist()
+    is_data = (opcode == OPCODE_DATA).tolist()
+    word_4_5 = (header[:, 4] | (header[:, 5] << 8)).tolist()
+    field_6_7 = ((header[:, 6] << 8) | header[:, 7]).tolist()
+    header = header.tolist()
+
+    rows = []
+    for ordinal, (frame_number, timestamp, data) in enumerate(zip(
+            records['frame'].tolist(), records['timestamp'].tolist(), record_payloads(records))):
+        h = header[ordinal]
+        init = is_init[ordinal]
+        rows.append((
+            capture_id, ordinal, frame_number, timestamp, h[0],
+            h[1] if is_data[ordinal] else None,
+            h[2], h[3],
+            word_4_5[ordinal] if is_data[ordinal] else None,
+            word_4_5[ordinal] if init else None,
+            field_6_7[ordinal],
+            h[8] if init else None, h[9] if init else None,
+            h[10] if init else None, h[11] if init else None,
+            data,
+        ))
+    return rows
+
+
+def index_capture(conn: sqlite3.Connection, capture_file: Union[str, Path]) -> bool:
+    """Add or refresh one capture; returns False if its content was already indexed"""
+    capture_file = Path(capture_file)
+    row = conn.execute('SELECT id, size, mtime_ns, sha256 FROM captures WHERE name = ?',
+                       (capture_file.name,)).fetchone()
+    previous = FileState(row['size'], row['mtime_ns'], row['sha256']) if row is not None else None
+    state = file_state(capture_file, previous)
+
+    if not content_changed(previous, state):
+        if state != previous:
+            # Touched or re-copied, same bytes: keep the rows, remember the new mtime
+            with conn:
+                conn.execute('UPDATE captures SET mtime_ns = ?, path = ? WHERE id = ?',
+                             (state.mtime_ns, str(capture_file), row['id']))
+        return False
+
+    with conn:
+        if row is not None:
+            conn.execute('DELETE FROM captures WHERE id = ?', (row['id'],))
+        capture_id = conn.execute(
+            'INSERT INTO captures (name, path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?, ?)',
+            (capture_file.name, str(capture_file), state.size, state.mtime_ns, state.sha256)).lastrowid
+        conn.executemany('INSERT INTO packets VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                         _packet_rows(capture_id, capture_file))
+    return True
+
+
+def index_captures(conn: sqlite3.Connection, capture_files: Iterable[Union[str, Path]]) -> int:
+    """Add or refresh every capture; returns how many were (re)ingested"""
+    return sum(index_capture(conn, f) for f in capture_files)
+
+
+def prune_captures(conn: sqlite3.Connection, keep: Set[str]) -> int:
+    """Drop every capture whose name is not in keep; returns how many were dropped"""
+    names = [r['name'] for r in conn.execute('SELECT name FROM captures')]
+    gone = [(name,) for name in names if name not in keep]
+    with conn:
+        conn.executemany('DELETE FROM captures WHERE name = ?', gone)
+    return len(gone)
+
+
+def open_index(capture_dir: Union[str, Path], pattern: str = '*.json') -> sqlite3.Connection:
+    """Index of every capture matching pattern in capture_dir, brought up to date"""
+    capture_dir = Path(capture_dir)
+    captures = sorted(capture_dir.glob(pattern))
+    conn = connect(capture_dir / INDEX_NAME)
+    prune_captures(conn, {f.name for f in captures})
+    index_captures(conn, captures)
+    return conn
@@ -0,0 +1,44 @@
+"""
+Content manifest entries for incremental corpus processing.
+
+A FileState records a capture's size, mtime and SHA-256. Checking a file
+against its previous state costs one stat() when size and mtime are
+unchanged; otherwise the content is re-hashed, so a capture that was
+touched or re-copied without changing is not parsed again.
+"""
+
+import hashlib
+import os
+from pathlib import Path
+from typing import NamedTuple, Optional, Union
+
+HASH_CHUNK = 1024 * 1024
+
+
+class FileState(NamedTuple):
+    """Size, mtime and content hash of a file"""
+    size: int
+    mtime_ns: int
+    sha256: str
+
+
+def file_digest(path: Union[str, Path]) -> str:
+    """Hex SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_state(path: Union[str, Path], previous: Optional[FileState] = None) -> FileState:
+    """Current state of path, reusing previous's hash if size and mtime still match"""
+    stat = os.stat(path)
+    if previous is not None and (previous.size, previous.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+        return previous
+    return FileState(stat.st_size, stat.st_mtime_ns, file_digest(path))
+
+
+def content_changed(previous: Optional[FileState], current: FileState) -> bool:
+    """True if current differs in content from previous (or there is no previous)"""
+    return previous is None or (previous.size, previous.sha256) != (current.size, current.sha256)
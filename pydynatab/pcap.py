@@ -0,0 +1,249 @@
+"""
+Native reader for USBPcap captures in pcap and pcapng format.
+
+Parses the files USBPcap (and Wireshark saving a USBPcap session) write,
+without an "Export Packet Dissections -> As JSON" step:
+
+  pcap / pcapng   record framing, per-interface link type and timestamp
+                  resolution
+  USBPcap header  LINKTYPE_USBPCAP (249) pseudo-header: IRP info, bus,
+                  device, endpoint, transfer type, control stage
+  control setup   the SETUP stage of a control transfer carries the 8-byte
+                  setup packet followed by any OUT data, so a Set_Report
+                  arrives as 8 + 64 bytes in one record
+
+Every HID class request (bmRequestType type bits == class) becomes a
+HidRequest, the same model capture.iter_hid_requests builds from a JSON
+export. Frame numbers count every record in the file, as Wireshark's
+frame.number does.
+"""
+
+import struct
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, Optional, Tuple, Union
+
+from .protocol import HidRequest
+
+LINKTYPE_USBPCAP = 249
+
+# USBPcap pseudo-header: headerLen, irpId, status, function, info, bus,
+# device, endpoint, transfer, dataLength (27 bytes, little endian)
+_USBPCAP_HEADER = struct.Struct('<HQIHBHHBBI')
+USBPCAP_TRANSFER_CONTROL = 2
+USBPCAP_STAGE_SETUP = 0
+USBPCAP_INFO_PDO_TO_FDO = 0x01  # set on completions travelling back up the stack
+
+# Control setup packet: bmRequestType, bRequest, wValue, wIndex, wLength
+_SETUP = struct.Struct('<BBHHH')
+REQUEST_TYPE_MASK = 0x60
+REQUEST_TYPE_CLASS = 0x20
+
+PCAP_MAGIC = {
+    b'\xd4\xc3\xb2\xa1': ('<', 1000),  # microsecond timestamps
+    b'\xa1\xb2\xc3\xd4': ('>', 1000),
+    b'\x4d\x3c\xb2\xa1': ('<', 1),     # nanosecond timestamps
+    b'\xa1\xb2\x3c\x4d': ('>', 1),
+}
+PCAPNG_SHB = b'\x0a\x0d\x0d\x0a'
+_PCAPNG_BYTE_ORDER = 0x1A2B3C4D
+
+# pcapng block types
+_IDB = 1
+_PB = 2
+_SPB = 3
+_EPB = 6
+_OPT_IF_TSRESOL = 9
+
+
+def is_pcap(capture_file: Union[str, Path]) -> bool:
+    """True if capture_file starts with a pcap or pcapng magic number"""
+    with open(capture_file, 'rb') as f:
+        magic = f.read(4)
+    return magic in PCAP_MAGIC or magic == PCAPNG_SHB
+
+
+def _read_exact(f: BinaryIO, size: int) -> Optional[bytes]:
+    data = f.read(size)
+    if not data:
+        return None
+    if len(data) < size:
+        raise ValueError("truncated capture")
+    return data
+
+
+def _read_block(f: BinaryIO, size: int) -> bytes:
+    # Inside a pcapng block, end of file is truncation too
+    data = _read_exact(f, size)
+    if data is None:
+        raise ValueError("truncated pcapng block")
+    return data
+
+
+def _iter_pcap(f: BinaryIO, magic: bytes) -> Iterator[Tuple[int, int, bytes]]:
+    """(link type, timestamp ns, record) for a classic pcap file"""
+    endian, ns_per_unit = PCAP_MAGIC[magic]
+    header = _read_exact(f, 20)
+    if header is None:
+        raise ValueError("truncated pcap header")
+    _, _, _, _, _, linktype = struct.unpack(endian + 'HHiIII', header)
+    linktype &= 0xFFFF
+    record_header = struct.Struct(endian + 'IIII')
+    while True:
+        raw = _read_exact(f, record_header.size)
+        if raw is None:
+            return
+        seconds, fraction, captured, _ = record_header.unpack(raw)
+        data = _read_exact(f, captured) or b''
+        yield linktype, seconds * 1_000_000_000 + fraction * ns_per_unit, data
+
+
+def _tsresol_ns(options: bytes, endian: str) -> Tuple[int, int]:
+    """(numerator, denominator) converting timestamp units to ns; default 1 us"""
+    pos = 0
+    while pos + 4 <= len(options):
+        code, length = struct.unpack_from(endian + 'HH', options, pos)
+        if code == 0:
+            break
+        if code == _OPT_IF_TSRESOL and length >= 1:
+            value = options[pos + 4]
+            exponent = value & 0x7F
+            if value & 0x80:
+                return 1_000_000_000, 2 ** exponent
+            return (10 ** 9, 10 ** exponent) if exponent <= 9 else (1, 10 ** (exponent - 9))
+        pos += 4 + ((length + 3) & ~3)
+    return 1000, 1
+
+
+def _check_block_length(length: int):
+    # Blocks are at least type + two lengths, padded to 32 bits
+    if length < 12 or length % 4:
+        raise ValueError(f"bad pcapng block length {length}")
+
+
+def _interface(interfaces: list, index: int) -> tuple:
+    if index >= len(interfaces):
+        raise ValueError(f"pcapng packet names unknown interface {index} "
+                         f"({len(interfaces)} declared in its section)")
+    return interfaces[index]
+
+
+def _iter_pcapng(f: BinaryIO) -> Iterator[Tuple[int, int, bytes]]:
+    """(link type, timestamp ns, record) for a pcapng file"""
+    endian = '<'
+    interfaces = []  # (link type, snaplen, ns numerator, ns denominator)
+    while True:
+        head = _read_exact(f, 8)
+        if head is None:
+            return
+        if head[:4] == PCAPNG_SHB:
+            # Section header: byte order decides how the rest is read
+            (magic,) = struct.unpack('<I', _read_block(f, 4))
+            endian = '<' if magic == _PCAPNG_BYTE_ORDER else '>'
+            (length,) = struct.unpack(endian + 'I', head[4:])
+            _check_block_length(length)
+            _read_block(f, length - 12)
+            interfaces = []
+            continue
+
+        block_type, length = struct.unpack(endian + 'II', head)
+        _check_block_length(length)
+        body = _read_block(f, length - 8)[:-4]
+
+        if block_type == _IDB:
+            linktype, _, snaplen = struct.unpack_from(endian + 'HHI', body)
+            interfaces.append((linktype, snaplen) + _tsresol_ns(body[8:], endian))
+        elif block_type in (_EPB, _PB):
+            if block_type == _EPB:
+                interface, high, low, captured, _ = struct.unpack_from(endian + 'IIIII', body)
+            else:
+                interface, _, high, low, captured, _ = struct.unpack_from(endian + 'HHIIII', body)
+            linktype, _, num, den = _interface(interfaces, interface)
+            yield linktype, ((high << 32) | low) * num // den, body[20:20 + captured]
+        elif block_type == _SPB:
+            linktype, snaplen, _, _ = _interface(interfaces, 0)
+            (original,) = struct.unpack_from(endian + 'I', body)
+            yield linktype, 0, body[4:4 + min(original, snaplen or original)]
+
+
+def iter_records(capture_file: Union[str, Path]) -> Iterator[Tuple[int, int, bytes]]:
+    """Yield (link type, timestamp ns, record bytes) for every packet in a pcap/pcapng file"""
+    with open(capture_file, 'rb') as f:
+        magic = f.read(4)
+        if magic == PCAPNG_SHB:
+            f.seek(0)
+            yield from _iter_pcapng(f)
+        elif magic in PCAP_MAGIC:
+            yield from _iter_pcap(f, magic)
+        else:
+            raise ValueError(f"{capture_file}: not a pcap or pcapng file")
+
+
+def parse_hid_request(record: bytes, frame_number: int, timestamp_ns: int) -> Optional[HidRequest]:
+    """HidRequest for a USBPcap control SETUP record carrying a HID class request"""
+    if len(record) < _USBPCAP_HEADER.size:
+        return None
+    (header_len, _, _, _, info, _, _, _, transfer,
+     data_length) = _USBPCAP_HEADER.unpack_from(record)
+    if (transfer != USBPCAP_TRANSFER_CONTROL or info & USBPCAP_INFO_PDO_TO_FDO
+            or header_len <= _USBPCAP_HEADER.size or record[_USBPCAP_HEADER.size] != USBPCAP_STAGE_SETUP
+            or data_length < _SETUP.size):
+        return None
+
+    data = record[header_len:header_len + data_length]
+    bm_request_type, b_request, w_value, w_index, _ = _SETUP.unpack_from(data)
+    if bm_request_type & REQUEST_TYPE_MASK != REQUEST_TYPE_CLASS:
+        return None
+    return HidRequest(
+        frame_number=frame_number,
+        timestamp_ns=timestamp_ns,
+        bm_request_type=bm_request_type,
+        b_request=b_request,
+        w_value=w_value,
+        w_index=w_index,
+        data=bytes(data[_SETUP.size:])
+    )
+
+
+def iter_pcap_requests(capture_file: Union[str, Path]) -> Iterator[HidRequest]:
+    """Yield every HID class control request in a USBPcap pcap/pcapng file"""
+    for frame_number, (linktype, timestamp_ns, record) in enumerate(iter_records(capture_file), 1):
+        if linktype != LINKTYPE_USBPCAP:
+            continue
+        request = parse_hid_request(record, frame_number, timestamp_ns)
+        if request is not None:
+            yield request
+
+
+def _usbpcap_record(request: HidRequest) -> bytes:
+    setup = _SETUP.pack(request.bm_request_type, request.b_request, request.w_value,
+                        request.w_index, len(request.data))
+    payload = setup + request.data
+    header = _USBPCAP_HEADER.pack(_USBPCAP_HEADER.size + 1, 0, 0, 0x001b, 0, 1, 1, 0,
+                                  USBPCAP_TRANSFER_CONTROL, len(payload))
+    return header + bytes([USBPCAP_STAGE_SETUP]) + payload
+
+
+def write_pcap(capture_file: Union[str, Path], requests: Iterable[HidRequest],
+               pcapng: bool = False) -> None:
+    """Write requests as USBPcap SETUP records (frame numbers are not preserved)"""
+    with open(capture_file, 'wb') as f:
+        if pcapng:
+            f.write(struct.pack('<4sIIHHq', PCAPNG_SHB, 28, _PCAPNG_BYTE_ORDER, 1, 0, -1) + struct.pack('<I', 28))
+            # Interface with if_tsresol = 9 (nanoseconds)
+            options = struct.pack('<HHB3x', _OPT_IF_TSRESOL, 1, 9) + struct.pack('<HH', 0, 0)
+            f.write(struct.pack('<IIHHI', _IDB, 20 + len(options), LINKTYPE_USBPCAP, 0, 65535)
+                    + options + struct.pack('<I', 20 + len(options)))
+        else:
+            f.write(struct.pack('<4sHHiIII', b'\x4d\x3c\xb2\xa1', 2, 4, 0, 0, 65535, LINKTYPE_USBPCAP))
+
+        for request in requests:
+            record = _usbpcap_record(request)
+            seconds, nanoseconds = divmod(request.timestamp_ns, 1_000_000_000)
+            if pcapng:
+                padded = record + b'\0' * (-len(record) % 4)
+                length = 32 + len(padded)
+                f.write(struct.pack('<IIIIIII', _EPB, length, 0, request.timestamp_ns >> 32,
+                                    request.timestamp_ns & 0xFFFFFFFF, len(record), len(record))
+                        + padded + struct.pack('<I', length))
+            else:
+                f.write(struct.pack('<IIII', seconds, nanoseconds, len(record), len(record)) + record)
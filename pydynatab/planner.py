@@ -0,0 +1,145 @@
+"""
+Update planner: predict how long each way of updating the screen takes.
+
+Every upload starts with an init packet and then pays a fixed overhead
+before its data packets go out: in the official captures the host sends
+the init, waits for a Get_Report handshake (~130 ms) and sends the first
+data packet ~240 ms after the init; data packets then follow every
+~5.5 ms. PSDynaTab's Send-DynaTabImage instead sleeps 5 ms after every
+packet (Send-FeaturePacket), 10 ms after the init and 200 ms for the
+device to render. So an upload of n data packets takes
+
+    init_time + n * packet_time
+
+and several scattered regions, each paying init_time, can cost more than
+one full frame. plan_update() prices the three strategies (full frame,
+one bounding region, the best grouping into several regions) with a
+CostModel and picks the fastest.
+
+fit_cost_model() measures init_time and packet_time from recorded
+captures, and prediction_errors() checks a model against them.
+"""
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Union
+
+import numpy as np
+
+from .cache import SET_REPORT, load_capture
+from .protocol import OPCODE_DATA, OPCODE_INIT, PAYLOAD_SIZE
+from .sparse import FULL_SCREEN, Rect, bounding_rect, dirty_rects, rect_bytes
+
+STRATEGIES = ('full', 'region', 'regions')
+
+
+@dataclass(frozen=True)
+class CostModel:
+    """Seconds per upload (init_time) and per data packet (packet_time)"""
+    init_time: float
+    packet_time: float
+
+    def upload_time(self, data_packets: int) -> float:
+        """Predicted time from an init until the next upload may start"""
+        return self.init_time + data_packets * self.packet_time
+
+    def rect_time(self, rect: Rect) -> float:
+        """Predicted time of one upload of a region"""
+        return self.upload_time(-(-rect_bytes(rect) // PAYLOAD_SIZE))
+
+    def plan_time(self, rects: Iterable[Rect]) -> float:
+        """Predicted time of uploading several regions one after another"""
+        return sum(self.rect_time(rect) for rect in rects)
+
+
+# Send-DynaTabImage: 5 ms + 10 ms after the init, 200 ms render wait; 5 ms per data packet
+PSDYNATAB_COSTS = CostModel(init_time=0.215, packet_time=0.005)
+# fit_cost_model() over the official-software captures in usbPcap/
+CAPTURED_COSTS = CostModel(init_time=0.237, packet_time=0.0055)
+
+
+@dataclass
+class Upload:
+    """One init packet and the data packets that followed it in a capture"""
+    frame_number: int
+    byte_count: int
+    data_packets: int
+    duration: float  # seconds from the init to the last data packet
+
+
+def iter_uploads(capture_file: Union[str, Path], use_cache: bool = True) -> Iterator[Upload]:
+    """Uploads in a capture that carried at least one data packet"""
+    records = load_capture(capture_file, use_cache)
+    records = records[(records['brequest'] == SET_REPORT) & (records['length'] > 0)]
+    upload = None
+    start = 0
+    for record in records:
+        opcode = record['data'][0]
+        if opcode == OPCODE_INIT:
+            if upload is not None and upload.data_packets:
+                yield upload
+            data = record['data']
+            upload = Upload(int(record['frame']), int(data[4]) | int(data[5]) << 8, 0, 0.0)
+            start = int(record['timestamp'])
+        elif opcode == OPCODE_DATA and upload is not None:
+            upload.data_packets += 1
+            upload.duration = (int(record['timestamp']) - start) / 1e9
+    if upload is not None and upload.data_packets:
+        yield upload
+
+
+def _upload_arrays(uploads: Iterable[Upload]):
+    uploads = list(uploads)
+    packets = np.array([u.data_packets for u in uploads], dtype=np.float64)
+    durations = np.array([u.duration for u in uploads], dtype=np.float64)
+    return packets, durations
+
+
+def fit_cost_model(uploads: Iterable[Upload]) -> CostModel:
+    """Least-squares init_time and packet_time for recorded uploads
+
+    A capture shows when the last data packet left, not when the next
+    upload could start, so durations are fitted as
+    init_time + (data_packets - 1) * packet_time.
+    """
+    packets, durations = _upload_arrays(uploads)
+    if len(packets) < 2:
+        raise ValueError(f"Need at least 2 uploads to fit a cost model, received {len(packets)}")
+    design = np.column_stack([np.ones_like(packets), packets - 1])
+    (init_time, packet_time), *_ = np.linalg.lstsq(design, durations, rcond=None)
+    return CostModel(float(init_time), float(packet_time))
+
+
+def prediction_errors(model: CostModel, uploads: Iterable[Upload]) -> np.ndarray:
+    """Predicted minus recorded duration (seconds) of each upload"""
+    packets, durations = _upload_arrays(uploads)
+    return model.init_time + (packets - 1) * model.packet_time - durations
+
+
+@dataclass
+class Plan:
+    """The regions to upload for one update and their predicted time"""
+    strategy: str
+    rects: List[Rect]
+    time: float
+    alternatives: Dict[str, float] = field(default_factory=dict)
+
+
+def plan_update(previous: np.ndarray, current: np.ndarray,
+                model: CostModel = CAPTURED_COSTS) -> Plan:
+    """Fastest of full frame, one bounding region and several regions
+
+    alternatives holds every strategy's predicted time. Ties go to the
+    strategy with fewer, larger uploads; an unchanged image plans nothing.
+    """
+    bounds = bounding_rect(previous, current)
+    if bounds is None:
+        return Plan('none', [], 0.0)
+    candidates = {
+        'full': [FULL_SCREEN],
+        'region': [bounds],
+        'regions': dirty_rects(previous, current, model.rect_time),
+    }
+    times = {strategy: model.plan_time(rects) for strategy, rects in candidates.items()}
+    best = min(STRATEGIES, key=lambda strategy: times[strategy])
+    return Plan(best, candidates[best], times[best], times)
@@ -0,0 +1,143 @@
+"""
+Device pool: drive several DynaTab boards as one display.
+
+Initialize-HIDDevice takes the first MI_02 interface and the module keeps
+one connection. DevicePool opens every screen interface (find_hidraw) and
+gives each board its own AsyncTransport, so each has its own sender
+thread and pacing. A frame is encoded once, and the same reports go to
+all boards at the same time. The blocking ioctls run on separate threads,
+so N boards take about as long as the slowest one, not N times as long.
+
+Each board keeps its own SparseEncoder for update(), since a board whose
+send failed no longer shows what the others show: it gets the whole
+screen next time while the rest get the difference. Boards in the same
+state share one encoding.
+
+DevicePool has AsyncTransport's send_reports(), so it can stand in for
+one transport, e.g. behind a DisplayDaemon.
+"""
+
+import asyncio
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .encode import FrameEncoder, Pixels
+from .protocol import stream_image
+from .sparse import SparseEncoder
+from .transport import AdaptivePacer, AsyncTransport, HidrawDevice, find_hidraw
+
+
+class PoolSendError(OSError):
+    """Sending failed on some boards; errors maps board name to its exception"""
+
+    def __init__(self, errors: Dict[str, BaseException]):
+        super().__init__(f"Send failed on {len(errors)} board(s): "
+                         + ", ".join(f"{name}: {error}" for name, error in errors.items()))
+        self.errors = errors
+
+
+def _same_screen(a: Optional[np.ndarray], b: Optional[np.ndarray]) -> bool:
+    if a is None or b is None:
+        return a is b
+    return np.array_equal(a, b)
+
+
+class DevicePool:
+    """One transport per board; every send goes to all of them in parallel
+
+    devices maps a board name (e.g. its hidraw path) to an object with
+    set_feature(); pacer makes each board's AdaptivePacer.
+    """
+
+    def __init__(self, devices: Dict[str, object],
+                 pacer: Callable[[], AdaptivePacer] = AdaptivePacer):
+        if not devices:
+            raise ValueError("Device pool needs at least one device")
+        self.devices = dict(devices)
+        self.transports = {name: AsyncTransport(device, pacer()) for name, device in self.devices.items()}
+        self._encoder = FrameEncoder(feature_reports=True)
+        self._sparse = {name: SparseEncoder() for name in self.devices}
+        self._lock = asyncio.Lock()  # one encoded frame in flight: the encoder's buffer is reused
+
+    def __len__(self) -> int:
+        return len(self.devices)
+
+    async def _send_each(self, reports: Dict[str, Sequence[bytes]]):
+        # reports maps board name to what that board gets; PoolSendError lists the failures
+        results = await asyncio.gather(*(self.transports[name].send_reports(board_reports)
+                                         for name, board_reports in reports.items()),
+                                       return_exceptions=True)
+        errors = {name: result for name, result in zip(reports, results) if isinstance(result, BaseException)}
+        if errors:
+            raise PoolSendError(errors)
+
+    async def send_reports(self, reports: Sequence[bytes]):
+        """Send the same feature reports to every board; PoolSendError lists the boards that failed"""
+        await self._send_each({name: reports for name in self.transports})
+
+    async def send_frame(self, pixels: Pixels):
+        """Encode a full-screen pixel stream (device order) once and send it to every board"""
+        async with self._lock:
+            reports = [b'\x00' + self._encoder.init] + self._encoder.encode(pixels)
+            screen = np.ascontiguousarray(stream_image(pixels))
+            for sparse in self._sparse.values():
+                sparse.screen = screen.copy()
+            try:
+                await self.send_reports(reports)
+            except PoolSendError as error:
+                self._forget(error.errors)
+                raise
+
+    async def update(self, image: np.ndarray) -> int:
+        """Send every board what changed on it since its last update; returns the most packets a board got"""
+        reports: Dict[str, List[bytes]] = {}
+        encoded: List[Tuple[Optional[np.ndarray], SparseEncoder, List[bytes]]] = []
+        for name, sparse in self._sparse.items():
+            for previous, leader, board_reports in encoded:
+                if _same_screen(previous, sparse.screen):
+                    sparse.screen = leader.screen.copy()
+                    break
+            else:
+                previous = sparse.screen
+                board_reports = [b'\x00' + packet for packet in sparse.update(image)]
+                encoded.append((previous, sparse, board_reports))
+            if board_reports:
+                reports[name] = board_reports
+        try:
+            await self._send_each(reports)
+        except PoolSendError as error:
+            self._forget(error.errors)
+            raise
+        return max(map(len, reports.values()), default=0)
+
+    def _forget(self, failed: Dict[str, BaseException]):
+        # A failed board shows something unknown: resend it the whole screen next time
+        for name in failed:
+            self._sparse[name].screen = None
+
+    def close(self):
+        """Stop the send workers and close the boards that can be closed"""
+        for transport in self.transports.values():
+            transport.close()
+        for device in self.devices.values():
+            if hasattr(device, 'close'):
+                device.close()
+
+
+def open_pool(paths: Optional[Sequence[Union[str, Path]]] = None,
+              pacer: Callable[[], AdaptivePacer] = AdaptivePacer) -> DevicePool:
+    """DevicePool over the given hidraw nodes, or every DynaTab screen interface found"""
+    paths = list(paths) if paths is not None else find_hidraw()
+    if not paths:
+        raise OSError("No DynaTab 75X screen interface found. Please ensure the boards are connected via USB.")
+    devices: Dict[str, HidrawDevice] = {}
+    try:
+        for path in paths:
+            devices[str(path)] = HidrawDevice(path)
+    except OSError:
+        for device in devices.values():
+            device.close()
+        raise
+    return DevicePool(devices, pacer)
@@ -0,0 +1,279 @@
+"""
+DynaTab 75X HID packet model and decoders.
+
+Every Set_Report payload sent to the screen interface is 64 bytes. Byte 0 is
+the opcode; the opcodes seen so far are registered in OPCODES:
+
+  0xa9  init packet  - frame count, delay, byte count, region (x, y, w, h)
+  0x29  data packet  - 8-byte header followed by RGB pixel payload
+
+Pixel payloads are exposed as (N, 3) uint8 NumPy arrays that view the packet
+bytes directly, so lit-pixel searches, corner checks and colour counts run as
+array operations instead of per-triplet Python loops.
+"""
+
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+# Display geometry
+SCREEN_WIDTH = 60
+SCREEN_HEIGHT = 9
+PIXEL_COUNT = SCREEN_WIDTH * SCREEN_HEIGHT
+
+# Packet layout
+PACKET_SIZE = 64
+HEADER_SIZE = 8
+PAYLOAD_SIZE = PACKET_SIZE - HEADER_SIZE
+BYTES_PER_PIXEL = 3
+
+# Opcodes
+OPCODE_INIT = 0xa9
+OPCODE_DATA = 0x29
+
+RGB = Tuple[int, int, int]
+
+# Corner coordinates of the full display
+CORNERS: Dict[str, Tuple[int, int]] = {
+    "Top-Left": (0, 0),
+    "Top-Right": (SCREEN_WIDTH - 1, 0),
+    "Bottom-Left": (0, SCREEN_HEIGHT - 1),
+    "Bottom-Right": (SCREEN_WIDTH - 1, SCREEN_HEIGHT - 1),
+}
+
+COLOR_NAMES: Dict[RGB, str] = {
+    (0xff, 0x00, 0x00): "Bright Red",
+    (0x7f, 0x00, 0x00): "Dark Red",
+    (0x00, 0xff, 0x00): "Green",
+    (0x00, 0x00, 0xff): "Blue",
+    (0x00, 0x7f, 0x00): "Green (127)",
+}
+
+
+@dataclass
+class Packet:
+    """Represents a captured HID payload"""
+    packet_type: str  # '0xa9' for init, '0x29' for data
+    frame_number: int
+    timestamp: str
+    data: bytes
+
+
+@dataclass
+class HidRequest:
+    """A HID class control request (Set_Report, Get_Report, ...) and its OUT data"""
+    frame_number: int
+    timestamp_ns: int  # Nanoseconds since the Unix epoch (UTC)
+    bm_request_type: int
+    b_request: int  # 0x09 Set_Report, 0x01 Get_Report
+    w_value: int  # Report type << 8 | report ID
+    w_index: int  # Interface
+    data: bytes  # Empty for requests without an OUT data stage
+
+
+@dataclass
+class InitPacket:
+    """Parsed init packet (0xa9)"""
+    byte_00: int  # 0xa9
+    byte_01: int  # Always 0x00
+    byte_02: int  # Frame count (0x01 for static pictures)
+    byte_03: int  # Frame delay in ms (0x00 for static pictures)
+    byte_04_05: int  # Pixel byte count (little endian)
+    byte_06_07: int  # Checksum field (little endian)
+    byte_08: int  # X position
+    byte_09: int  # Y position
+    byte_10: int  # Width
+    byte_11: int  # Height
+    raw_data: bytes
+
+
+@dataclass
+class DataPacket:
+    """Parsed data packet (0x29)"""
+    byte_00: int  # 0x29
+    byte_01: int  # Frame index
+    byte_02: int  # Frame count
+    byte_03: int  # Frame delay
+    packet_index: int  # Packet index
+    byte_05: int  # Always 0x00
+    byte_06_07: int  # Unknown field (little endian)
+    rgb_data: np.ndarray  # (N, 3) uint8 RGB pixel values, viewing raw_data
+    raw_data: bytes
+
+
+def packet_pixels(data: bytes) -> np.ndarray:
+    """RGB triplets carried by a data packet, starting at byte 8
+
+    Returns an (N, 3) uint8 view of data; no bytes are copied.
+    """
+    count = max(len(data) - HEADER_SIZE, 0) // BYTES_PER_PIXEL
+    return np.frombuffer(data, dtype=np.uint8, count=count * BYTES_PER_PIXEL,
+                         offset=HEADER_SIZE if count else 0).reshape(count, BYTES_PER_PIXEL)
+
+
+def parse_init_packet(data: bytes) -> InitPacket:
+    """Parse initialization packet (0xa9)"""
+    if len(data) < 12:
+        raise ValueError(f"Init packet too short: {len(data)} bytes")
+
+    return InitPacket(
+        byte_00=data[0],
+        byte_01=data[1],
+        byte_02=data[2],
+        byte_03=data[3],
+        byte_04_05=data[4] | (data[5] << 8),
+        byte_06_07=data[6] | (data[7] << 8),
+        byte_08=data[8],
+        byte_09=data[9],
+        byte_10=data[10],
+        byte_11=data[11],
+        raw_data=data
+    )
+
+
+def parse_data_packet(data: bytes) -> DataPacket:
+    """Parse data packet (0x29)"""
+    if len(data) < HEADER_SIZE:
+        raise ValueError(f"Data packet too short: {len(data)} bytes")
+
+    return DataPacket(
+        byte_00=data[0],
+        byte_01=data[1],
+        byte_02=data[2],
+        byte_03=data[3],
+        packet_index=data[4],
+        byte_05=data[5],
+        byte_06_07=data[6] | (data[7] << 8),
+        rgb_data=packet_pixels(data),
+        raw_data=data
+    )
+
+
+# Opcode registry: opcode -> (name, parser)
+OPCODES: Dict[int, Tuple[str, Callable[[bytes], object]]] = {
+    OPCODE_INIT: ('init', parse_init_packet),
+    OPCODE_DATA: ('data', parse_data_packet),
+}
+
+
+def opcode_name(opcode: int) -> str:
+    """Registered name of an opcode, or its hex value if unknown"""
+    entry = OPCODES.get(opcode)
+    return entry[0] if entry else f"0x{opcode:02x}"
+
+
+def decode_packet(data: bytes) -> Optional[Union[InitPacket, DataPacket]]:
+    """Decode a payload with the parser registered for its opcode"""
+    if not data or data[0] not in OPCODES:
+        return None
+    return OPCODES[data[0]][1](data)
+
+
+def find_init_packet(packets: Iterable[bytes]) -> Optional[bytes]:
+    """First init (0xa9) payload in packets"""
+    for packet in packets:
+        if packet and packet[0] == OPCODE_INIT:
+            return packet
+    return None
+
+
+def group_frames(packets: Iterable[bytes]) -> Dict[int, List[bytes]]:
+    """Group data (0x29) payloads by frame index (byte 1), sorted by sequence (byte 4)"""
+    frames: Dict[int, List[bytes]] = {}
+    for packet in packets:
+        if packet and packet[0] == OPCODE_DATA:
+            frames.setdefault(packet[1], []).append(packet)
+    for frame_packets in frames.values():
+        frame_packets.sort(key=lambda p: p[4])
+    return frames
+
+
+def frame_pixels(frame_packets: Iterable[bytes]) -> np.ndarray:
+    """Concatenate the pixels of one frame's data packets into an (N, 3) array"""
+    if isinstance(frame_packets, np.ndarray) and frame_packets.ndim == 2:
+        # (packets, PACKET_SIZE) block, e.g. a PacketStore frame
+        triplets = (frame_packets.shape[1] - HEADER_SIZE) // BYTES_PER_PIXEL * BYTES_PER_PIXEL
+        return frame_packets[:, HEADER_SIZE:HEADER_SIZE + triplets].reshape(-1, BYTES_PER_PIXEL)
+    # Join the whole triplets of every payload, then view the result once
+    payload = b''.join([packet[HEADER_SIZE:HEADER_SIZE + (len(packet) - HEADER_SIZE) // BYTES_PER_PIXEL * BYTES_PER_PIXEL]
+                        for packet in frame_packets if len(packet) > HEADER_SIZE])
+    return np.frombuffer(payload, dtype=np.uint8).reshape(-1, BYTES_PER_PIXEL)
+
+
+def payload_stream(frame_packets: Iterable[bytes]) -> bytes:
+    """Concatenate the payload bytes of one frame's data packets
+
+    Unlike frame_pixels this follows the device: byte 6 of each packet is
+    the number of payload bytes it carries (56, or fewer in the last
+    packet), and pixels continue across packet boundaries.
+    """
+    return b''.join([bytes(packet[HEADER_SIZE:HEADER_SIZE + min(packet[6], PAYLOAD_SIZE)])
+                     for packet in frame_packets if len(packet) > HEADER_SIZE])
+
+
+def stream_image(stream: bytes) -> np.ndarray:
+    """View a full-screen payload stream as a (SCREEN_HEIGHT, SCREEN_WIDTH, 3) image
+
+    The device stores pixels column-major (SCREEN_HEIGHT pixels per
+    column), so the result is a transposed view of stream; no bytes are
+    copied. Streams shorter than a full screen raise ValueError.
+    """
+    size = PIXEL_COUNT * BYTES_PER_PIXEL
+    if len(stream) < size:
+        raise ValueError(f"Pixel stream too short: {len(stream)} of {size} bytes")
+    columns = np.frombuffer(stream, dtype=np.uint8, count=size)
+    return columns.reshape(SCREEN_WIDTH, SCREEN_HEIGHT, BYTES_PER_PIXEL).transpose(1, 0, 2)
+
+
+def lit_indices(pixels: np.ndarray) -> np.ndarray:
+    """Indices of every non-black pixel in an (N, 3) array"""
+    return np.flatnonzero(np.asarray(pixels).any(axis=1))
+
+
+def non_black_pixels(pixels: np.ndarray) -> List[Tuple[int, RGB]]:
+    """(index, rgb) of every lit pixel"""
+    pixels = np.asarray(pixels, dtype=np.uint8).reshape(-1, BYTES_PER_PIXEL)
+    idx = lit_indices(pixels)
+    return list(zip(idx.tolist(), map(tuple, pixels[idx].tolist())))
+
+
+def pixel_xy(idx: int) -> Tuple[int, int]:
+    """Row-major (x, y) of a linear pixel index on the 60x9 display"""
+    return idx % SCREEN_WIDTH, idx // SCREEN_WIDTH
+
+
+def pixel_index(x: int, y: int) -> int:
+    """Row-major linear index of display coordinate (x, y)"""
+    return y * SCREEN_WIDTH + x
+
+
+def corner_pixels(pixels: np.ndarray,
+                  corners: Dict[str, Tuple[int, int]] = CORNERS) -> Dict[str, Optional[RGB]]:
+    """Colour at each named (x, y) corner, or None where the frame is too short"""
+    idx = np.array([pixel_index(x, y) for x, y in corners.values()])
+    present = idx < len(pixels)
+    values = np.zeros((len(idx), BYTES_PER_PIXEL), dtype=np.uint8)
+    values[present] = pixels[idx[present]]
+    return {name: tuple(rgb) if ok else None
+            for name, ok, rgb in zip(corners, present.tolist(), values.tolist())}
+
+
+def color_histogram(pixels: np.ndarray) -> Dict[RGB, int]:
+    """Pixel count per distinct colour, most common first"""
+    pixels = np.asarray(pixels, dtype=np.uint8).reshape(-1, BYTES_PER_PIXEL)
+    packed = (pixels[:, 0].astype(np.uint32) << 16) | (pixels[:, 1].astype(np.uint32) << 8) | pixels[:, 2]
+    codes, counts = np.unique(packed, return_counts=True)
+    order = np.argsort(-counts, kind='stable')
+    return {((c >> 16) & 0xff, (c >> 8) & 0xff, c & 0xff): n
+            for c, n in zip(codes[order].tolist(), counts[order].tolist())}
+
+
+def color_name(r: int, g: int, b: int, default: Optional[str] = None) -> str:
+    """Name of a known test colour, falling back to default or RGB(rr,gg,bb)"""
+    name = COLOR_NAMES.get((int(r), int(g), int(b)))
+    if name is not None:
+        return name
+    if default is not None:
+        return default
+    return f"RGB({r:02x},{g:02x},{b:02x})"
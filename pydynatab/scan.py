@@ -0,0 +1,101 @@
+"""
+Byte-level scanner for usb.data_fragment values in Wireshark JSON exports.
+
+The export is memory-mapped and searched with one compiled bytes regex that
+matches both "frame.number" and "usb.data_fragment"; the JSON structure is
+never parsed and nothing is decoded to str. Every "frame.number" starts a
+new packet record, so a large file can be cut at those positions into
+chunks that are scanned independently on a process pool. Fragments are
+still yielded in file order, each with the frame number of its record, and
+at most two chunks per worker are held in memory at a time.
+"""
+
+import binascii
+import mmap
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple, Union
+
+from .batch import default_workers
+
+# Files smaller than this are scanned in the calling process; a worker pool
+# costs more to start than it saves on the captures in usbPcap/
+SCAN_CHUNK_SIZE = 16 * 1024 * 1024
+
+_TOKEN_RE = re.compile(rb'"frame\.number":\s*"(\d+)"|"usb\.data_fragment":\s*"([^"]+)"')
+_RECORD_START = b'"frame.number"'
+
+# (frame number, payload bytes)
+Fragment = Tuple[int, bytes]
+
+
+def _open_mapping(capture_file: Union[str, Path]) -> Optional[mmap.mmap]:
+    with open(capture_file, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # mmap cannot map an empty file
+            return None
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def chunk_bounds(mapping: Union[bytes, mmap.mmap],
+                 chunk_size: int = SCAN_CHUNK_SIZE) -> List[Tuple[int, int]]:
+    """Split mapping into [start, end) ranges of about chunk_size that each start a record"""
+    starts = [0]
+    while True:
+        pos = mapping.find(_RECORD_START, starts[-1] + chunk_size)
+        if pos < 0:
+            break
+        starts.append(pos)
+    return list(zip(starts, starts[1:] + [len(mapping)]))
+
+
+def _iter_range(mapping: mmap.mmap, start: int, end: int) -> Iterator[Fragment]:
+    frame_number = 0
+    for match in _TOKEN_RE.finditer(mapping, start, end):
+        number, fragment = match.groups()
+        if number is not None:
+            frame_number = int(number)
+        else:
+            yield frame_number, binascii.unhexlify(fragment.replace(b':', b''))
+
+
+def _scan_range(capture_file: str, start: int, end: int) -> List[Fragment]:
+    """Worker: every fragment in [start, end) of capture_file"""
+    mapping = _open_mapping(capture_file)
+    try:
+        return list(_iter_range(mapping, start, end))
+    finally:
+        mapping.close()
+
+
+def scan_fragments(capture_file: Union[str, Path], workers: Optional[int] = None,
+                   chunk_size: int = SCAN_CHUNK_SIZE) -> Iterator[Fragment]:
+    """Yield (frame number, payload bytes) for every usb.data_fragment, in file order
+
+    Files larger than chunk_size are scanned in chunks on workers processes
+    (default: one per core); workers=1 always scans in this process.
+    """
+    mapping = _open_mapping(capture_file)
+    if mapping is None:
+        return
+    try:
+        bounds = chunk_bounds(mapping, chunk_size)
+        if workers is None:
+            workers = default_workers(len(bounds))
+        if workers <= 1 or len(bounds) <= 1:
+            yield from _iter_range(mapping, 0, len(mapping))
+            return
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for start, end in bounds:
+                pending.append(pool.submit(_scan_range, str(capture_file), start, end))
+                if len(pending) >= 2 * workers:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+    finally:
+        mapping.close()
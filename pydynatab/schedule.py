@@ -0,0 +1,142 @@
+"""
+Frame-rate controller: send animation frames on absolute deadlines.
+
+Show-DynaTabSpinner renders, sends and then sleeps FrameDelayMs, so each
+frame takes the delay plus the send time. The real frame rate falls
+below the requested one, and the error accumulates over a long run.
+
+FrameScheduler puts frame i at start + i * interval on a monotonic clock.
+It renders frame i, sleeps until its deadline and sends it. If a send
+overruns, frames whose deadline has already passed are skipped (never
+rendered), so the display catches up instead of drifting: the frame shown
+is always the one due at the current time. render(i) gets the frame
+number, so time-based content (spinner phase, clock digits) stays in step.
+
+Achieved FPS, lateness and jitter are returned as ScheduleStats.
+"""
+
+import asyncio
+import inspect
+import math
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator, Optional, Tuple
+
+
+@dataclass
+class ScheduleStats:
+    """Timing of one scheduled run
+
+    Lateness (send start - deadline, seconds) is kept as running sums, so
+    a run without an end uses constant memory.
+    """
+    interval: float
+    sent: int = 0
+    skipped: int = 0
+    elapsed: float = 0.0
+    total_lateness: float = 0.0
+    total_lateness_sq: float = 0.0
+    max_lateness: float = 0.0
+
+    def add_lateness(self, lateness: float):
+        self.total_lateness += lateness
+        self.total_lateness_sq += lateness * lateness
+        self.max_lateness = max(self.max_lateness, lateness)
+
+    @property
+    def fps(self) -> float:
+        return self.sent / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def target_fps(self) -> float:
+        return 1.0 / self.interval
+
+    @property
+    def mean_lateness(self) -> float:
+        return self.total_lateness / self.sent if self.sent else 0.0
+
+    @property
+    def jitter(self) -> float:
+        """Standard deviation of send start lateness, seconds"""
+        if not self.sent:
+            return 0.0
+        return math.sqrt(max(self.total_lateness_sq / self.sent - self.mean_lateness ** 2, 0.0))
+
+
+class FrameScheduler:
+    """Runs render/send on deadlines start + i * interval
+
+    frames limits the run to that many frame slots (sent or skipped), and
+    duration to that many seconds; as with Show-DynaTabSpinner's
+    $totalFrames, duration gives ceil(duration / interval) slots.
+    """
+
+    def __init__(self, interval: float, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], Any] = time.sleep):
+        if interval <= 0:
+            raise ValueError(f"Interval must be positive, received {interval}")
+        self.interval = interval
+        self.clock = clock
+        self.sleep = sleep
+
+    def _slots(self, frames: Optional[int], duration: Optional[float]) -> Optional[int]:
+        if duration is not None:
+            slots = math.ceil(duration / self.interval - 1e-9)
+            return slots if frames is None else min(frames, slots)
+        return frames
+
+    def _due(self, start: float, index: int) -> int:
+        # First slot not yet overdue: index, or later if its deadline passed
+        behind = math.floor((self.clock() - start) / self.interval + 1e-9)
+        return max(index, behind)
+
+    def _steps(self, render: Callable[[int], Any], stats: ScheduleStats,
+               frames: Optional[int], duration: Optional[float]) -> Iterator[Tuple[str, Any]]:
+        # The schedule shared by run() and run_async(): yields ('sleep', seconds)
+        # and ('send', frame) for the caller to carry out, and fills in stats
+        slots = self._slots(frames, duration)
+        start = self.clock()
+        index = 0
+        while slots is None or index < slots:
+            due = self._due(start, index)
+            stats.skipped += due - index
+            index = due
+            if slots is not None and index >= slots:
+                break
+            frame = render(index)
+            wait = start + index * self.interval - self.clock()
+            if wait > 0:
+                yield 'sleep', wait
+            stats.add_lateness(self.clock() - (start + index * self.interval))
+            yield 'send', frame
+            stats.sent += 1
+            index += 1
+        # Hold the last frame for its slot, so the run lasts what was asked
+        wait = start + index * self.interval - self.clock()
+        if wait > 0:
+            yield 'sleep', wait
+        stats.elapsed = self.clock() - start
+
+    def run(self, render: Callable[[int], Any], send: Callable[[Any], Any],
+            frames: Optional[int] = None, duration: Optional[float] = None) -> ScheduleStats:
+        """Render and send frames until the slots run out (forever if neither limit is given)"""
+        stats = ScheduleStats(self.interval)
+        for action, value in self._steps(render, stats, frames, duration):
+            if action == 'sleep':
+                self.sleep(value)
+            else:
+                send(value)
+        return stats
+
+    async def run_async(self, render: Callable[[int], Any], send: Callable[[Any], Any],
+                        frames: Optional[int] = None, duration: Optional[float] = None) -> ScheduleStats:
+        """run() for asyncio code: sleeps with asyncio.sleep and awaits send if it returns an awaitable"""
+        stats = ScheduleStats(self.interval)
+        for action, value in self._steps(render, stats, frames, duration):
+            if action == 'sleep':
+                await asyncio.sleep(value)
+            else:
+                result = send(value)
+                if inspect.isawaitable(result):
+                    await result
+        return stats
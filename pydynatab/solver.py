@@ -0,0 +1,386 @@
+"""
+Brute-force search for formulas that produce the header fields of a packet.
+
+Samples are header fields (targets) next to the parameters they may depend
+on (inputs), taken from every init and data packet in the corpus. For each
+target the solver tries every small-integer combination of the inputs in
+three families and keeps those that reproduce the target in every sample:
+
+  affine   target == (c + sum(a_i * x_i)) mod 2**bits   (a_i in -1, 1)
+  xor      target == c ^ x_1 ^ x_2 ^ ...
+  clamped  target == min(c + sum(a_i * x_i), k)
+
+The constants c and k are solved from the samples rather than searched,
+so every candidate costs one matrix product over the (deduplicated)
+samples. Candidates are generated as coefficient matrices and scored in
+chunks on a process pool.
+
+Uploads the device rejected (the Test-1A/1B/1C experiments, recorded in
+usbPcap/Test-1*-Results.csv next to their captures) are kept as failed
+samples: of two equally simple formulas, the one that predicts something
+other than what more of those packets sent (and so explains why they
+failed) ranks higher.
+"""
+
+import csv
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .batch import default_workers
+from .cache import load_payload_array
+from .protocol import OPCODE_DATA, OPCODE_INIT, PAYLOAD_SIZE
+
+FAMILIES = ('affine', 'xor', 'clamped')
+CHUNK_SIZE = 4096
+
+
+@dataclass(frozen=True)
+class Target:
+    """A header field to solve for and the inputs a formula may use"""
+    name: str
+    bits: int
+    inputs: Tuple[str, ...]
+
+
+# Input columns: raw header bytes plus derived parameters. Bytes 10-11 are
+# read both ways Test-1C asked about: as width/height (size_*) and as the
+# exclusive end corner of a region starting at bytes 8-9 (region_*).
+INIT_COLUMNS = ('byte_1', 'byte_2', 'byte_3', 'byte_4', 'byte_5', 'byte_6',
+                'byte_8', 'byte_9', 'byte_10', 'byte_11',
+                'size_pixels', 'size_bytes', 'region_pixels', 'region_bytes')
+DATA_COLUMNS = ('byte_1', 'byte_2', 'byte_3', 'byte_4', 'byte_5', 'byte_6',
+                'offset', 'upload_bytes')
+
+_INIT_PARAMETERS = ('byte_2', 'byte_3', 'byte_8', 'byte_9', 'byte_10', 'byte_11',
+                    'size_pixels', 'size_bytes', 'region_pixels', 'region_bytes')
+
+INIT_TARGETS = (
+    Target('bytes_4_5', 16, _INIT_PARAMETERS),
+    Target('byte_6', 8, _INIT_PARAMETERS + ('byte_4', 'byte_5')),
+    Target('byte_7', 8, ('byte_1', 'byte_2', 'byte_3', 'byte_4', 'byte_5', 'byte_6',
+                         'byte_8', 'byte_9', 'byte_10', 'byte_11')),
+)
+DATA_TARGETS = (
+    Target('byte_6', 8, ('byte_1', 'byte_2', 'byte_3', 'byte_4', 'offset', 'upload_bytes')),
+    Target('byte_7', 8, ('byte_1', 'byte_2', 'byte_3', 'byte_4', 'byte_5', 'byte_6')),
+)
+
+
+@dataclass
+class Samples:
+    """Header columns of one packet type, one row per packet"""
+    columns: Tuple[str, ...]
+    values: np.ndarray  # (N, columns) int64
+    raw: np.ndarray  # (N, 8 or 12) header bytes
+
+    def column(self, name: str) -> np.ndarray:
+        return self.values[:, self.columns.index(name)]
+
+    def target(self, name: str) -> np.ndarray:
+        if name == 'bytes_4_5':
+            return self.column('byte_4') | (self.column('byte_5') << 8)
+        return self.raw[:, int(name.split('_')[1])]
+
+
+def _byte_columns(header: np.ndarray, indices: Iterable[int]) -> List[np.ndarray]:
+    return [header[:, i] for i in indices]
+
+
+def init_samples(payloads: np.ndarray) -> Samples:
+    """Samples from the init (0xa9) rows of an (N, 64) payload array"""
+    header = payloads[payloads[:, 0] == OPCODE_INIT, :12].astype(np.int64)
+    size = header[:, 10] * header[:, 11]
+    region = (header[:, 10] - header[:, 8]) * (header[:, 11] - header[:, 9])
+    values = np.column_stack(_byte_columns(header, (1, 2, 3, 4, 5, 6, 8, 9, 10, 11))
+                             + [size, size * 3, region, region * 3]) if len(header) else \
+        np.zeros((0, len(INIT_COLUMNS)), dtype=np.int64)
+    return Samples(INIT_COLUMNS, values, header)
+
+
+def data_samples(payloads: np.ndarray) -> Samples:
+    """Samples from the data (0x29) rows of an (N, 64) payload array
+
+    upload_bytes is bytes 4-5 of the latest init packet before the row
+    (rows before any init packet are dropped); offset is the sequence
+    number times the 56-byte payload size.
+    """
+    header = payloads[:, :8].astype(np.int64)
+    is_init = header[:, 0] == OPCODE_INIT
+    upload = np.maximum.accumulate(np.where(is_init, np.arange(len(header)), -1))
+    rows = (header[:, 0] == OPCODE_DATA) & (upload >= 0)
+    upload_bytes = (header[:, 4] | (header[:, 5] << 8))[upload[rows]]
+    header = header[rows]
+    sequence = header[:, 4] | (header[:, 5] << 8)
+    values = np.column_stack(_byte_columns(header, (1, 2, 3, 4, 5, 6))
+                             + [sequence * PAYLOAD_SIZE, upload_bytes]) if len(header) else \
+        np.zeros((0, len(DATA_COLUMNS)), dtype=np.int64)
+    return Samples(DATA_COLUMNS, values, header)
+
+
+def concat_samples(samples: Sequence[Samples]) -> Samples:
+    """One Samples of the rows of several (same columns), duplicates removed"""
+    columns = samples[0].columns
+    width = max(s.raw.shape[1] for s in samples)
+    raw = np.concatenate([np.pad(s.raw, ((0, 0), (0, width - s.raw.shape[1]))) for s in samples])
+    values = np.concatenate([s.values for s in samples])
+    _, unique = np.unique(np.column_stack([values, raw]), axis=0, return_index=True)
+    unique.sort()
+    return Samples(columns, values[unique], raw[unique])
+
+
+# --- Experiment results -----------------------------------------------------
+
+@dataclass
+class ResultRow:
+    """One row of a Test-1*-Results.csv: the init bytes an experiment set and its outcome"""
+    test: str
+    fields: Dict[int, int]  # byte index -> value
+    worked: Optional[bool]  # None when the CSV has no outcome column
+
+
+def read_results_csv(path: Union[str, Path]) -> List[ResultRow]:
+    """Parse a Test-1*-Results.csv written by the Test-1*-FIXED.ps1 scripts
+
+    ByteN columns give byte N; BytesNM columns a little-endian 16-bit value
+    for bytes N and M. The outcome is the Worked column (y/n), or whether
+    any pixel was visible (VisiblePixels).
+    """
+    rows = []
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for record in csv.DictReader(f):
+            fields = {}
+            for name, value in record.items():
+                if name.startswith('Bytes') and len(name) == 7:
+                    number = int(value, 16)
+                    fields[int(name[5])] = number & 0xFF
+                    fields[int(name[6])] = number >> 8
+                elif name.startswith('Byte') and name[4:].isdigit():
+                    fields[int(name[4:])] = int(value, 16)
+            if 'Worked' in record:
+                worked = record['Worked'].strip().lower() == 'y'
+            elif 'VisiblePixels' in record:
+                worked = int(record['VisiblePixels'] or 0) > 0
+            else:
+                worked = None
+            rows.append(ResultRow(record['TestName'], fields, worked))
+    return rows
+
+
+def results_captures(results_file: Union[str, Path]) -> List[Path]:
+    """Captures of the experiment a Test-<tag>-Results.csv describes (*test-<tag>* beside it)"""
+    results_file = Path(results_file)
+    tag = results_file.name.split('-')[1].lower()
+    return sorted(p for p in results_file.parent.glob('*.json') if f'test-{tag}' in p.name.lower())
+
+
+def load_corpus(capture_dir: Union[str, Path], use_cache: bool = True) -> Tuple[Samples, Samples, Samples]:
+    """(init, data, failed init) samples from the captures in capture_dir
+
+    Captures of an experiment with a Test-*-Results.csv are left out of
+    the init and data samples; their init packets that the CSV records
+    as not working are the failed samples, and those recorded as working
+    join the init samples.
+    """
+    capture_dir = Path(capture_dir)
+    experiments = {}
+    for results_file in sorted(capture_dir.glob('Test-*-Results.csv')):
+        rows = read_results_csv(results_file)
+        for capture in results_captures(results_file):
+            experiments[capture] = rows
+
+    empty = np.zeros((0, 64), dtype=np.uint8)
+    inits, datas, failed = [init_samples(empty)], [data_samples(empty)], [init_samples(empty)]
+    for capture in sorted(capture_dir.glob('*.json')):
+        payloads, _ = load_payload_array(capture, use_cache=use_cache)
+        samples = init_samples(payloads)
+        if capture not in experiments:
+            inits.append(samples)
+            datas.append(data_samples(payloads))
+            continue
+        outcome = match_results(payloads, experiments[capture])
+        for wanted, group in ((1, inits), (0, failed)):
+            group.append(Samples(samples.columns, samples.values[outcome == wanted],
+                                 samples.raw[outcome == wanted]))
+    return concat_samples(inits), concat_samples(datas), concat_samples(failed)
+
+
+def match_results(payloads: np.ndarray, rows: Sequence[ResultRow]) -> np.ndarray:
+    """Outcome of each init row in payloads: 1 worked, 0 failed, -1 unknown or unmatched"""
+    inits = payloads[payloads[:, 0] == OPCODE_INIT]
+    outcome = np.full(len(inits), -1, dtype=np.int8)
+    for row in rows:
+        if row.worked is None:
+            continue
+        match = np.ones(len(inits), dtype=bool)
+        for index, value in row.fields.items():
+            match &= inits[:, index] == value
+        outcome[match] = int(row.worked)
+    return outcome
+
+
+# --- Search -----------------------------------------------------------------
+
+@dataclass
+class Candidate:
+    """A formula that reproduces a target in every sample"""
+    target: str
+    family: str
+    terms: Dict[str, int]  # input -> coefficient
+    constant: int
+    limit: Optional[int]  # clamped family only
+    bits: int
+    explained: int = 0  # failed samples whose sent value differs from the prediction
+    wraps: bool = True  # affine only: the sum leaves 0..2**bits - 1 on some sample, so the mask matters
+
+    def formula(self) -> str:
+        constant = f'0x{self.constant:02x}' if self.constant >= 0 else f'-0x{-self.constant:02x}'
+        if self.family == 'xor':
+            operands = ([constant] if self.constant else []) + list(self.terms)
+            return f"{self.target} = {' ^ '.join(operands)}"
+        expression = constant if self.constant or not self.terms else ''
+        for name, a in self.terms.items():
+            term = name if abs(a) == 1 else f'{abs(a)}*{name}'
+            if expression:
+                expression += f" {'+' if a > 0 else '-'} {term}"
+            else:
+                expression = term if a > 0 else f'-{term}'
+        if self.family == 'clamped':
+            return f"{self.target} = min({expression}, {self.limit})"
+        if not self.terms or not self.wraps:
+            return f"{self.target} = {expression}"
+        if len(self.terms) > 1 or self.constant:
+            expression = f'({expression})'  # & binds looser than + and -
+        return f"{self.target} = {expression} & 0x{(1 << self.bits) - 1:x}"
+
+    def rank(self) -> Tuple:
+        return (len(self.terms), sum(abs(a) for a in self.terms.values()), -self.explained,
+                FAMILIES.index(self.family), self.constant)
+
+
+def coefficient_matrix(inputs: int, max_terms: int, coefficients: Sequence[int] = (-1, 1)) -> np.ndarray:
+    """Every coefficient vector with at most max_terms non-zero entries"""
+    vectors = [np.zeros(inputs, dtype=np.int64)]
+    for size in range(1, max_terms + 1):
+        for support in itertools.combinations(range(inputs), size):
+            for values in itertools.product(coefficients, repeat=size):
+                vector = np.zeros(inputs, dtype=np.int64)
+                vector[list(support)] = values
+                vectors.append(vector)
+    return np.array(vectors)
+
+
+def _xor_terms(mask: np.ndarray, x: np.ndarray) -> np.ndarray:
+    """(candidates, samples) XOR of the inputs each mask row selects"""
+    result = np.zeros((len(mask), len(x)), dtype=np.int64)
+    for column in range(mask.shape[1]):
+        result ^= np.where(mask[:, column, None], x[None, :, column], 0)
+    return result
+
+
+def _fit_chunk(family: str, coefficients: np.ndarray, x: np.ndarray, t: np.ndarray,
+               bits: int, failed_x: np.ndarray, failed_t: np.ndarray) -> List[Tuple[int, int, Optional[int], int, bool]]:
+    """(row, constant, limit, explained, wraps) for every coefficient row that fits all samples"""
+    modulus = 1 << bits
+    if family == 'xor':
+        mask = coefficients.astype(bool)
+        c = _xor_terms(mask, x) ^ t[None]
+        fits = np.flatnonzero((c == c[:, :1]).all(axis=1))
+        constants = c[fits, 0]
+        predicted = constants[:, None] ^ _xor_terms(mask[fits], failed_x)
+        limits = [None] * len(fits)
+        wraps = np.zeros(len(fits), dtype=bool)
+    elif family == 'affine':
+        c = (t[None] - coefficients @ x.T) % modulus
+        fits = np.flatnonzero((c == c[:, :1]).all(axis=1))
+        constants = c[fits, 0]
+        predicted = (constants[:, None] + coefficients[fits] @ failed_x.T) % modulus
+        limits = [None] * len(fits)
+        unwrapped = constants[:, None] + coefficients[fits] @ x.T
+        wraps = ((unwrapped < 0) | (unwrapped >= modulus)).any(axis=1)
+    else:
+        limit = int(t.max())
+        below = t < limit
+        if not below.any() or below.all():
+            # No sample reaches a ceiling, or every sample is it: nothing to clamp
+            return []
+        s = coefficients @ x.T
+        c = t[None] - s
+        c_below = c[:, below]
+        fits = (c_below == c_below[:, :1]).all(axis=1)
+        fits &= (c_below[:, :1] + s[:, ~below] >= limit).all(axis=1)
+        fits = np.flatnonzero(fits)
+        constants = c_below[fits, 0]
+        predicted = np.minimum(constants[:, None] + coefficients[fits] @ failed_x.T, limit)
+        limits = [limit] * len(fits)
+        wraps = np.zeros(len(fits), dtype=bool)
+    explained = (predicted != failed_t[None]).sum(axis=1) if len(failed_t) else np.zeros(len(fits), dtype=int)
+    return list(zip(fits.tolist(), constants.tolist(), limits, explained.tolist(), wraps.tolist()))
+
+
+def _fit_task(args) -> List[Tuple[int, int, Optional[int], int, bool]]:
+    family, start, coefficients, x, t, bits, failed_x, failed_t = args
+    return [(start + row, c, k, e, w) for row, c, k, e, w in
+            _fit_chunk(family, coefficients, x, t, bits, failed_x, failed_t)]
+
+
+def solve(target: Target, samples: Samples, failed: Optional[Samples] = None,
+          max_terms: int = 6, families: Sequence[str] = FAMILIES,
+          workers: Optional[int] = None, chunk_size: int = CHUNK_SIZE) -> List[Candidate]:
+    """Every formula in families that reproduces target in all samples, best first
+
+    Candidates are ranked simplest first (fewer and smaller terms), then by
+    how many failed samples they explain, then affine before xor before
+    clamped. Candidates that print the same formula are listed once.
+    """
+    columns = [samples.columns.index(name) for name in target.inputs]
+    x = samples.values[:, columns]
+    t = samples.target(target.name)
+    if failed is not None and len(failed.values):
+        failed_x, failed_t = failed.values[:, columns], failed.target(target.name)
+    else:
+        failed_x, failed_t = np.zeros((0, len(columns)), dtype=np.int64), np.zeros(0, dtype=np.int64)
+    if not len(t):
+        return []
+
+    matrix = coefficient_matrix(len(columns), max_terms)
+    # Without terms xor and clamped are the affine constant again
+    xor_matrix = np.unique(np.abs(matrix[1:]), axis=0)
+    family_rows = {'affine': matrix, 'xor': xor_matrix, 'clamped': matrix[1:]}
+    tasks = []
+    for family in families:
+        rows = family_rows[family]
+        tasks.extend((family, start, rows[start:start + chunk_size], x, t, target.bits, failed_x, failed_t)
+                     for start in range(0, len(rows), chunk_size))
+
+    if workers is None:
+        workers = default_workers(len(tasks))
+    if workers <= 1:
+        results = [_fit_task(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_fit_task, tasks))
+
+    candidates = []
+    for task, fits in zip(tasks, results):
+        family = task[0]
+        rows = family_rows[family]
+        for row, constant, limit, explained, wraps in fits:
+            terms = {target.inputs[i]: int(a) for i, a in enumerate(rows[row]) if a}
+            candidates.append(Candidate(target.name, family, terms, int(constant), limit,
+                                        target.bits, int(explained), bool(wraps)))
+    candidates.sort(key=Candidate.rank)
+    # Families overlap (an affine sum that never wraps is the xor of one term,
+    # say): keep the best-ranked candidate of each formula
+    formulas = set()
+    unique = []
+    for candidate in candidates:
+        formula = candidate.formula()
+        if formula not in formulas:
+            formulas.add(formula)
+            unique.append(candidate)
+    return unique
@@ -0,0 +1,201 @@
+"""
+Memory-mapped packet store with random access by animation frame.
+
+A PacketStore holds the data packets (0x29) of one capture sorted by
+(frame index, sequence), i.e. by (byte 1, bytes 4-5). It lives beside the
+capture as <capture>.dtstore and, like the .dtcap cache it is built from,
+is rebuilt whenever the source export's size or mtime changes:
+
+  header    64 bytes
+  keys      uint32[N]            (frame << 16) | sequence, ascending
+  frames    int64[F, 3]          frame index, first packet, end packet
+  packets   uint8[N, 64]         data packets in key order
+  pixels    uint8[F, 1620]       each frame's reassembled pixel stream
+
+Opening a store reads only the header and the frame table, so looking at
+one frame touches that frame's pages and nothing else. Frame packets,
+single packets and frame images are views into the mapping.
+"""
+
+import os
+import struct
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+from .cache import SET_REPORT, load_capture
+from .protocol import (BYTES_PER_PIXEL, HEADER_SIZE, OPCODE_DATA, PACKET_SIZE,
+                       PAYLOAD_SIZE, PIXEL_COUNT, stream_image)
+
+STORE_SUFFIX = '.dtstore'
+STORE_MAGIC = b'DTSTOR'
+STORE_VERSION = 1
+
+# magic, version, source size, source mtime (ns), packet count, frame count
+_HEADER = struct.Struct('<6sHQqQQ')
+_HEADER_SIZE = 64
+
+STREAM_SIZE = PIXEL_COUNT * BYTES_PER_PIXEL
+
+
+def store_path(capture_file: Union[str, Path]) -> Path:
+    """Location of the .dtstore packet store for capture_file"""
+    capture_file = Path(capture_file)
+    return capture_file.with_name(capture_file.name + STORE_SUFFIX)
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def _layout(packet_count: int, frame_count: int) -> Dict[str, int]:
+    """Byte offset of every section, plus the total file size"""
+    keys = _HEADER_SIZE
+    frames = _align(keys + 4 * packet_count)
+    packets = frames + 24 * frame_count
+    pixels = packets + PACKET_SIZE * packet_count
+    return {'keys': keys, 'frames': frames, 'packets': packets,
+            'pixels': pixels, 'end': pixels + STREAM_SIZE * frame_count}
+
+
+def _sequence(packets: np.ndarray) -> np.ndarray:
+    return packets[:, 4].astype(np.uint32) | (packets[:, 5].astype(np.uint32) << 8)
+
+
+def build_store(capture_file: Union[str, Path], path: Optional[Union[str, Path]] = None) -> Path:
+    """Sort the data packets of capture_file by (frame, sequence) and write a store"""
+    records = load_capture(capture_file)
+    records = records[(records['brequest'] == SET_REPORT) & (records['length'] == PACKET_SIZE)]
+    packets = np.asarray(records['data'])
+    packets = packets[packets[:, 0] == OPCODE_DATA]
+
+    keys = (packets[:, 1].astype(np.uint32) << 16) | _sequence(packets)
+    order = np.argsort(keys, kind='stable')
+    keys, packets = keys[order], packets[order]
+
+    frame_ids, starts = np.unique(packets[:, 1], return_index=True)
+    ends = np.append(starts[1:], len(packets)) if len(starts) else starts
+    table = np.stack([frame_ids.astype(np.int64), starts, ends], axis=1)
+
+    # Reassemble each frame's pixel stream from the byte 6 payload lengths.
+    # A capture that uploads the same frame more than once repeats keys;
+    # only the first packet of each key contributes to the stream.
+    first = np.ones(len(keys), dtype=bool)
+    first[1:] = keys[1:] != keys[:-1]
+    lengths = np.where(first, np.minimum(packets[:, 6], PAYLOAD_SIZE), 0)
+    columns = np.arange(PACKET_SIZE)
+    in_payload = (columns >= HEADER_SIZE) & (columns < HEADER_SIZE + lengths[:, None])
+    stream = packets[in_payload]
+    stream_offsets = np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)])
+    pixels = np.zeros((len(table), STREAM_SIZE), dtype=np.uint8)
+    for row, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+        frame_stream = stream[stream_offsets[start]:stream_offsets[end]][:STREAM_SIZE]
+        pixels[row, :len(frame_stream)] = frame_stream
+
+    stat = os.stat(capture_file)
+    layout = _layout(len(packets), len(table))
+    header = _HEADER.pack(STORE_MAGIC, STORE_VERSION, stat.st_size, stat.st_mtime_ns,
+                          len(packets), len(table))
+
+    path = Path(path) if path is not None else store_path(capture_file)
+    tmp = path.with_name(path.name + f'.{os.getpid()}.tmp')
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(header.ljust(_HEADER_SIZE, b'\0'))
+            f.write(keys.astype('<u4').tobytes())
+            f.write(b'\0' * (layout['frames'] - f.tell()))
+            f.write(table.astype('<i8').tobytes())
+            f.write(packets.tobytes())
+            f.write(pixels.tobytes())
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    return path
+
+
+class PacketStore:
+    """Data packets of one capture, indexed by (frame, sequence)"""
+
+    def __init__(self, path: Union[str, Path],
+                 capture_file: Optional[Union[str, Path]] = None):
+        """Map an existing store file
+
+        If capture_file is given, a store built from a different version
+        of it raises ValueError.
+        """
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            header = f.read(_HEADER_SIZE)
+        if len(header) < _HEADER_SIZE:
+            raise ValueError(f"{self.path}: not a packet store")
+        magic, version, size, mtime_ns, packet_count, frame_count = _HEADER.unpack_from(header)
+        if magic != STORE_MAGIC or version != STORE_VERSION:
+            raise ValueError(f"{self.path}: not a version {STORE_VERSION} packet store")
+        if capture_file is not None:
+            stat = os.stat(capture_file)
+            if (size, mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+                raise ValueError(f"{self.path}: stale, {capture_file} has changed")
+
+        layout = _layout(packet_count, frame_count)
+        if os.path.getsize(self.path) != layout['end']:
+            raise ValueError(f"{self.path}: truncated packet store")
+
+        mapping = np.memmap(self.path, dtype=np.uint8, mode='r')
+        self._keys = mapping[layout['keys']:layout['keys'] + 4 * packet_count].view('<u4')
+        table = mapping[layout['frames']:layout['packets']].view('<i8').reshape(frame_count, 3)
+        self._packets = mapping[layout['packets']:layout['pixels']].reshape(packet_count, PACKET_SIZE)
+        self._pixels = mapping[layout['pixels']:layout['end']].reshape(frame_count, STREAM_SIZE)
+
+        # The frame table is small; keep it as plain ints
+        self._frames = {frame: (row, start, end)
+                        for row, (frame, start, end) in enumerate(table.tolist())}
+
+    @classmethod
+    def open(cls, capture_file: Union[str, Path]) -> 'PacketStore':
+        """Store for capture_file, building or rebuilding it when needed"""
+        path = store_path(capture_file)
+        try:
+            return cls(path, capture_file)
+        except (OSError, ValueError):
+            return cls(build_store(capture_file, path), capture_file)
+
+    @property
+    def frames(self) -> List[int]:
+        """Frame indices present in the capture, ascending"""
+        return list(self._frames)
+
+    def __len__(self) -> int:
+        return len(self._packets)
+
+    def __contains__(self, frame: int) -> bool:
+        return frame in self._frames
+
+    def _frame(self, frame: int):
+        try:
+            return self._frames[frame]
+        except KeyError:
+            raise KeyError(f"No data packets for frame {frame}") from None
+
+    def packets(self, frame: int) -> np.ndarray:
+        """(n, 64) view of a frame's data packets in sequence order"""
+        _, start, end = self._frame(frame)
+        return self._packets[start:end]
+
+    def packet(self, frame: int, sequence: int) -> np.ndarray:
+        """64-byte view of one data packet (the first, if the capture repeats it)"""
+        key = (frame << 16) | sequence
+        i = int(np.searchsorted(self._keys, key))
+        if i == len(self._keys) or self._keys[i] != key:
+            raise KeyError(f"No data packet {sequence} in frame {frame}")
+        return self._packets[i]
+
+    def stream(self, frame: int) -> np.ndarray:
+        """A frame's reassembled pixel stream (1620 bytes, zero-padded)"""
+        row, _, _ = self._frame(frame)
+        return self._pixels[row]
+
+    def image(self, frame: int) -> np.ndarray:
+        """(9, 60, 3) view of a frame as displayed"""
+        return stream_image(self.stream(frame))
@@ -0,0 +1,1244 @@
+"""Tests for the pydynatab capture analysis package."""
+
+import asyncio
+import dataclasses
+import json
+import os
+import re
+import shutil
+import struct
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from pydynatab.animation import compile_animation, fold_frames, resample_frames
+from pydynatab import batch
+from pydynatab.batch import analyze_corpus, analyze_files, package_digest
+from pydynatab.cache import (cache_path, iter_cached_packets, iter_cached_payloads,
+                             load_capture, load_payload_array, read_cache)
+from pydynatab.capture import (format_timestamp, iter_entries, iter_fragment_packets,
+                               iter_fragments, iter_hid_requests, iter_layers,
+                               iter_packets, read_fragment_buffer)
+from pydynatab.daemon import (MAGIC, MESSAGE, STATUS_ERROR, STATUS_OK, DisplayClient, DisplayDaemon,
+                              encode_message)
+from pydynatab.emulator import VirtualDynaTab, feature_report
+from pydynatab.encode import FrameEncoder, init_packet
+from pydynatab.font import FONT_PATH, TextRenderer, load_font, render_text
+from pydynatab.hexdata import (decode_fragment_array, decode_fragments,
+                               parse_hex_fragment, split_fragments)
+from pydynatab.image import box_resize, image_stream, load_image, raw_image, to_screen
+from pydynatab.index import INDEX_NAME, connect, index_capture, open_index
+from pydynatab.manifest import content_changed, file_state
+from pydynatab.pcap import is_pcap, iter_records, write_pcap
+from pydynatab.planner import (CAPTURED_COSTS, CostModel, fit_cost_model, iter_uploads,
+                               plan_update, prediction_errors)
+from pydynatab.scan import chunk_bounds, scan_fragments
+from pydynatab.schedule import FrameScheduler
+from pydynatab.pool import DevicePool, PoolSendError, open_pool
+from pydynatab.protocol import (OPCODE_DATA, OPCODE_INIT, DataPacket, InitPacket,
+                                Packet,
+                                color_histogram, color_name, corner_pixels,
+                                decode_packet, frame_pixels, group_frames,
+                                non_black_pixels, packet_pixels, payload_stream,
+                                stream_image)
+from pydynatab.solver import (DATA_TARGETS, INIT_TARGETS, Candidate, Samples, Target, load_corpus,
+                              read_results_csv, solve)
+from pydynatab.sparse import SparseEncoder, apply_packets, bounding_rect, dirty_rects
+from pydynatab.store import PacketStore, store_path
+from pydynatab.transport import (HIDIOCGFEATURE, HIDIOCSFEATURE, AdaptivePacer, AsyncTransport,
+                                 find_hidraw, sweep_min_gap)
+from pydynatab.validate import (StreamValidator, check_packet_array, checksum_ok,
+                                packet_checksum, validate_packets)
+
+USBPCAP_DIR = Path(__file__).resolve().parents[2] / 'usbPcap'
+STATIC_CAPTURE = USBPCAP_DIR / '2026-01-17-picture-topLeft-1pixel-00-ff-00.json'
+ANIMATION_CAPTURE = USBPCAP_DIR / 'validation-anim-basic-3frame-RGB-150ms.json'
+
+
+class TestCaptureReader:
+
+    @pytest.mark.parametrize('chunk_size', [7, 1024, 64 * 1024])
+    def test_matches_json_load(self, chunk_size):
+        with open(STATIC_CAPTURE) as f:
+            expected = json.load(f)
+        assert list(iter_entries(STATIC_CAPTURE, chunk_size)) == expected
+
+    def test_yields_layers(self):
+        layers = list(iter_layers(STATIC_CAPTURE))
+        assert layers
+        assert all('frame' in l for l in layers)
+
+    def test_empty_array(self, tmp_path):
+        path = tmp_path / 'empty.json'
+        path.write_text('[\n]\n')
+        assert list(iter_entries(path)) == []
+
+    def test_truncated_capture_raises(self, tmp_path):
+        path = tmp_path / 'truncated.json'
+        path.write_text('[{"_source": {"layers": {}}}, {"_source": ')
+        with pytest.raises(ValueError):
+            list(iter_entries(path))
+
+    def test_rejects_non_array(self, tmp_path):
+        path = tmp_path / 'object.json'
+        path.write_text('{"_source": {}}')
+        with pytest.raises(ValueError):
+            list(iter_entries(path))
+
+    def test_follow_growing_file(self, tmp_path):
+        text = STATIC_CAPTURE.read_text(encoding='utf-8')
+        path = tmp_path / 'live.json'
+        path.write_text('')
+
+        def writer():
+            with open(path, 'a', encoding='utf-8') as f:
+                for start in range(0, len(text), 5000):
+                    f.write(text[start:start + 5000])
+                    f.flush()
+                    time.sleep(0.005)
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        entries = list(iter_entries(path, follow=True, stop=lambda: not thread.is_alive()))
+        thread.join()
+        assert entries == json.loads(text)
+
+    def test_follow_stops_quietly(self, tmp_path):
+        path = tmp_path / 'live.json'
+        path.write_text('[{"_source": {"layers": {}}}, {"_source": ')
+        assert list(iter_entries(path, follow=True, stop=lambda: True)) == [{'_source': {'layers': {}}}]
+
+
+def count_data_packets(capture_file):
+    """Module-level, so it can be pickled for the worker processes"""
+    return sum(1 for p in iter_packets(capture_file) if p.data[0] == OPCODE_DATA)
+
+
+ANALYZED = []
+
+
+def record_size(path):
+    ANALYZED.append(Path(path).name)
+    return os.path.getsize(path)
+
+
+class TestManifest:
+
+    def test_touch_is_not_a_change(self, tmp_path):
+        path = tmp_path / 'capture.json'
+        path.write_bytes(b'[]')
+        before = file_state(path)
+        os.utime(path, ns=(before.mtime_ns, before.mtime_ns + 10**9))
+        after = file_state(path, before)
+        assert after.mtime_ns != before.mtime_ns
+        assert not content_changed(before, after)
+
+    def test_content_change(self, tmp_path):
+        path = tmp_path / 'capture.json'
+        path.write_bytes(b'[]')
+        before = file_state(path)
+        path.write_bytes(b'[1]')
+        assert content_changed(before, file_state(path, before))
+        assert content_changed(None, before)
+
+
+class TestBatch:
+
+    def test_results_keep_input_order(self, tmp_path):
+        files = []
+        for size in (10, 300, 20, 4000):
+            path = tmp_path / f'{size}.bin'
+            path.write_bytes(bytes(size))
+            files.append(path)
+        assert analyze_files(os.path.getsize, files, workers=2) == [10, 300, 20, 4000]
+
+    def test_corpus_only_analyzes_new_and_changed_files(self, tmp_path):
+        files = []
+        for name in ('a', 'b', 'c'):
+            path = tmp_path / f'{name}.json'
+            path.write_bytes(bytes(len(name)))
+            files.append(path)
+        results = tmp_path / 'sizes.results'
+
+        ANALYZED.clear()
+        assert analyze_corpus(record_size, files, workers=1, results_file=results) == [1, 1, 1]
+        assert ANALYZED == ['a.json', 'b.json', 'c.json']
+
+        ANALYZED.clear()
+        files[1].write_bytes(bytes(5))
+        files.append(tmp_path / 'd.json')
+        files[-1].write_bytes(bytes(7))
+        assert analyze_corpus(record_size, files, workers=1, results_file=results) == [1, 5, 1, 7]
+        assert ANALYZED == ['b.json', 'd.json']
+
+        ANALYZED.clear()
+        assert analyze_corpus(record_size, files, workers=1, results_file=results) == [1, 5, 1, 7]
+        assert ANALYZED == []
+
+    def test_library_change_discards_results(self, tmp_path, monkeypatch):
+        path = tmp_path / 'a.json'
+        path.write_bytes(bytes(3))
+        results = tmp_path / 'sizes.results'
+        analyze_corpus(record_size, [path], workers=1, results_file=results)
+        assert len(package_digest()) == 64
+        monkeypatch.setattr(batch, 'package_digest', lambda: 'edited')
+        ANALYZED.clear()
+        assert analyze_corpus(record_size, [path], workers=1, results_file=results) == [3]
+        assert ANALYZED == ['a.json']
+
+    def test_parallel_matches_serial(self):
+        files = [STATIC_CAPTURE, ANIMATION_CAPTURE]
+        assert (analyze_files(count_data_packets, files, workers=2)
+                == analyze_files(count_data_packets, files, workers=1)
+                == [count_data_packets(f) for f in files])
+
+
+class TestCaptureCache:
+
+    @pytest.fixture
+    def capture(self, tmp_path):
+        return Path(shutil.copy(ANIMATION_CAPTURE, tmp_path))
+
+    def test_matches_json_readers(self, capture):
+        assert list(iter_cached_packets(capture)) == list(iter_packets(capture))
+        assert list(iter_cached_payloads(capture)) == list(iter_fragment_packets(capture))
+        assert cache_path(capture).exists()
+
+    def test_second_load_is_memory_mapped(self, capture):
+        first = load_capture(capture)
+        second = load_capture(capture)
+        assert isinstance(second, np.memmap)
+        assert (first == second).all()
+
+    def test_get_reports_are_kept(self, capture):
+        records = load_capture(capture)
+        assert set(records['brequest'].tolist()) == {0x01, 0x09}
+        assert (records['length'][records['brequest'] == 0x01] == 0).all()
+
+    def test_stale_cache_is_rebuilt(self, capture):
+        load_capture(capture)
+        stat = os.stat(capture)
+        os.utime(capture, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert read_cache(capture) is None
+        load_capture(capture)
+        assert read_cache(capture) is not None
+
+    def test_corrupt_cache_is_ignored(self, capture):
+        cache_path(capture).write_bytes(b'not a cache')
+        assert read_cache(capture) is None
+        assert list(iter_cached_packets(capture)) == list(iter_packets(capture))
+
+
+class TestScan:
+
+    def test_matches_text_search(self):
+        with open(ANIMATION_CAPTURE, encoding='utf-8') as f:
+            text = re.findall(r'"usb\.data_fragment":\s*"([^"]+)"', f.read())
+        fragments = list(scan_fragments(ANIMATION_CAPTURE))
+        assert [data for _, data in fragments] == [parse_hex_fragment(f) for f in text]
+        assert list(iter_fragments(ANIMATION_CAPTURE)) == [f.lower() for f in text]
+        buffer, offsets = read_fragment_buffer(ANIMATION_CAPTURE)
+        assert buffer == decode_fragments(text)[0]
+        assert offsets.tolist() == decode_fragments(text)[1].tolist()
+        packets = list(iter_packets(ANIMATION_CAPTURE))
+        assert [(n, d) for n, d in fragments if d[0] in (OPCODE_INIT, OPCODE_DATA)] \
+            == [(p.frame_number, p.data) for p in packets]
+
+    def test_chunks_start_at_records(self):
+        with open(ANIMATION_CAPTURE, 'rb') as f:
+            content = f.read()
+        bounds = chunk_bounds(content, 4096)
+        assert len(bounds) > 10
+        assert bounds[0][0] == 0 and bounds[-1][1] == len(content)
+        assert all(content.startswith(b'"frame.number"', start) for start, _ in bounds[1:])
+        assert all(end == start for (_, end), (start, _) in zip(bounds, bounds[1:]))
+
+    def test_parallel_chunks_keep_order(self):
+        serial = list(scan_fragments(ANIMATION_CAPTURE, workers=1))
+        assert list(scan_fragments(ANIMATION_CAPTURE, workers=2, chunk_size=4096)) == serial
+
+    def test_early_exit_and_empty_file(self, tmp_path):
+        fragments = scan_fragments(ANIMATION_CAPTURE)
+        next(fragments)
+        fragments.close()
+        empty = tmp_path / 'empty.json'
+        empty.touch()
+        assert list(scan_fragments(empty)) == []
+
+
+class TestPcap:
+
+    @pytest.fixture(params=['pcap', 'pcapng'])
+    def capture(self, request, tmp_path):
+        path = tmp_path / f'capture.{request.param}'
+        write_pcap(path, iter_hid_requests(ANIMATION_CAPTURE), pcapng=request.param == 'pcapng')
+        return path
+
+    def test_requests_round_trip(self, capture):
+        assert is_pcap(capture) and not is_pcap(ANIMATION_CAPTURE)
+        fields = [(r.timestamp_ns, r.bm_request_type, r.b_request, r.w_value, r.w_index, r.data)
+                  for r in iter_hid_requests(ANIMATION_CAPTURE)]
+        assert [(r.timestamp_ns, r.bm_request_type, r.b_request, r.w_value, r.w_index, r.data)
+                for r in iter_hid_requests(capture)] == fields
+        assert {r.b_request for r in iter_hid_requests(capture)} == {0x01, 0x09}
+
+    def test_matches_json_readers(self, capture):
+        expected = list(iter_packets(ANIMATION_CAPTURE))
+        packets = list(iter_packets(capture))
+        assert [(p.packet_type, p.timestamp, p.data) for p in packets] \
+            == [(p.packet_type, p.timestamp, p.data) for p in expected]
+        assert list(iter_fragment_packets(capture)) == list(iter_fragment_packets(ANIMATION_CAPTURE))
+        assert list(iter_cached_payloads(capture)) == list(iter_fragment_packets(ANIMATION_CAPTURE))
+
+    def test_timestamp_format(self):
+        first = next(iter_packets(ANIMATION_CAPTURE))
+        request = next(r for r in iter_hid_requests(ANIMATION_CAPTURE) if r.data)
+        assert format_timestamp(request.timestamp_ns) == first.timestamp
+
+    def test_not_a_pcap(self):
+        with pytest.raises(ValueError):
+            list(iter_records(ANIMATION_CAPTURE))
+
+    def test_truncated_capture(self, capture, tmp_path):
+        data = capture.read_bytes()
+        records = list(iter_records(capture))
+        truncated = tmp_path / 'truncated'
+        for size in list(range(0, 200, 7)) + [len(data) // 2, len(data) - 4]:
+            truncated.write_bytes(data[:size])
+            try:
+                assert len(list(iter_records(truncated))) < len(records)
+            except ValueError:
+                pass  # but never TypeError or struct.error
+        if data[:4] == b'\x0a\x0d\x0d\x0a':
+            truncated.write_bytes(data[:8])  # section header block cut after its header
+            with pytest.raises(ValueError, match='truncated pcapng block'):
+                list(iter_records(truncated))
+            shb_length = struct.unpack_from('<I', data, 4)[0]
+            idb_length = struct.unpack_from('<I', data, shb_length + 4)[0]
+            truncated.write_bytes(data[:4] + struct.pack('<I', 6) + data[8:])  # corrupt section length
+            with pytest.raises(ValueError, match='bad pcapng block length'):
+                list(iter_records(truncated))
+            truncated.write_bytes(data[:shb_length] + data[shb_length + idb_length:])  # no interface block
+            with pytest.raises(ValueError, match='unknown interface'):
+                list(iter_records(truncated))
+
+
+class TestPacketStore:
+
+    @pytest.fixture
+    def capture(self, tmp_path):
+        return Path(shutil.copy(ANIMATION_CAPTURE, tmp_path))
+
+    def test_matches_group_frames(self, capture):
+        store = PacketStore.open(capture)
+        frames = group_frames(iter_fragment_packets(capture))
+        assert store.frames == sorted(frames)
+        for frame in store.frames:
+            assert [bytes(p) for p in store.packets(frame)] == frames[frame]
+            assert (frame_pixels(store.packets(frame)) == frame_pixels(frames[frame])).all()
+
+    def test_random_access(self, capture):
+        store = PacketStore.open(capture)
+        packet = store.packet(1, 5)
+        assert (packet[1], packet[4]) == (1, 5)
+        with pytest.raises(KeyError):
+            store.packet(1, 500)
+        with pytest.raises(KeyError):
+            store.packets(99)
+
+    def test_image_is_a_view_of_the_mapping(self, capture):
+        store = PacketStore.open(capture)
+        image = store.image(0)
+        assert image.shape == (9, 60, 3)
+        assert np.shares_memory(image, store.stream(0))
+        frames = group_frames(iter_fragment_packets(capture))
+        assert (image == stream_image(payload_stream(frames[0]))).all()
+
+    def test_stale_store_is_rebuilt(self, capture):
+        PacketStore.open(capture)
+        stat = os.stat(capture)
+        os.utime(capture, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        with pytest.raises(ValueError):
+            PacketStore(store_path(capture), capture)
+        assert PacketStore.open(capture).frames == [0, 1, 2]
+
+
+class TestCaptureIndex:
+
+    @pytest.fixture
+    def capture_dir(self, tmp_path):
+        shutil.copy(STATIC_CAPTURE, tmp_path)
+        shutil.copy(ANIMATION_CAPTURE, tmp_path)
+        return tmp_path
+
+    def test_one_row_per_payload(self, capture_dir):
+        conn = open_index(capture_dir)
+        for capture in (STATIC_CAPTURE, ANIMATION_CAPTURE):
+            (count,) = conn.execute('SELECT COUNT(*) FROM packets p JOIN captures c ON c.id = p.capture_id '
+                                    'WHERE c.name = ?', (capture.name,)).fetchone()
+            assert count == len(list(iter_packets(capture)))
+
+    def test_init_columns(self, capture_dir):
+        conn = open_index(capture_dir)
+        row = conn.execute('SELECT * FROM packets p JOIN captures c ON c.id = p.capture_id '
+                           'WHERE c.name = ? AND opcode = ?', (STATIC_CAPTURE.name, OPCODE_INIT)).fetchone()
+        init = decode_packet(row['data'])
+        assert (row['x'], row['y'], row['width'], row['height']) == (
+            init.byte_08, init.byte_09, init.byte_10, init.byte_11)
+        assert row['byte_count'] == init.byte_04_05
+        assert row['sequence'] is None
+
+    def test_query_uses_index(self, capture_dir):
+        conn = open_index(capture_dir)
+        plan = conn.execute('EXPLAIN QUERY PLAN SELECT * FROM packets '
+                            'WHERE opcode = 169 AND width = 60 AND delay = 100').fetchall()
+        assert 'USING INDEX' in plan[0]['detail']
+
+    def test_reindex_only_changed_captures(self, capture_dir):
+        conn = connect(capture_dir / INDEX_NAME)
+        capture = capture_dir / ANIMATION_CAPTURE.name
+        assert index_capture(conn, capture)
+        assert not index_capture(conn, capture)
+
+        # Touching without changing the content keeps the rows
+        stat = os.stat(capture)
+        os.utime(capture, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert not index_capture(conn, capture)
+
+        # New content is re-ingested, replacing the old rows
+        shutil.copy(STATIC_CAPTURE, capture)
+        assert index_capture(conn, capture)
+        (count,) = conn.execute('SELECT COUNT(*) FROM packets').fetchone()
+        assert count == len(list(iter_packets(STATIC_CAPTURE)))
+
+    def test_removed_captures_are_pruned(self, capture_dir):
+        open_index(capture_dir).close()
+        (capture_dir / STATIC_CAPTURE.name).unlink()
+        conn = open_index(capture_dir)
+        assert [r['name'] for r in conn.execute('SELECT name FROM captures')] == [ANIMATION_CAPTURE.name]
+
+
+class TestValidate:
+
+    def test_checksum_matches_captures(self):
+        payloads = [p for p in iter_fragment_packets(ANIMATION_CAPTURE) if p[0] in (OPCODE_INIT, OPCODE_DATA)]
+        assert all(checksum_ok(p) for p in payloads)
+        assert packet_checksum(bytes.fromhex('a9000100540600')) == 0xfb
+
+    def test_clean_capture_has_no_issues(self):
+        assert list(validate_packets(iter_packets(ANIMATION_CAPTURE))) == []
+
+    def test_detects_corruption_and_gaps(self):
+        packets = list(iter_packets(ANIMATION_CAPTURE))
+        corrupt = bytearray(packets[3].data)
+        corrupt[7] ^= 0xff
+        packets[3] = dataclasses.replace(packets[3], data=bytes(corrupt))
+        del packets[10]
+        kinds = [issue.kind for issue in validate_packets(packets)]
+        assert kinds.count('checksum') == 1
+        assert 'sequence' in kinds and 'completeness' in kinds
+
+    def test_missing_frame(self):
+        packets = [p for p in iter_packets(ANIMATION_CAPTURE) if p.data[0] != OPCODE_DATA or p.data[1] != 2]
+        validator = StreamValidator()
+        issues = [i for p in packets for i in validator.feed(p)] + validator.finish()
+        assert [i.message for i in issues] == ['Upload sent 2 of 3 frames']
+
+    def test_packet_array(self):
+        payloads, frame_numbers = load_payload_array(ANIMATION_CAPTURE, use_cache=False)
+        assert payloads.shape == (88, 64) and len(frame_numbers) == 88
+        assert all(len(rows) == 0 for rows in check_packet_array(payloads).values())
+
+        payloads = np.array(payloads)
+        payloads[3, 7] ^= 0xff
+        payloads[29, 6] = 56  # last packet of frame 0 carries 52 bytes
+        payloads = np.delete(payloads, 10, axis=0)
+        failures = check_packet_array(payloads)
+        assert failures['checksum'].tolist() == [3, 28]
+        assert failures['length'].tolist() == [28]
+        assert failures['sequence'].tolist() == [10]
+
+    def test_packet_array_agrees_with_stream_validator(self):
+        capture = USBPCAP_DIR / '2026-01-19-test-1b-usbpcap.json'
+        payloads, frame_numbers = load_payload_array(capture, use_cache=False)
+        failures = check_packet_array(payloads)
+        issues = list(validate_packets(iter_cached_packets(capture, opcodes=None, use_cache=False)))
+        for kind in ('checksum', 'sequence'):
+            assert frame_numbers[failures[kind]].tolist() == [i.frame_number for i in issues if i.kind == kind]
+
+
+class TestSolver:
+
+    def test_finds_planted_formula(self):
+        rng = np.random.default_rng(0)
+        values = rng.integers(0, 256, size=(200, 4))
+        raw = np.zeros((200, 8), dtype=np.int64)
+        raw[:, 7] = (0x10 + values[:, 0] - values[:, 2]) & 0xFF
+        samples = Samples(('byte_1', 'byte_2', 'byte_3', 'byte_4'), values, raw)
+        target = Target('byte_7', 8, samples.columns)
+        candidates = solve(target, samples, max_terms=3, workers=1, chunk_size=16)
+        assert candidates[0].formula() == 'byte_7 = (0x10 + byte_1 - byte_3) & 0xff'
+        assert solve(target, samples, max_terms=3, workers=2, chunk_size=16) == candidates
+
+    def test_formulas_print_once_without_spare_parentheses(self):
+        assert Candidate('t', 'affine', {'x': 1}, 0, None, 8).formula() == 't = x & 0xff'
+        assert Candidate('t', 'affine', {'x': -1}, 0, None, 8).formula() == 't = -x & 0xff'
+        assert Candidate('t', 'affine', {'x': 1}, 0, None, 8, wraps=False).formula() == 't = x'
+        values = np.arange(100).reshape(-1, 1)
+        raw = np.zeros((100, 8), dtype=np.int64)
+        raw[:, 7] = values[:, 0]
+        candidates = solve(Target('byte_7', 8, ('byte_1',)), Samples(('byte_1',), values, raw), workers=1)
+        formulas = [c.formula() for c in candidates]
+        assert formulas[0] == 'byte_7 = byte_1' and candidates[0].family == 'affine'
+        assert len(formulas) == len(set(formulas))
+
+    def test_corpus_header_fields(self):
+        inits, datas, failed = load_corpus(USBPCAP_DIR, use_cache=False)
+        assert len(failed.values) > 0
+        best = {t.name: solve(t, inits, failed, max_terms=4, workers=1)[0] for t in INIT_TARGETS}
+        assert best['bytes_4_5'].terms == {'region_bytes': 1}
+        assert best['byte_7'].constant == (0xff - OPCODE_INIT) & 0xff
+        assert best['byte_7'].explained == len(failed.values)
+        best = {t.name: solve(t, datas, max_terms=5, workers=1)[0] for t in DATA_TARGETS}
+        assert best['byte_6'].formula() == 'byte_6 = min(-offset + upload_bytes, 56)'
+        assert best['byte_7'].terms == dict.fromkeys(('byte_1', 'byte_2', 'byte_3', 'byte_4', 'byte_6'), -1)
+
+    def test_results_csv(self):
+        rows = read_results_csv(USBPCAP_DIR / 'Test-1B-Results.csv')
+        assert rows[0].fields == {4: 0x44, 5: 0x01, 8: 0x00, 9: 0x01}
+        assert rows[0].worked is False
+        assert read_results_csv(USBPCAP_DIR / 'Test-1A-Results.csv')[0].worked is None
+
+
+class TestEncode:
+
+    @pytest.mark.parametrize('capture, frame_count, delay', [
+        (USBPCAP_DIR / '2026-01-17-picture-RowSpaced-25percent-ff-00-00.json', 1, 0),
+        (ANIMATION_CAPTURE, 3, 150),
+    ])
+    def test_matches_captured_packets(self, capture, frame_count, delay):
+        payloads = list(iter_fragment_packets(capture))
+        encoder = FrameEncoder(frame_count, delay)
+        assert encoder.init == next(p for p in payloads if p[0] == OPCODE_INIT)
+        frames = group_frames(payloads)
+        assert sorted(frames) == list(range(frame_count))
+        for index, packets in frames.items():
+            assert [bytes(p) for p in encoder.encode(payload_stream(packets), index)] == packets
+
+    def test_first_packet(self):
+        assert init_packet()[:12] == bytes([0xa9, 0x00, 0x01, 0x00, 0x54, 0x06, 0x00, 0xfb,
+                                            0x00, 0x00, 0x3c, 0x09])
+
+    def test_buffer_is_reused(self):
+        encoder = FrameEncoder(feature_reports=True)
+        frame = np.arange(1620, dtype=np.uint8)
+        packets = encoder.encode(frame)
+        assert len(packets) == 29 and all(len(p) == 65 and p[0] == 0 for p in packets)
+        assert encoder.encode(frame[::-1].copy()) is packets
+        assert bytes(packets[0][9:12]) == bytes(frame[::-1][:3])
+        packets = [Packet('0x29', i, '', bytes(p[1:])) for i, p in enumerate(packets)]
+        issues = list(validate_packets([Packet('0xa9', 0, '', encoder.init)] + packets))
+        assert issues == []
+
+    def test_rejects_bad_frames(self):
+        encoder = FrameEncoder()
+        with pytest.raises(ValueError):
+            encoder.encode(bytes(1619))
+        with pytest.raises(ValueError):
+            encoder.encode(bytes(1620), frame_index=1)
+
+
+class TestSparse:
+
+    def test_dirty_rects(self):
+        before = np.zeros((9, 60, 3), dtype=np.uint8)
+        after = before.copy()
+        assert dirty_rects(before, after) == []
+        after[2:7, 20:23] = 255
+        after[4, 25] = 1
+        assert dirty_rects(before, after) == [(20, 2, 26, 7)]
+        after[8, 59] = 1
+        assert dirty_rects(before, after) == [(20, 2, 26, 7), (59, 8, 60, 9)]
+
+    def test_updates_only_changed_region(self):
+        encoder = SparseEncoder()
+        image = np.zeros((9, 60, 3), dtype=np.uint8)
+        assert len(encoder.update(image)) == 30
+        image[1:8, 10:15] = (0, 255, 0)  # one 5x7 character cell
+        packets = encoder.update(image)
+        assert len(packets) == 3
+        assert packets[0][8:12] == bytes([10, 1, 15, 8])
+        assert apply_packets(np.zeros_like(image), packets).tolist() == image.tolist()
+        assert list(validate_packets(Packet(f"0x{p[0]:02x}", i, '', p) for i, p in enumerate(packets))) == []
+        assert encoder.update(image) == []
+
+    def test_matches_official_partial_upload(self):
+        capture = USBPCAP_DIR / 'validation-static-color-secondary-CMY.json'
+        packets = [p for p in iter_fragment_packets(capture) if p[0] in (OPCODE_INIT, OPCODE_DATA)]
+        image = apply_packets(np.zeros((9, 60, 3), dtype=np.uint8), packets)
+        assert SparseEncoder(np.zeros_like(image)).update(image) == packets[:4]
+
+
+class TestPlanner:
+
+    def test_uploads_and_fit(self):
+        uploads = list(iter_uploads(USBPCAP_DIR / 'validation-static-color-secondary-CMY.json', use_cache=False))
+        assert [(u.byte_count, u.data_packets) for u in uploads] == [(117, 3)]
+        uploads = [u for p in sorted(USBPCAP_DIR.glob('validation-static-*.json')) for u in iter_uploads(p, use_cache=False)]
+        model = fit_cost_model(uploads)
+        assert 0.2 < model.init_time < 0.3 and 0.004 < model.packet_time < 0.007
+        assert np.median(np.abs(prediction_errors(model, uploads))) < 0.02
+        assert np.median(np.abs(prediction_errors(CAPTURED_COSTS, uploads))) < 0.02
+
+    def test_picks_fastest_strategy(self):
+        blank = np.zeros((9, 60, 3), dtype=np.uint8)
+        image = blank.copy()
+        image[1:8, 10:15] = 255
+        plan = plan_update(blank, image)
+        assert (plan.strategy, plan.rects) == ('region', [(10, 1, 15, 8)])
+        assert plan.time == pytest.approx(CAPTURED_COSTS.upload_time(2))
+        image[0, 59] = 255
+        assert plan_update(blank, image).strategy == 'region'
+        image[8, 0] = 255
+        assert plan_update(blank, image).strategy == 'full'
+        cheap_init = CostModel(init_time=0.001, packet_time=0.005)
+        plan = plan_update(blank, image, cheap_init)
+        assert plan.strategy == 'regions' and len(plan.rects) == 3
+        assert plan.time < plan.alternatives['full']
+        assert plan_update(blank, blank).rects == []
+
+    def test_encoder_uses_cost(self):
+        blank = np.zeros((9, 60, 3), dtype=np.uint8)
+        image = blank.copy()
+        image[0, 0] = image[8, 59] = 255
+        assert bounding_rect(blank, image) == (0, 0, 60, 9)
+        assert len(SparseEncoder(blank).update(image)) == 4
+        packets = SparseEncoder(blank, cost=CAPTURED_COSTS.rect_time).update(image)
+        assert len(packets) == 30
+        assert apply_packets(blank.copy(), packets).tolist() == image.tolist()
+
+
+def solid_frames(*values):
+    return np.stack([np.full((9, 60, 3), v, dtype=np.uint8) for v in values])
+
+
+class TestAnimation:
+
+    def test_fold_frames(self):
+        frames, delay = fold_frames(solid_frames(1, 1, 2, 2, 3, 3), 100)
+        assert frames[:, 0, 0, 0].tolist() == [1, 2, 3] and delay == 200
+        frames, delay = fold_frames(solid_frames(1, 2, 1, 2, 1, 2), 100)
+        assert frames[:, 0, 0, 0].tolist() == [1, 2] and delay == 100
+        frames, delay = fold_frames(solid_frames(1, 1, 2), 100)
+        assert len(frames) == 3 and delay == 100
+        frames, delay = fold_frames(solid_frames(1, 1, 1, 2, 2, 2), 100)
+        assert len(frames) == 6 and delay == 100  # 300 ms does not fit byte 3
+
+    def test_resample_frames(self):
+        frames, delay = resample_frames(solid_frames(*range(40)), 50, 20)
+        assert frames[:, 0, 0, 0].tolist() == list(range(0, 40, 2)) and delay == 100
+        assert resample_frames(solid_frames(*range(40)), 0, 20)[1] == 0
+        assert resample_frames(solid_frames(*range(40)), 1, 30)[1] == 1
+
+    def test_matches_official_animation(self):
+        capture = USBPCAP_DIR / 'validation-anim-basic-4frame-multicolor-200ms.json'
+        packets = [p for p in iter_fragment_packets(capture) if p[0] in (OPCODE_INIT, OPCODE_DATA)]
+        frames = [stream_image(payload_stream(f)[:1620]) for _, f in sorted(group_frames(packets).items())]
+        assert compile_animation(frames, packets[0][3]).packets() == packets
+
+    def test_delta_region_and_savings(self):
+        screen = np.zeros((9, 60, 3), dtype=np.uint8)
+        frames = []
+        for i in range(48):
+            frame = screen.copy()
+            frame[2:7, 50 + (i // 2) % 8] = 255  # a bar moving every 2 frames
+            frames.append(frame)
+        animation = compile_animation(frames, 50, screen)
+        assert (len(animation.frames), animation.delay) == (8, 100)
+        assert animation.rect == (50, 2, 58, 7)
+        assert animation.data_packets == 8 * 3
+        assert animation.upload_time() < CAPTURED_COSTS.upload_time(48 * 29) / 4
+        packets = animation.packets()
+        assert packets[0][2:4] == bytes([8, 100]) and packets[0][8:12] == bytes([50, 2, 58, 7])
+        assert apply_packets(screen.copy(), packets[:4]).tolist() == frames[0].tolist()
+        assert compile_animation([screen] * 3, 100, screen).packets() == []
+        with pytest.raises(ValueError):
+            compile_animation(frames, 300)
+
+
+class TestEmulator:
+
+    def test_replays_official_uploads(self):
+        capture = USBPCAP_DIR / 'validation-static-color-secondary-CMY.json'
+        packets = [p for p in iter_fragment_packets(capture) if p[0] in (OPCODE_INIT, OPCODE_DATA)]
+        device = VirtualDynaTab()
+        for packet in packets:
+            device.set_feature(feature_report(packet))
+        expected = apply_packets(np.zeros((9, 60, 3), dtype=np.uint8), packets)
+        assert device.screen.tolist() == expected.tolist()
+        stats = device.stats()
+        assert (stats.reports, stats.inits, stats.data_packets, stats.frames) == (4, 1, 3, 1)
+        assert device.issues == []
+
+        capture = USBPCAP_DIR / '2026-01-16-10Frame-100ms.json'
+        device = VirtualDynaTab()
+        for packet in iter_fragment_packets(capture):
+            if packet[0] in (OPCODE_INIT, OPCODE_DATA):
+                device.set_feature(feature_report(packet))
+        assert (len(device.frames), device.delay, device.stats().frames) == (10, 100, 10)
+
+    def test_lost_packet_loses_frames_without_crashing(self):
+        frames = [np.full((9, 60, 3), value, dtype=np.uint8) for value in (10, 20, 30)]
+        reports = [b'\x00' + bytes(p) for p in compile_animation(frames, 100).packets()]
+        device = VirtualDynaTab()
+        for report in reports:
+            device.set_feature(report)
+        assert [frame[0, 0, 0] for frame in device.frames] == [10, 20, 30]
+        for report in reports[:5] + reports[6:]:  # one packet of frame 0 missing
+            device.set_feature(report)
+        assert device.frames == []  # nothing left over from the previous upload
+        assert device.stats().lost == 2
+        assert 'sequence' in [issue.kind for issue in device.issues]
+
+    def test_rejects_and_drops(self):
+        device = VirtualDynaTab()
+        encoder = FrameEncoder(feature_reports=True)
+        reports = [bytes(r) for r in encoder.encode(bytes(range(256)) * 6 + bytes(84))]
+        bad = bytearray(reports[0])
+        bad[8] ^= 0xFF
+        device.set_feature(b'\x00' + encoder.init)
+        device.set_feature(bytes(bad))
+        for report in reports[1:]:
+            device.set_feature(report)
+        assert device.stats().rejected == 1 and device.stats().frames == 0
+        assert [issue.kind for issue in device.issues] == ['checksum']
+        with pytest.raises(ValueError):
+            device.set_feature(reports[0][1:])
+
+        device = VirtualDynaTab(latency=0.002, min_interval=0.05)
+        device.set_feature(b'\x00' + encoder.init)
+        device.set_feature(reports[0])
+        stats = device.stats()
+        assert (stats.reports, stats.dropped) == (1, 1)
+        assert stats.busy >= 0.002
+
+
+class TestTransport:
+
+    def test_streams_frames(self):
+        images = [np.full((9, 60, 3), i, dtype=np.uint8) for i in range(1, 6)]
+
+        async def frames():
+            for image in images:
+                yield image
+
+        async def stream(source):
+            transport = AsyncTransport(device)
+            try:
+                return await transport.stream_frames(source, render=lambda image: image.transpose(1, 0, 2))
+            finally:
+                transport.close()
+
+        device = VirtualDynaTab()
+        assert asyncio.run(stream(images)) == 5
+        assert device.screen.tolist() == images[-1].tolist()
+        assert (device.stats().frames, device.issues) == (5, [])
+        device = VirtualDynaTab()
+        assert asyncio.run(stream(frames())) == 5
+        assert device.frames[0].tolist() == images[-1].tolist()
+
+    def test_backs_off_when_device_stalls(self):
+        device = VirtualDynaTab(min_interval=0.002, stall=True)
+        pacer = AdaptivePacer()
+        transport = AsyncTransport(device, pacer)
+        try:
+            sent = asyncio.run(transport.stream_frames([bytes(1620)] * 2))
+        finally:
+            transport.close()
+        assert sent == 2 and device.stats().frames == 2
+        assert transport.stats.retries > 0 and pacer.gap > 0
+
+    def test_gap_follows_completion_times(self):
+        pacer = AdaptivePacer(min_gap=0.001)
+        for _ in range(20):
+            pacer.success(0.002)
+        assert pacer.gap == pytest.approx(0.001)
+        for _ in range(20):
+            pacer.success(0.008)  # device falling behind: slower completions
+        assert pacer.gap == pytest.approx(0.007, rel=0.05)
+        for _ in range(40):
+            pacer.success(0.002)
+        assert pacer.gap < 0.0012
+
+        class SlowingDevice:
+            def __init__(self):
+                self.latency = 0.0005
+
+            def set_feature(self, report):
+                time.sleep(self.latency)
+
+        device = SlowingDevice()
+        transport = AsyncTransport(device)
+        try:
+            asyncio.run(transport.send_reports([bytes(65)] * 10))
+            assert transport.pacer.gap < 0.002
+            device.latency = 0.005
+            asyncio.run(transport.send_reports([bytes(65)] * 10))
+            assert transport.pacer.gap > 0.003
+        finally:
+            transport.close()
+
+    def test_sweep_min_gap(self):
+        device = VirtualDynaTab(min_interval=0.003, stall=True)
+        encoder = FrameEncoder(feature_reports=True)
+        reports = [b'\x00' + encoder.init] + [bytes(r) for r in encoder.encode(bytes(1620))]
+
+        def check():
+            ok = device.stats().dropped == 0
+            device.reset_stats()
+            return ok
+
+        gap = asyncio.run(sweep_min_gap(device, [0.004, 0.0, 0.001, 0.003], reports, check, settle=0.01))
+        assert gap == 0.003
+
+    def test_find_hidraw(self, tmp_path):
+        assert HIDIOCSFEATURE(65) == 0xC0414806 and HIDIOCGFEATURE(65) == 0xC0414807
+        for node, interface in (('hidraw0', 0), ('hidraw3', 2)):
+            device = tmp_path / 'usb1' / f'1-2:1.{interface}' / f'0003:3151:4015.000{interface}'
+            device.mkdir(parents=True)
+            (device / 'uevent').write_text('DRIVER=hid-generic\nHID_ID=0003:00003151:00004015\n')
+            (tmp_path / 'class' / node).mkdir(parents=True)
+            (tmp_path / 'class' / node / 'device').symlink_to(device)
+        assert find_hidraw(sysfs=tmp_path / 'class') == [Path('/dev/hidraw3')]
+        assert find_hidraw(product_id=0x1234, sysfs=tmp_path / 'class') == []
+
+
+class FakeClock:
+    """Monotonic clock advanced only by sleep() and simulated work"""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestSchedule:
+
+    def test_no_drift_over_an_hour(self):
+        clock = FakeClock()
+        scheduler = FrameScheduler(0.25, clock=clock, sleep=clock.sleep)
+        shown = []
+
+        def send(frame):
+            shown.append(frame)
+            clock.sleep(0.06)  # Set-DynaTabText send time
+
+        stats = scheduler.run(lambda i: '-\\|/'[i % 4], send, duration=3600)
+        assert (stats.sent, stats.skipped) == (14400, 0)
+        assert stats.elapsed == pytest.approx(3600)
+        assert stats.fps == pytest.approx(4.0)
+        assert stats.max_lateness == pytest.approx(0) and stats.jitter == pytest.approx(0)
+        assert shown[:5] == ['-', '\\', '|', '/', '-']
+        assert not any(isinstance(value, list) for value in vars(stats).values())  # no per-frame history
+
+    def test_skips_overdue_frames(self):
+        clock = FakeClock()
+        scheduler = FrameScheduler(0.1, clock=clock, sleep=clock.sleep)
+        rendered = []
+
+        def send(frame):
+            clock.sleep(0.35 if frame == 3 else 0.02)
+
+        stats = scheduler.run(lambda i: rendered.append(i) or i, send, frames=10)
+        # Frame 3 ends at 0.65 s: slots 4 and 5 are gone, slot 6 is shown late
+        assert rendered == [0, 1, 2, 3, 6, 7, 8, 9]
+        assert (stats.sent, stats.skipped) == (8, 2)
+        assert stats.elapsed == pytest.approx(1.0)
+        assert stats.max_lateness == pytest.approx(0.05)
+        assert stats.mean_lateness == pytest.approx(0.05 / 8)
+        assert stats.jitter == pytest.approx(np.std([0.0] * 7 + [0.05]))
+
+    def test_async(self):
+        sent = []
+
+        async def send(frame):
+            sent.append(frame)
+
+        stats = asyncio.run(FrameScheduler(0.005).run_async(lambda i: i, send, frames=4))
+        assert sent == [0, 1, 2, 3] and stats.sent == 4
+        assert stats.elapsed >= 0.02
+        with pytest.raises(ValueError):
+            FrameScheduler(0)
+
+
+class TestDaemon:
+
+    def test_bursts_collapse_with_bounded_latency(self, tmp_path):
+        socket_path = tmp_path / 'dynatab.sock'
+        device = VirtualDynaTab(latency=0.002)  # ~60 ms per full frame
+        transport = AsyncTransport(device)
+        daemon = DisplayDaemon(transport)
+
+        async def client(column):
+            reader, writer = await asyncio.open_unix_connection(str(socket_path))
+            for value in range(1, 51):
+                rect = (column * 20, 0, column * 20 + 20, 9)
+                writer.write(encode_message(np.full((9, 20, 3), value * (column + 1), dtype=np.uint8), rect))
+                assert (await reader.readexactly(1))[0] == STATUS_OK
+                await asyncio.sleep(0.01)  # 100 updates per second per client
+            writer.close()
+
+        async def run():
+            await daemon.start(socket_path)
+            try:
+                await asyncio.gather(*(client(column) for column in range(3)))
+                await daemon.flush()
+            finally:
+                await daemon.stop()
+                transport.close()
+
+        asyncio.run(run())
+        stats = daemon.stats
+        assert stats.updates == 150
+        assert stats.sends < 50 and stats.coalesced > 100
+        assert stats.max_latency < 0.3
+        assert device.screen.tolist() == daemon.desired.tolist()
+        assert device.screen[0, ::20, 0].tolist() == [50, 100, 150]
+        assert device.issues == [] and not socket_path.exists()
+
+    def test_blocking_client(self, tmp_path):
+        socket_path = tmp_path / 'dynatab.sock'
+        device = VirtualDynaTab()
+        transport = AsyncTransport(device)
+        daemon = DisplayDaemon(transport)
+
+        def client():
+            with DisplayClient(socket_path) as display:
+                assert display.send(np.full((9, 60, 3), 7, dtype=np.uint8))
+                assert not display.send(np.zeros((3, 3, 3), dtype=np.uint8), (58, 0, 61, 3))
+                assert display.send(np.full((1, 1, 3), 9, dtype=np.uint8), (59, 8, 60, 9))
+
+        async def run():
+            await daemon.start(socket_path)
+            try:
+                await asyncio.to_thread(client)
+                await daemon.flush()
+            finally:
+                await daemon.stop()
+                transport.close()
+
+        asyncio.run(run())
+        assert (daemon.stats.updates, daemon.stats.rejected) == (2, 1)
+        assert device.screen[8, 59].tolist() == [9, 9, 9] and device.screen[0, 0].tolist() == [7, 7, 7]
+
+
+    def test_oversized_header_drops_connection(self, tmp_path):
+        socket_path = tmp_path / 'dynatab.sock'
+        transport = AsyncTransport(VirtualDynaTab())
+        daemon = DisplayDaemon(transport)
+
+        async def run():
+            await daemon.start(socket_path)
+            try:
+                reader, writer = await asyncio.open_unix_connection(str(socket_path))
+                writer.write(MESSAGE.pack(MAGIC, 0, 0, 60, 9, 0xFFFFFFFF))
+                assert (await reader.readexactly(1))[0] == STATUS_ERROR
+                assert await reader.read() == b''  # dropped without reading the claimed 4 GiB
+                writer.close()
+            finally:
+                await daemon.stop()
+                transport.close()
+
+        asyncio.run(run())
+        assert (daemon.stats.updates, daemon.stats.rejected) == (0, 1)
+
+    def test_send_failures_back_off_and_errors_stop_flush(self):
+        class FlakyTransport:
+            def __init__(self, failures, error):
+                self.failures, self.error, self.calls = failures, error, 0
+
+            async def send_reports(self, reports):
+                self.calls += 1
+                if self.failures:
+                    self.failures -= 1
+                    raise self.error("Device unplugged")
+
+        async def run(transport, **kwargs):
+            daemon = DisplayDaemon(transport, **kwargs)
+            daemon._sender = asyncio.ensure_future(daemon._send_loop())
+            daemon.submit(np.full((9, 60, 3), 1, dtype=np.uint8))
+            try:
+                start = time.perf_counter()
+                await asyncio.wait_for(daemon.flush(), 2)
+                return daemon, time.perf_counter() - start
+            finally:
+                await daemon.stop()
+
+        unplugged = FlakyTransport(3, BrokenPipeError)
+        daemon, elapsed = asyncio.run(run(unplugged, retry_delay=0.02))
+        assert unplugged.calls == 4 and daemon.stats.errors == 3
+        assert elapsed >= 0.02 + 0.04 + 0.08
+        with pytest.raises(RuntimeError):
+            asyncio.run(run(FlakyTransport(1, ValueError)))
+
+
+class BrokenDevice:
+
+    def set_feature(self, report):
+        raise BrokenPipeError(32, "Device unplugged")
+
+
+class TestPool:
+
+    def test_fans_out_in_parallel(self):
+        def frame_time(boards):
+            pool = DevicePool({f'board{i}': VirtualDynaTab(latency=0.002) for i in range(boards)})
+            try:
+                start = time.perf_counter()
+                asyncio.run(pool.send_frame(bytes(range(256)) * 6 + bytes(84)))
+                elapsed = time.perf_counter() - start
+            finally:
+                pool.close()
+            assert all(d.stats().frames == 1 and d.issues == [] for d in pool.devices.values())
+            return elapsed
+
+        assert frame_time(4) < frame_time(1) * 2
+
+    def test_update_and_failures(self):
+        pool = DevicePool({'a': VirtualDynaTab(), 'b': BrokenDevice(), 'c': VirtualDynaTab()},
+                          lambda: AdaptivePacer(max_gap=0.001))
+        image = np.zeros((9, 60, 3), dtype=np.uint8)
+        try:
+            with pytest.raises(PoolSendError) as excinfo:
+                asyncio.run(pool.update(image))
+            assert list(excinfo.value.errors) == ['b']
+            image[1:8, 10:15] = 200
+            pool.devices['b'] = VirtualDynaTab()
+            pool.transports['b'].device = pool.devices['b']
+            assert asyncio.run(pool.update(image)) == 30  # b missed the first image: whole screen
+            assert pool.devices['a'].stats().data_packets == 29 + 2
+            assert pool.devices['b'].stats().data_packets == 29
+        finally:
+            pool.close()
+        for device in pool.devices.values():
+            assert device.screen.tolist() == image.tolist()
+        with pytest.raises(OSError):
+            open_pool([])
+
+    def test_update_after_send_frame(self):
+        pool = DevicePool({'a': VirtualDynaTab(), 'b': VirtualDynaTab()})
+        image = np.full((9, 60, 3), 50, dtype=np.uint8)
+        try:
+            asyncio.run(pool.send_frame(image.transpose(1, 0, 2).tobytes()))
+            image[0, 0] = 7
+            assert asyncio.run(pool.update(image)) == 2
+        finally:
+            pool.close()
+        for device in pool.devices.values():
+            assert device.screen.tolist() == image.tolist()
+
+
+def bitmap_text(text, color=(0, 255, 0), alignment='Center'):
+    """Line-by-line port of ConvertTo-BitmapText"""
+    font = {int(code): [int(v, 16) for v in values.split(',')]
+            for code, values in re.findall(r'(\d+) = @\(([^)]*)\)', FONT_PATH.read_text())}
+    if len(text) * 5 + (len(text) - 1) > 60:
+        text = text[:61 // 6]
+    width = len(text) * 5 + (len(text) - 1)
+    start_x = {'Left': 0, 'Center': (60 - width) // 2, 'Right': 60 - width}[alignment]
+    pixels = bytearray(1620)
+    for i, char in enumerate(text):
+        columns = font.get(ord(char), font[32])
+        for col in range(5):
+            for row in range(7):
+                if columns[col] & (1 << row):
+                    x, y = start_x + i * 6 + col, 1 + row
+                    if 0 <= x < 60:
+                        pixels[x * 27 + y * 3:x * 27 + y * 3 + 3] = bytes(color)
+    return bytes(pixels)
+
+
+class TestFont:
+
+    def test_matches_convertto_bitmaptext(self):
+        renderer = TextRenderer()
+        for text in ['A', 'Hello', '12:34', '~{|}', 'caf\u00e9 \u2603', 'x' * 10]:
+            for alignment in ['Left', 'Center', 'Right']:
+                assert renderer.stream(text, (255, 128, 1), alignment) == \
+                    bitmap_text(text, (255, 128, 1), alignment), (text, alignment)
+        assert render_text('OK').shape == (9, 60, 3)
+        assert load_font().atlas[32].sum() == 0
+
+    def test_truncates_and_validates(self):
+        renderer = TextRenderer()
+        with pytest.warns(UserWarning):
+            long = renderer.stream('ABCDEFGHIJKLM')
+        assert long == bitmap_text('ABCDEFGHIJKLM') == renderer.stream('ABCDEFGHIJ')
+        with pytest.raises(ValueError):
+            renderer.render('A', alignment='Middle')
+        assert renderer.render('A', alignment='left') is renderer.render('A', alignment='Left')
+
+    def test_cached_labels_are_cheap(self):
+        renderer = TextRenderer(cache_size=16)
+        labels = [f'CPU {n}%' for n in range(10)]
+        start = time.perf_counter()
+        for i in range(1000):
+            image = renderer.render(labels[i % 10], (255, 0, 0))
+        assert time.perf_counter() - start < 0.5
+        assert renderer.cache_info().hits == 990
+        assert not image.flags.writeable
+
+
+class TestImage:
+
+    def test_box_resize_averages_areas(self):
+        image = np.random.default_rng(0).integers(0, 256, size=(90, 600, 3), dtype=np.uint8)
+        expected = image.reshape(9, 10, 60, 10, 3).mean(axis=(1, 3))
+        assert np.abs(box_resize(image) - expected).max() <= 0.5 + 1e-3
+        assert box_resize(np.full((7, 13, 3), 77, dtype=np.uint8)).tolist() == \
+            np.full((9, 60, 3), 77).tolist()
+
+    def test_stream_orders_and_zero_copy(self):
+        image = np.random.default_rng(1).integers(0, 256, size=(9, 60, 3), dtype=np.uint8)
+        assert to_screen(image) is image
+        assert np.shares_memory(image_stream(image, 'row'), image)
+        assert stream_image(image_stream(image).tobytes()).tolist() == image.tolist()
+        buffer = bytearray(9 * 184)  # 60 RGB pixels + 4 bytes padding per row
+        view = raw_image(buffer, 60, 9, stride=184)
+        view[2, 5] = (1, 2, 3)
+        assert buffer[2 * 184 + 15:2 * 184 + 18] == b'\x01\x02\x03'
+        with pytest.raises(ValueError):
+            raw_image(bytes(100), 60, 9)
+        with pytest.raises(ValueError):
+            image_stream(image, 'diagonal')
+
+    def test_alpha_and_grey(self):
+        rgba = np.zeros((9, 60, 4), dtype=np.uint8)
+        rgba[..., :3], rgba[..., 3] = 200, 128
+        assert to_screen(rgba)[0, 0].tolist() == [100, 100, 100]
+        assert to_screen(np.full((18, 120), 9, dtype=np.uint8))[4, 30].tolist() == [9, 9, 9]
+
+    def test_load_image(self, tmp_path):
+        Image = pytest.importorskip('PIL.Image')
+        Image.new('RGB', (120, 18), (10, 20, 30)).save(tmp_path / 'solid.png')
+        assert to_screen(tmp_path / 'solid.png')[8, 59].tolist() == [10, 20, 30]
+        assert load_image(tmp_path / 'solid.png').shape == (18, 120, 3)
+
+
+class TestHexData:
+
+    def test_parse_hex_fragment(self):
+        assert parse_hex_fragment('a9:00:ff') == b'\xa9\x00\xff'
+        assert parse_hex_fragment('') == b''
+
+    def test_decode_fragments_offsets(self):
+        buffer, offsets = decode_fragments(['01:02', 'ff', '0a:0b:0c'])
+        assert buffer == bytes([1, 2, 0xff, 10, 11, 12])
+        assert offsets.tolist() == [0, 2, 3, 6]
+        buffer, offsets = decode_fragments(['', 'AB:cd', ''])
+        assert (buffer, offsets.tolist()) == (b'\xab\xcd', [0, 0, 2, 2])
+
+    def test_split_fragments_round_trip(self):
+        fragments = ['29:00:01', 'a9', '00:00:00:00']
+        assert split_fragments(*decode_fragments(fragments)) == [parse_hex_fragment(f) for f in fragments]
+
+    def test_decode_fragment_array_pads_and_truncates(self):
+        array = decode_fragment_array(['01:02:03', '04', '05:06:07:08'], 3)
+        assert array.tolist() == [[1, 2, 3], [4, 0, 0], [5, 6, 7]]
+
+    def test_decode_fragment_array_matches_capture(self):
+        fragments = ['29:' + ':'.join(['00'] * 63)] * 4
+        assert decode_fragment_array(fragments, 64).shape == (4, 64)
+
+    def test_malformed_fragment_raises(self):
+        with pytest.raises(ValueError):
+            decode_fragments(['01:2:03'])
+        for fragment in ('0g', '01-02', '01:', '\u00e91'):
+            with pytest.raises(ValueError):
+                decode_fragments([fragment])
+        with pytest.raises(ValueError):
+            parse_hex_fragment('zz')
+
+
+class TestProtocol:
+
+    def test_decode_init_packet(self):
+        data = bytes.fromhex('a9000100030000520000010100') + bytes(51)
+        init = decode_packet(data)
+        assert isinstance(init, InitPacket)
+        assert (init.byte_08, init.byte_09, init.byte_10, init.byte_11) == (0, 0, 1, 1)
+        assert init.byte_04_05 == 3
+
+    def test_decode_data_packet(self):
+        data = bytes.fromhex('29000100000003d200ff00') + bytes(53)
+        packet = decode_packet(data)
+        assert isinstance(packet, DataPacket)
+        assert len(packet.rgb_data) == 18
+        assert packet.rgb_data[0].tolist() == [0x00, 0xff, 0x00]
+
+    def test_unknown_opcode(self):
+        assert decode_packet(b'\x01' + bytes(63)) is None
+        assert decode_packet(b'') is None
+
+    def test_packet_pixels_drops_partial_triplet(self):
+        data = bytes(8) + bytes([1, 2, 3, 4, 5])
+        assert packet_pixels(data).tolist() == [[1, 2, 3]]
+
+    def test_packet_pixels_is_zero_copy(self):
+        data = bytearray(64)
+        pixels = packet_pixels(data)
+        data[8] = 0x7f
+        assert pixels.shape == (18, 3)
+        assert pixels[0, 0] == 0x7f
+
+    def test_non_black_pixels(self):
+        assert non_black_pixels([(0, 0, 0), (1, 0, 0)]) == [(1, (1, 0, 0))]
+
+    def test_corner_pixels(self):
+        pixels = np.zeros((540, 3), dtype=np.uint8)
+        pixels[59] = (0xff, 0, 0)
+        corners = corner_pixels(pixels)
+        assert corners['Top-Right'] == (0xff, 0, 0)
+        assert corners['Top-Left'] == (0, 0, 0)
+        assert corner_pixels(pixels[:522])['Bottom-Right'] is None
+
+    def test_color_histogram(self):
+        pixels = np.array([(0, 0, 0), (0xff, 0, 0), (0, 0, 0)], dtype=np.uint8)
+        assert color_histogram(pixels) == {(0, 0, 0): 2, (0xff, 0, 0): 1}
+
+    def test_color_name(self):
+        assert color_name(0xff, 0, 0) == "Bright Red"
+        assert color_name(1, 2, 3) == "RGB(01,02,03)"
+        assert color_name(1, 2, 3, default="Other") == "Other"
+
+    def test_stream_image_is_column_major(self):
+        stream = bytearray(1620)
+        stream[3:6] = b'\xff\x00\x00'  # second pixel of the first column
+        image = stream_image(bytes(stream))
+        assert image[1, 0].tolist() == [0xff, 0, 0]
+        with pytest.raises(ValueError):
+            stream_image(bytes(100))
+
+    def test_payload_stream_uses_length_byte(self):
+        packet = bytes([0x29, 0, 1, 0, 0, 0, 4, 0]) + bytes(range(1, 57))
+        assert payload_stream([packet]) == bytes([1, 2, 3, 4])
+
+    def test_group_frames_sorts_by_sequence(self):
+        frames = group_frames(iter_fragment_packets(ANIMATION_CAPTURE))
+        assert sorted(frames) == [0, 1, 2]
+        for packets in frames.values():
+            assert [p[4] for p in packets] == sorted(p[4] for p in packets)
+        assert len(frame_pixels(frames[0])) == 18 * len(frames[0])
+
+    def test_json_and_fragment_paths_agree(self):
+        from_layers = [p.data for p in iter_packets(ANIMATION_CAPTURE)]
+        from_text = [p for p in iter_fragment_packets(ANIMATION_CAPTURE)
+                     if p[0] in (OPCODE_INIT, OPCODE_DATA)]
+        assert from_layers == from_text
@@ -0,0 +1,295 @@
+"""
+Asynchronous feature-report transport with adaptive pacing.
+
+Send-FeaturePacket sleeps a fixed 5 ms after every SetFeature, and frames
+are sent strictly one after another. AsyncTransport instead:
+
+- runs the blocking SetFeature (a HIDIOCSFEATURE ioctl on hidraw, or any
+  object with set_feature(), such as emulator.VirtualDynaTab) on one
+  dedicated thread, so reports stay in order
+- waits only the gap the device needs after a report completes. The gap
+  starts at min_gap, which sweep_min_gap() learns the way
+  Test-FindMinimumDelay.ps1 does: it tries increasing gaps until the
+  device keeps up. From there it follows the measured completion time
+  of each report, widening when the device slows down. A report that
+  fails (EPIPE when the device is busy) doubles the gap and is retried,
+  and every success eases that back towards min_gap.
+- prepares frame N+1 (render + encode) on another thread while frame N
+  is being sent, in stream_frames()
+
+The device does not answer with anything useful, so the report
+completion time is the only feedback available.
+"""
+
+import asyncio
+import concurrent.futures
+import fcntl
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, Callable, Iterable, List, Optional, Sequence, Union
+
+from .encode import FEATURE_REPORT_SIZE, PIXEL_BYTES, FrameEncoder, Pixels
+
+VENDOR_ID = 0x3151
+PRODUCT_ID = 0x4015
+SCREEN_INTERFACE = 2  # MI_02
+
+PSDYNATAB_GAP = 0.005  # Start-Sleep in Send-FeaturePacket
+
+
+def _hid_ioctl(number: int, size: int) -> int:
+    # _IOC(_IOC_WRITE | _IOC_READ, 'H', number, size) from <linux/hidraw.h>
+    return (3 << 30) | (size << 16) | (ord('H') << 8) | number
+
+
+def HIDIOCSFEATURE(size: int) -> int:
+    return _hid_ioctl(0x06, size)
+
+
+def HIDIOCGFEATURE(size: int) -> int:
+    return _hid_ioctl(0x07, size)
+
+
+def find_hidraw(vendor_id: int = VENDOR_ID, product_id: int = PRODUCT_ID,
+                interface: int = SCREEN_INTERFACE, sysfs: Union[str, Path] = '/sys/class/hidraw') -> List[Path]:
+    """/dev/hidraw* nodes of the screen interface, like Initialize-HIDDevice's MI_02 search"""
+    found = []
+    for node in sorted(Path(sysfs).glob('hidraw*')):
+        try:
+            uevent = (node / 'device' / 'uevent').read_text()
+            device = (node / 'device').resolve()
+        except OSError:
+            continue
+        hid_id = next((line.split('=', 1)[1] for line in uevent.splitlines() if line.startswith('HID_ID=')), '')
+        parts = hid_id.split(':')
+        if len(parts) != 3 or (int(parts[1], 16), int(parts[2], 16)) != (vendor_id, product_id):
+            continue
+        # .../1-2:1.2/0003:3151:4015.0007: the USB interface is the parent's suffix
+        if device.parent.name.rsplit('.', 1)[-1] == str(interface):
+            found.append(Path('/dev') / node.name)
+    return found
+
+
+class HidrawDevice:
+    """Feature reports on a Linux hidraw node"""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.fd = os.open(self.path, os.O_RDWR)
+
+    def set_feature(self, report: bytes):
+        """Send one feature report (report ID first)"""
+        fcntl.ioctl(self.fd, HIDIOCSFEATURE(len(report)), bytes(report))
+
+    def get_feature(self, report: Optional[bytearray] = None) -> bytearray:
+        """Read one feature report; report[0] selects the report ID"""
+        if report is None:
+            report = bytearray(FEATURE_REPORT_SIZE)
+        fcntl.ioctl(self.fd, HIDIOCGFEATURE(len(report)), report, True)
+        return report
+
+    def close(self):
+        os.close(self.fd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AdaptivePacer:
+    """Gap to leave after each completed report
+
+    Two signals set the gap, and the larger one wins:
+
+    - completion times: success(duration) keeps a moving average of how
+      long reports take (smoothing is the weight of the newest one). A
+      device that falls behind takes longer to accept reports, so the
+      gap grows by slowdown times the average's excess over the fastest
+      completion seen, and shrinks again when completions speed up.
+    - failures: failure() multiplies a backoff gap by backoff, and each
+      success() moves it back towards min_gap by the factor recover.
+
+    The gap stays between min_gap and max_gap.
+    """
+
+    def __init__(self, min_gap: float = 0.0, max_gap: float = 0.05,
+                 backoff: float = 2.0, recover: float = 0.95,
+                 smoothing: float = 0.2, slowdown: float = 1.0):
+        self.min_gap = min_gap
+        self.max_gap = max_gap
+        self.backoff = backoff
+        self.recover = recover
+        self.smoothing = smoothing
+        self.slowdown = slowdown
+        self.gap = min_gap
+        self.mean_time: Optional[float] = None  # moving average of completion times, seconds
+        self.fastest: Optional[float] = None
+        self._backoff_gap = min_gap
+
+    def _update(self):
+        excess = 0.0 if self.mean_time is None else self.mean_time - self.fastest
+        timed_gap = self.min_gap + self.slowdown * excess
+        self.gap = min(self.max_gap, max(self.min_gap, timed_gap, self._backoff_gap))
+
+    def success(self, duration: Optional[float] = None):
+        """A report completed, in duration seconds if measured"""
+        if duration is not None:
+            self.fastest = duration if self.fastest is None else min(self.fastest, duration)
+            self.mean_time = duration if self.mean_time is None else \
+                self.mean_time + self.smoothing * (duration - self.mean_time)
+        self._backoff_gap = max(self.min_gap, self._backoff_gap * self.recover)
+        self._update()
+
+    def failure(self):
+        self._backoff_gap = min(self.max_gap, max(self.gap, 0.0005) * self.backoff)
+        self._update()
+
+
+@dataclass
+class TransportStats:
+    reports: int = 0
+    retries: int = 0
+    frames: int = 0
+    send_time: float = 0.0   # seconds inside set_feature
+    wait_time: float = 0.0   # seconds spent pacing
+
+    @property
+    def mean_report_time(self) -> float:
+        return self.send_time / self.reports if self.reports else 0.0
+
+
+class AsyncTransport:
+    """Paced, ordered feature reports to device from asyncio code"""
+
+    def __init__(self, device, pacer: Optional[AdaptivePacer] = None, retries: int = 3):
+        self.device = device
+        self.pacer = pacer or AdaptivePacer()
+        self.retries = retries
+        self.stats = TransportStats()
+        self._sender = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='dynatab-send')
+        self._worker = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='dynatab-encode')
+        self._last = 0.0
+
+    def _send(self, report: bytes):
+        # Runs on the sender thread: pace, send, retry with backoff
+        for attempt in range(self.retries + 1):
+            wait = self.pacer.gap - (time.perf_counter() - self._last)
+            if wait > 0:
+                time.sleep(wait)
+                self.stats.wait_time += wait
+            start = time.perf_counter()
+            try:
+                self.device.set_feature(report)
+            except OSError:
+                self._last = time.perf_counter()
+                self.pacer.failure()
+                if attempt == self.retries:
+                    raise
+                self.stats.retries += 1
+                continue
+            self._last = time.perf_counter()
+            self.stats.reports += 1
+            self.stats.send_time += self._last - start
+            self.pacer.success(self._last - start)
+            return
+
+    def _send_all(self, reports: Iterable[bytes]):
+        for report in reports:
+            self._send(report)
+
+    async def send_report(self, report: bytes):
+        """Send one 65-byte feature report"""
+        await asyncio.get_running_loop().run_in_executor(self._sender, self._send, report)
+
+    async def send_reports(self, reports: Sequence[bytes]):
+        """Send feature reports back to back, in one hop to the sender thread"""
+        await asyncio.get_running_loop().run_in_executor(self._sender, self._send_all, reports)
+
+    async def stream_frames(self, frames: Union[Iterable, AsyncIterator],
+                            render: Optional[Callable[[object], Pixels]] = None,
+                            byte_count: int = PIXEL_BYTES) -> int:
+        """Send each frame as a static upload, preparing the next while one is sent
+
+        render turns a frame into its pixel stream (device order); by
+        default frames already are pixel streams. Returns the number of
+        frames sent.
+        """
+        loop = asyncio.get_running_loop()
+        # One encoder being sent, one encoded and waiting, one being encoded
+        encoders = [FrameEncoder(byte_count=byte_count, feature_reports=True) for _ in range(3)]
+        init = b'\x00' + encoders[0].init
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+
+        def prepare(frame, encoder: FrameEncoder) -> List[memoryview]:
+            return [init] + encoder.encode(render(frame) if render else frame)
+
+        async def items():
+            if hasattr(frames, '__aiter__'):
+                async for frame in frames:
+                    yield frame
+            else:
+                for frame in frames:
+                    yield frame
+
+        async def produce():
+            try:
+                index = 0
+                async for frame in items():
+                    await queue.put(await loop.run_in_executor(self._worker, prepare, frame, encoders[index % 3]))
+                    index += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await queue.put(e)
+                return
+            await queue.put(None)
+
+        producer = asyncio.ensure_future(produce())
+        sent = 0
+        try:
+            while True:
+                reports = await queue.get()
+                if reports is None:
+                    break
+                if isinstance(reports, Exception):
+                    raise reports
+                await self.send_reports(reports)
+                sent += 1
+                self.stats.frames += 1
+        finally:
+            producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+        return sent
+
+    def close(self):
+        self._sender.shutdown()
+        self._worker.shutdown()
+
+
+async def sweep_min_gap(device, gaps: Sequence[float], reports: Sequence[bytes],
+                        check: Callable[[], bool], settle: float = 0.1) -> Optional[float]:
+    """Smallest gap at which sending reports passes check(), trying gaps in increasing order
+
+    check() looks at the device afterwards (e.g. a VirtualDynaTab's stats,
+    or asking whether the picture showed up, as Test-FindMinimumDelay
+    does), and is called after every attempt so it can reset what it
+    looks at. The device gets settle seconds to recover before each attempt.
+    Returns None if no gap works.
+    """
+    for gap in sorted(gaps):
+        await asyncio.sleep(settle)
+        transport = AsyncTransport(device, AdaptivePacer(min_gap=gap, max_gap=gap), retries=0)
+        try:
+            await transport.send_reports(reports)
+            failed = False
+        except OSError:
+            failed = True
+        finally:
+            transport.close()
+        if check() and not failed:
+            return gap
+    return None
@@ -0,0 +1,212 @@
+"""
+Packet validation shared by the batch analysis scripts and watch mode.
+
+Rules confirmed against the captures in usbPcap/:
+
+  checksum      byte 7 == (0xFF - sum(bytes 0..6)) & 0xFF, for init and
+                data packets alike
+  sequence      data packets of a frame carry a counter in bytes 4-5
+                (little endian) that starts at 0 and increments by one
+  completeness  byte 6 of a data packet is its payload byte count; the
+                payloads of one frame add up to the init packet's byte
+                count (bytes 4-5), and an upload sends byte 2 frames
+
+The static-picture rules (single frame, no delay, frame index 0) are kept
+separately in static_init_errors / static_data_errors, as used by
+analyze_static_picture_tests.py.
+
+check_packet_array applies the checksum, payload length and sequence rules
+to a whole capture at once, as NumPy operations over an (N, 64) payload
+array, and returns the indices of the failing packets.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from .protocol import (OPCODE_DATA, OPCODE_INIT, PAYLOAD_SIZE, DataPacket,
+                       InitPacket, Packet, parse_init_packet)
+
+
+def packet_checksum(data: bytes) -> int:
+    """Checksum byte (byte 7) for a packet whose first 7 bytes are data[:7]"""
+    return (0xFF - sum(data[:7])) & 0xFF
+
+
+def checksum_ok(data: bytes) -> bool:
+    """True if byte 7 of data holds the checksum of bytes 0-6"""
+    return len(data) > 7 and data[7] == packet_checksum(data)
+
+
+def static_init_errors(init: InitPacket) -> List[str]:
+    """Static-picture rule violations in an init packet"""
+    errors = []
+    if init.byte_01 != 0x00:
+        errors.append(f"Init byte[1] should be 0x00, got 0x{init.byte_01:02x}")
+    if init.byte_02 != 0x01:
+        errors.append(f"Init byte[2] should be 0x01, got 0x{init.byte_02:02x}")
+    if init.byte_03 != 0x00:
+        errors.append(f"Init byte[3] should be 0x00, got 0x{init.byte_03:02x}")
+    return errors
+
+
+def static_data_errors(i: int, data: DataPacket) -> List[str]:
+    """Static-picture rule violations in the i-th data packet"""
+    errors = []
+    if data.byte_01 != 0x00:
+        errors.append(f"Data packet {i} byte[1] should be 0x00")
+    if data.byte_02 != 0x01:
+        errors.append(f"Data packet {i} byte[2] should be 0x01")
+    if data.byte_03 != 0x00:
+        errors.append(f"Data packet {i} byte[3] should be 0x00")
+    if data.packet_index != i:
+        errors.append(f"Data packet {i} has wrong index: {data.packet_index}")
+    return errors
+
+
+@dataclass
+class Issue:
+    """A protocol violation found while validating a packet stream"""
+    kind: str  # 'checksum', 'sequence', 'completeness' or 'protocol'
+    frame_number: int  # Capture frame number of the packet that exposed it
+    message: str
+
+
+class StreamValidator:
+    """Incremental checksum, sequence and completeness checks
+
+    Feed packets in capture order; each call returns the issues that
+    packet exposed. Completeness of a frame is judged when the next frame
+    or upload starts, or at finish().
+    """
+
+    def __init__(self):
+        self.init: Optional[InitPacket] = None
+        self.frames_seen = 0
+        self.frame_index: Optional[int] = None
+        self.next_sequence = 0
+        self.frame_bytes = 0
+        self.last_frame_number = 0
+
+    def _close_frame(self, frame_number: int) -> List[Issue]:
+        issues = []
+        if self.frame_index is not None and self.init is not None:
+            expected = self.init.byte_04_05
+            if self.frame_bytes != expected:
+                issues.append(Issue('completeness', frame_number,
+                                    f"Frame {self.frame_index}: {self.frame_bytes} payload bytes, "
+                                    f"expected {expected}"))
+        self.frame_index = None
+        self.next_sequence = 0
+        self.frame_bytes = 0
+        return issues
+
+    def _close_upload(self, frame_number: int) -> List[Issue]:
+        issues = self._close_frame(frame_number)
+        if self.init is not None and self.frames_seen != self.init.byte_02:
+            issues.append(Issue('completeness', frame_number,
+                                f"Upload sent {self.frames_seen} of {self.init.byte_02} frames"))
+        self.init = None
+        self.frames_seen = 0
+        return issues
+
+    def feed(self, packet: Packet) -> List[Issue]:
+        """Validate the next packet of the stream"""
+        data = packet.data
+        n = packet.frame_number
+        self.last_frame_number = n
+        issues = []
+        if not data or data[0] not in (OPCODE_INIT, OPCODE_DATA):
+            return issues
+
+        if not checksum_ok(data):
+            issues.append(Issue('checksum', n, f"Checksum 0x{data[7]:02x}, expected 0x{packet_checksum(data):02x}"
+                                if len(data) > 7 else f"Packet too short: {len(data)} bytes"))
+
+        if data[0] == OPCODE_INIT:
+            issues.extend(self._close_upload(n))
+            try:
+                self.init = parse_init_packet(data)
+            except ValueError as e:
+                issues.append(Issue('protocol', n, str(e)))
+            else:
+                if self.init.byte_02 == 1:
+                    issues.extend(Issue('protocol', n, e) for e in static_init_errors(self.init))
+            return issues
+
+        if len(data) < 8:
+            issues.append(Issue('protocol', n, f"Data packet too short: {len(data)} bytes"))
+            return issues
+        if self.init is None:
+            issues.append(Issue('protocol', n, "Data packet before any init packet"))
+
+        if data[1] != self.frame_index:
+            issues.extend(self._close_frame(n))
+            self.frame_index = data[1]
+            self.frames_seen += 1
+
+        sequence = data[4] | (data[5] << 8)
+        if sequence != self.next_sequence:
+            issues.append(Issue('sequence', n, f"Frame {data[1]}: packet {sequence}, expected {self.next_sequence}"))
+        self.next_sequence = sequence + 1
+        self.frame_bytes += min(data[6], PAYLOAD_SIZE)
+        return issues
+
+    def finish(self) -> List[Issue]:
+        """Issues for the frame and upload still open at the end of the stream"""
+        return self._close_upload(self.last_frame_number)
+
+
+def validate_packets(packets: Iterable[Packet]) -> Iterator[Issue]:
+    """Yield issues as they are found in a (possibly live) packet stream"""
+    validator = StreamValidator()
+    for packet in packets:
+        yield from validator.feed(packet)
+    yield from validator.finish()
+
+
+def check_packet_array(packets: np.ndarray) -> Dict[str, np.ndarray]:
+    """Row indices of the packets failing each header rule
+
+    packets is an (N, 64) uint8 array of payloads in capture order (see
+    cache.load_payload_array). Returns {'checksum': ..., 'length': ...,
+    'sequence': ...}; the same rules StreamValidator applies per packet.
+
+      checksum  byte 7 of every init and data packet
+      length    byte 6 of a data packet against the byte count of the
+                upload's init packet (56 per packet, the remainder last)
+      sequence  bytes 4-5 restart at 0 for each frame and upload and
+                increment by one from the previous packet
+    """
+    packets = np.asarray(packets, dtype=np.uint8)
+    header = packets[:, :8].astype(np.int64)
+    opcode = header[:, 0]
+    is_init = opcode == OPCODE_INIT
+    is_data = opcode == OPCODE_DATA
+
+    checksum = (0xFF - header[:, :7].sum(axis=1)) & 0xFF
+    bad_checksum = (is_init | is_data) & (header[:, 7] != checksum)
+
+    # Upload each packet belongs to: row of the latest init packet, or -1
+    upload = np.maximum.accumulate(np.where(is_init, np.arange(len(packets)), -1))
+    # Bytes 4-5: byte count in init packets, sequence in data packets
+    sequence = header[:, 4] | (header[:, 5] << 8)
+    expected_length = np.clip(sequence[upload] - sequence * PAYLOAD_SIZE, 0, PAYLOAD_SIZE)
+    bad_length = is_data & (upload >= 0) & (header[:, 6] != expected_length)
+
+    rows = np.flatnonzero(is_data)
+    frame = header[rows, 1]
+    runs = upload[rows]
+    new_run = np.ones(len(rows), dtype=bool)
+    new_run[1:] = (frame[1:] != frame[:-1]) | (runs[1:] != runs[:-1])
+    expected_sequence = np.zeros(len(rows), dtype=np.int64)
+    expected_sequence[1:] = sequence[rows[:-1]] + 1
+    expected_sequence[new_run] = 0
+    bad_sequence = rows[sequence[rows] != expected_sequence]
+
+    return {
+        'checksum': np.flatnonzero(bad_checksum),
+        'length': np.flatnonzero(bad_length),
+        'sequence': bad_sequence,
+    }
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Search for the formulas behind the init (0xa9) and data (0x29) header fields.
+
+Collects every init and data packet in usbPcap/, plus the rejected uploads
+recorded in usbPcap/Test-1*-Results.csv, and brute-forces affine, XOR and
+clamped combinations of the header bytes and region parameters for bytes
+4-7. Prints the formulas that fit every sample, simplest first, with the
+number of rejected uploads each one explains.
+
+    ./solve_header_fields.py               # up to 6 terms, all cores
+    ./solve_header_fields.py --terms 4 -j 1
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+from pydynatab.solver import DATA_TARGETS, INIT_TARGETS, load_corpus, solve
+
+SHOWN = 5
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('capture_dir', nargs='?', default=Path(__file__).resolve().parent / 'usbPcap',
+                        help='directory of captures and Test-*-Results.csv files')
+    parser.add_argument('--terms', type=int, default=6, help='maximum number of terms per formula')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='worker processes (default: one per core)')
+    args = parser.parse_args()
+
+    inits, datas, failed = load_corpus(args.capture_dir)
+    print(f"Samples: {len(inits.values)} distinct init headers, {len(datas.values)} distinct data headers, "
+          f"{len(failed.values)} rejected init headers")
+
+    for packet_type, targets, samples, rejected in (('INIT (0xa9)', INIT_TARGETS, inits, failed),
+                                                   ('DATA (0x29)', DATA_TARGETS, datas, None)):
+        print("\n" + "=" * 80)
+        print(packet_type)
+        print("=" * 80)
+        for target in targets:
+            start = time.perf_counter()
+            candidates = solve(target, samples, rejected, max_terms=args.terms, workers=args.jobs)
+            elapsed = time.perf_counter() - start
+            print(f"\n{target.name}: {len(candidates)} formula(s) fit every sample ({elapsed:.2f} s)")
+            for candidate in candidates[:SHOWN]:
+                explains = f"  [explains {candidate.explained}/{len(rejected.values)} rejected]" \
+                    if rejected is not None else ""
+                print(f"  {candidate.formula()}{explains}")
+
+if __name__ == '__main__':
+    main()
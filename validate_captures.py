@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Check the header fields of every packet in one or more captures.
+
+Runs the checksum (byte 7), payload length (byte 6) and sequence (bytes
+4-5) rules over each capture as a single array and lists the frame numbers
+of the packets that fail them, e.g.
+
+    ./validate_captures.py                      # every capture in usbPcap/
+    ./validate_captures.py usbPcap/2026-01-19-test-1b-usbpcap.json
+"""
+
+import argparse
+from pathlib import Path
+
+from pydynatab.cache import load_payload_array
+from pydynatab.validate import check_packet_array
+
+SHOWN = 10
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('captures', nargs='*', help='captures to check (default: usbPcap/*.json)')
+    args = parser.parse_args()
+    captures = args.captures or sorted(Path(__file__).resolve().parent.glob('usbPcap/*.json'))
+
+    failing = 0
+    for capture in captures:
+        payloads, frame_numbers = load_payload_array(capture)
+        failures = check_packet_array(payloads)
+        if not any(len(rows) for rows in failures.values()):
+            continue
+        failing += 1
+        print(f"\n{Path(capture).name}  ({len(payloads)} packets)")
+        for rule, rows in failures.items():
+            if len(rows):
+                numbers = ", ".join(str(n) for n in frame_numbers[rows[:SHOWN]].tolist())
+                more = f", ... ({len(rows)} total)" if len(rows) > SHOWN else ""
+                print(f"  {rule:9s} frames {numbers}{more}")
+
+    print("=" * 80)
+    print(f"{len(captures)} captures checked, {failing} with header failures")
+
+if __name__ == '__main__':
+    main()
@@ -1,63 +1,32 @@
 #!/usr/bin/env python3
 """Visualize the exact 4-pixel rotation pattern per frame."""
 
-import json
-import re
 import sys
 
-def parse_hex_fragment(fragment_str):
-    return bytes.fromhex(fragment_str.replace(':', ''))
+from pydynatab.protocol import (color_name, frame_pixels, non_black_pixels,
+                                pixel_xy)
+from pydynatab.store import PacketStore
 
-def color_name(r, g, b):
-    colors = {
-        (0xff, 0x00, 0x00): "Bright Red ",
-        (0x7f, 0x00, 0x00): "Dark Red   ",
-        (0x00, 0xff, 0x00): "Green      ",
-        (0x00, 0x00, 0xff): "Blue       ",
-        (0x00, 0x7f, 0x00): "Green(127) ",
-    }
-    return colors.get((r, g, b), f"RGB({r:02x},{g:02x},{b:02x})")
+def padded_color_name(r, g, b):
+    return f"{color_name(r, g, b):<11s}"
 
 def main():
     filename = sys.argv[1] if len(sys.argv) > 1 else \
         '/home/user/PSDynaTab/usbPcap/2026-01-17-animation-4frame-ff-00-00-00-ff-00-00-00-ff-7f-00-00-connected-corners-1pixel-each.json'
 
-    with open(filename, 'r') as f:
-        content = f.read()
-        fragments = re.findall(r'"usb\.data_fragment":\s*"([^"]+)"', content)
-
-    # Organize data packets by frame
-    frames = {}
-    for frag in fragments:
-        packet = parse_hex_fragment(frag)
-        if packet[0] == 0x29:
-            frame_num = packet[1]
-            if frame_num not in frames:
-                frames[frame_num] = []
-            frames[frame_num].append(packet)
+    # Data packets indexed by frame, sorted by sequence
+    store = PacketStore.open(filename)
 
     print("=" * 80)
     print("4-PIXEL COLOR ROTATION PATTERN")
     print("=" * 80)
 
-    for frame_num in sorted(frames.keys()):
-        packets = sorted(frames[frame_num], key=lambda p: p[4])
-
-        # Reconstruct frame
-        frame_pixels = []
-        for packet in packets:
-            pixel_data = packet[8:]
-            for i in range(0, len(pixel_data), 3):
-                if i + 2 < len(pixel_data):
-                    frame_pixels.append((pixel_data[i], pixel_data[i+1], pixel_data[i+2]))
-
+    for frame_num in store.frames:
         # Find the 4 non-black pixels in this frame
         active = []
-        for idx, (r, g, b) in enumerate(frame_pixels):
-            if r != 0 or g != 0 or b != 0:
-                x = idx % 60
-                y = idx // 60
-                active.append((idx, x, y, r, g, b))
+        for idx, (r, g, b) in non_black_pixels(frame_pixels(store.packets(frame_num))):
+            x, y = pixel_xy(idx)
+            active.append((idx, x, y, r, g, b))
 
         print(f"\nFRAME {frame_num}: {len(active)} active pixels")
         print("-" * 80)
@@ -78,7 +47,7 @@ def main():
             else:
                 corner = f"Position     "
 
-            cname = color_name(r, g, b)
+            cname = padded_color_name(r, g, b)
             print(f"  {corner} ({x:2d},{y}) idx={idx:3d}: {cname}  RGB({r:02x}, {g:02x}, {b:02x})")
 
     # Now show the rotation pattern more clearly
@@ -96,14 +65,8 @@ def main():
     print("            Top-Left    Top-Near-L    (~32-33,8)    (~40-41,8)")
     print("-" * 80)
 
-    for frame_num in sorted(frames.keys()):
-        packets = sorted(frames[frame_num], key=lambda p: p[4])
-        frame_pixels = []
-        for packet in packets:
-            pixel_data = packet[8:]
-            for i in range(0, len(pixel_data), 3):
-                if i + 2 < len(pixel_data):
-                    frame_pixels.append((pixel_data[i], pixel_data[i+1], pixel_data[i+2]))
+    for frame_num in store.frames:
+        pixels = frame_pixels(store.packets(frame_num))
 
         # Get colors at the 4 key positions
         colors = []
@@ -112,19 +75,19 @@ def main():
             if isinstance(test_pos, list):
                 # Check multiple indices
                 for idx in test_pos:
-                    if idx < len(frame_pixels):
-                        r, g, b = frame_pixels[idx]
+                    if idx < len(pixels):
+                        r, g, b = pixels[idx]
                         if r != 0 or g != 0 or b != 0:
-                            colors.append(color_name(r, g, b))
+                            colors.append(padded_color_name(r, g, b))
                             found = True
                             break
                 if not found:
                     colors.append("Black      ")
             else:
-                if test_pos < len(frame_pixels):
-                    r, g, b = frame_pixels[test_pos]
+                if test_pos < len(pixels):
+                    r, g, b = pixels[test_pos]
                     if r != 0 or g != 0 or b != 0:
-                        colors.append(color_name(r, g, b))
+                        colors.append(padded_color_name(r, g, b))
                     else:
                         colors.append("Black      ")
                 else:
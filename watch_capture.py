@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Validate a capture while it is still being written.
+
+Tails a growing Wireshark/tshark JSON export, e.g.
+
+    tshark -i USBPcap4 -T json > usbPcap/live.json &
+    ./watch_capture.py usbPcap/live.json
+
+and reports checksum, sequence and frame completeness failures as each
+packet arrives. Stops at the end of the export (closing ']') or Ctrl-C.
+"""
+
+import argparse
+import time
+from collections import Counter
+
+from pydynatab.capture import iter_packets
+from pydynatab.validate import StreamValidator
+
+def report(issues, counts):
+    for issue in issues:
+        counts[issue.kind] += 1
+        print(f"[{time.strftime('%H:%M:%S')}] frame {issue.frame_number:6d}  "
+              f"{issue.kind.upper():12s} {issue.message}", flush=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('capture', help='JSON export to follow')
+    parser.add_argument('--once', action='store_true',
+                        help='validate the file as it is now instead of following it')
+    args = parser.parse_args()
+
+    validator = StreamValidator()
+    counts = Counter()
+    packets = 0
+
+    print(f"Watching {args.capture} (Ctrl-C to stop)" if not args.once else f"Validating {args.capture}")
+    try:
+        for packet in iter_packets(args.capture, follow=not args.once):
+            packets += 1
+            report(validator.feed(packet), counts)
+    except KeyboardInterrupt:
+        pass
+    report(validator.finish(), counts)
+
+    print("=" * 80)
+    print(f"{packets} packets, {sum(counts.values())} issues"
+          + (": " + ", ".join(f"{kind} {n}" for kind, n in sorted(counts.items())) if counts else ""))
+
+if __name__ == '__main__':
+    main()